@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Range, jump, year-over-year and gap checks on the chart metric series
+
+The README's expected ranges (5.7-6.9 spots, 8-13% disabled, 0.5-1.3% soft churn) used
+to be checked by eye against the runners' tables. AnomalyMonitor checks every result as
+it arrives, before it is written to the metric store or combined:
+
+    range   a value outside its segment's expected range (RULES)
+    jump    a change from the previous day (month for monthly charts) larger than max_step
+    yoy     a change from the same calendar day (month) a year earlier larger than max_yoy
+    gap     days (months) missing from the date index
+
+The monitor is incremental. Batches are checked as they come: sharded_query.py's shards
+in window order, or a whole result. Across batches it carries only the last row, for
+jumps and gaps at the boundary, and the last year of rows, for the YoY references. Every
+check runs over all segment columns of a batch at once as numpy arrays, so checking
+costs milliseconds even on multi-year series. A YoY reference the stream doesn't hold (a
+run of this year's window only) and the row before the first batch are read from the
+metric store.
+
+Issues are flagged, not fixed: the runners and refresh_scheduler.py print them and store
+the result as usual, and `check` exits with 1 when it finds range or gap errors.
+
+Usage:
+    python anomaly_checks.py rules
+    python anomaly_checks.py check soft_churn_r7 --start-date 2025-01-01
+    python anomaly_checks.py check spot_allocation_monthly --local
+"""
+import sys
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import metric_store
+from sql_templates import PRESETS
+
+# Template -> expected range per segment, largest plausible change from the previous
+# period and largest plausible change from a year earlier, in the metric's units (spots
+# or % points). The All Fitness ranges are the README's Key Metrics ranges; the other
+# segments' are the documented values (docs/tenure_segmentation_results_summary.md,
+# docs/rolling_7day_oct_nov_summary.md) with some room. SA soft churn R7 can be 0.
+RULES = {
+    '01_spot_allocation_monthly.sql': {
+        'period': 'month', 'max_step': 0.5, 'max_yoy': 1.0,
+        'ranges': {'all_fitness': (5.7, 6.9), 'long_tenure_gt24mo': (6.5, 7.8), 'short_tenure_le24mo': (4.6, 6.7)}},
+    '02_disabled_schedules_monthly.sql': {
+        'period': 'month', 'max_step': 2.0, 'max_yoy': 4.0,
+        'ranges': {'all_fitness': (8.0, 13.0), 'long_tenure_gt24mo': (9.5, 15.0),
+                   'short_tenure_le24mo': (7.0, 13.0)}},
+    '03_soft_churn_monthly.sql': {
+        'period': 'month', 'max_step': 0.4, 'max_yoy': 0.5,
+        'ranges': {'all_fitness': (0.5, 1.3), 'long_tenure_gt24mo': (0.3, 1.0), 'short_tenure_le24mo': (0.7, 1.6)}},
+    '04_spot_allocation_r7_rolling_7day.sql': {
+        'period': 'day', 'max_step': 0.3, 'max_yoy': 0.6,
+        'ranges': {'all_fitness': (1.9, 2.7), 'sa_fitness': (2.2, 3.0), 'nonsa_fitness': (1.7, 2.4)}},
+    '05_disabled_schedules_r7_rolling_7day.sql': {
+        'period': 'day', 'max_step': 1.5, 'max_yoy': 4.0,
+        'ranges': {'all_fitness': (6.0, 13.0), 'sa_fitness': (4.5, 11.0), 'nonsa_fitness': (6.0, 14.0)}},
+    '06_soft_churn_r7_rolling_7day.sql': {
+        'period': 'day', 'max_step': 0.02, 'max_yoy': 0.03,
+        'ranges': {'all_fitness': (0.01, 0.06), 'sa_fitness': (0.0, 0.05), 'nonsa_fitness': (0.01, 0.08)}},
+}
+
+CHECKS = ('range', 'jump', 'yoy', 'gap')
+SEVERITY = {'range': 'error', 'gap': 'error', 'jump': 'warning', 'yoy': 'warning'}
+ISSUE_COLUMNS = ['check', 'severity', 'column', 'date', 'value', 'reference']
+
+# Periods of history kept for the YoY references
+YEAR_PERIODS = {'day': 366, 'month': 12}
+
+# Issues printed per result; the rest are counted
+REPORT_LIMIT = 5
+
+
+def rule_for(metric):
+    """Checks of a metric (a PRESETS name), or None for metrics that aren't charts"""
+    preset = PRESETS.get(metric)
+    return RULES.get(preset['template']) if preset else None
+
+
+def range_for(rule, column):
+    """
+    Expected (low, high) of a result column, or None if its segment has no range
+
+    Columns are named after their segment (all_fitness, sa_fitness_r7,
+    long_tenure_gt24mo_pct); the longest matching segment name wins.
+    """
+    segments = [segment for segment in rule['ranges'] if column.startswith(segment)]
+    return rule['ranges'][max(segments, key=len)] if segments else None
+
+
+def period_numbers(dates, period):
+    """Dates as day or month numbers, so consecutive periods differ by 1"""
+    days = dates.to_numpy(dtype='datetime64[D]')
+    if period == 'month':
+        return days.astype('datetime64[M]').astype(np.int64)
+    return days.astype(np.int64)
+
+
+def period_dates(periods, period):
+    """Inverse of period_numbers"""
+    unit = 'M' if period == 'month' else 'D'
+    return pd.DatetimeIndex(np.asarray(periods, dtype=np.int64).astype(f'datetime64[{unit}]')
+                            .astype('datetime64[ns]'))
+
+
+def _year_earlier(dates, period):
+    """Period numbers of the same calendar day (month) a year earlier; Feb 29 maps to Feb 28"""
+    if period == 'month':
+        return period_numbers(dates, 'month') - 12
+    return period_numbers(dates - pd.DateOffset(years=1), 'day')
+
+
+def date_column_of(df):
+    """Name of a result's date column (date, month_date or month)"""
+    for name in metric_store.DATE_COLUMNS:
+        if name in df.columns:
+            return name
+    raise KeyError(f"No date column ({', '.join(metric_store.DATE_COLUMNS)}) in {list(df.columns)}")
+
+
+def lookup_rows(periods, values, wanted):
+    """Rows of values (sorted by period) at the wanted periods; NaN where there is no row"""
+    result = np.full((len(wanted), values.shape[1]), np.nan)
+    if len(periods) == 0:
+        return result
+    at = np.searchsorted(periods, wanted).clip(max=len(periods) - 1)
+    hit = periods[at] == wanted
+    result[hit] = values[at[hit]]
+    return result
+
+
+class AnomalyMonitor:
+    """
+    Incremental checks over one metric's result batches
+
+    Feed batches in date order with update(). A batch that starts before the last row
+    seen is checked on its own, without the boundary checks. finish() returns every
+    issue found. Metrics without a rule (partials, cube cells) pass unchecked.
+
+    Args:
+        metric: PRESETS name the results belong to
+        store_dir: Metric store holding the earlier rows (default: data/metrics)
+        checks: Subset of CHECKS to run
+    """
+
+    def __init__(self, metric, store_dir=None, checks=CHECKS):
+        self.metric = metric
+        self.store_dir = store_dir
+        self.checks = tuple(checks)
+        self.rule = rule_for(metric)
+        self.rows = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self.columns = None
+        self._last = None         # (period, values) of the latest row seen
+        self._history = None      # (periods, values) of the last year of rows, sorted
+        self._stored_span = None  # (first, last) stored period, or () if not stored
+        self._found = []          # (check, rows x columns mask, periods, values, reference) per hit
+
+    def _stored(self, first_period, end_period):
+        """Stored (periods, values) of [first_period, end_period), or None"""
+        period = self.rule['period']
+        if self._stored_span is None:
+            info = metric_store.metrics(self.store_dir).get(self.metric)
+            self._stored_span = () if not info or not info['rows'] else \
+                tuple(period_numbers(pd.DatetimeIndex([info['min_date'], info['max_date']]), period))
+        # The manifest's date range saves reading partitions that can't hold the rows
+        if not self._stored_span or end_period <= self._stored_span[0] or first_period > self._stored_span[1]:
+            return None
+        start_date, end_date = period_dates([first_period, end_period], period).date
+        try:
+            stored = metric_store.read(self.metric, columns=self.columns, start_date=start_date,
+                                       end_date=end_date, store_dir=self.store_dir)
+        except (KeyError, ValueError):
+            # Not stored, or stored with other columns
+            return None
+        return (period_numbers(pd.DatetimeIndex(stored[date_column_of(stored)]), period),
+                stored[self.columns].to_numpy(dtype='float64', na_value=np.nan))
+
+    def _remember(self, periods, values):
+        """Merge a batch into the YoY history; returns the merged rows before trimming to the last year"""
+        if self._history is not None:
+            kept = ~np.isin(self._history[0], periods)
+            periods = np.concatenate([self._history[0][kept], periods])
+            values = np.vstack([self._history[1][kept], values])
+            order = np.argsort(periods, kind='stable')
+            periods, values = periods[order], values[order]
+        recent = periods >= periods[-1] - YEAR_PERIODS[self.rule['period']]
+        self._history = (periods[recent], values[recent])
+        return periods, values
+
+    def _flag(self, check, mask, periods, values, reference):
+        if mask.any():
+            self._found.append((check, mask, periods, values, reference))
+            return int(mask.sum())
+        return 0
+
+    def update(self, batch):
+        """Check a result batch; returns the number of issues it had"""
+        if self.rule is None or batch is None or len(batch) == 0:
+            return 0
+        started = time.perf_counter()
+        period = self.rule['period']
+        batch = batch.rename(columns=str.lower)
+        date_column = date_column_of(batch)
+        if self.columns is None:
+            self.columns = [col for col in batch.columns if col != date_column]
+
+        dates = pd.DatetimeIndex(pd.to_datetime(batch[date_column]))
+        order = np.argsort(dates.to_numpy(), kind='stable')
+        dates = dates[order]
+        values = np.column_stack([pd.to_numeric(batch[col], errors='coerce').to_numpy(dtype='float64',
+                                                                                       na_value=np.nan)
+                                  for col in self.columns])[order]
+        periods = period_numbers(dates, period)
+
+        if self.batches == 0:
+            stored = self._stored(periods[0] - 1, periods[0])
+            if stored is not None and len(stored[0]):
+                self._last = (periods[0] - 1, stored[1][-1])
+        previous = self._last if self._last is not None and self._last[0] < periods[0] else None
+
+        # Each row's predecessor: the carried last row for the first one
+        first_values = previous[1][None, :] if previous else np.full((1, len(self.columns)), np.nan)
+        previous_values = np.vstack([first_values, values[:-1]])
+        previous_periods = np.concatenate([[previous[0] if previous else periods[0] - 1], periods[:-1]])
+        steps = periods - previous_periods
+
+        found = 0
+        if 'range' in self.checks:
+            # NaN bounds (segments without a range) never compare true
+            ranges = [range_for(self.rule, column) or (np.nan, np.nan) for column in self.columns]
+            low, high = np.array(ranges, dtype='float64').T
+            found += self._flag('range', (values < low) | (values > high), periods, values,
+                                np.where(values < low, low, high))
+        if 'jump' in self.checks:
+            # Only between consecutive periods; a gap is flagged as such
+            mask = (np.abs(values - previous_values) > self.rule['max_step']) & (steps == 1)[:, None]
+            found += self._flag('jump', mask, periods, values, previous_values)
+        if 'gap' in self.checks:
+            # One issue per gap, dated at its first missing period, valued at its length
+            gaps = steps > 1
+            found += self._flag('gap', gaps[:, None], previous_periods + 1, (steps - 1)[:, None].astype('float64'),
+                                np.full((len(steps), 1), np.nan))
+
+        # A batch longer than a year holds some of its own references
+        history = self._remember(periods, values)
+        if 'yoy' in self.checks:
+            earlier = _year_earlier(dates, period)
+            reference = lookup_rows(*history, earlier)
+            missing = np.isnan(reference).all(axis=1)
+            if missing.any():
+                stored = self._stored(earlier[missing].min(), earlier[missing].max() + 1)
+                if stored is not None:
+                    reference[missing] = lookup_rows(*stored, earlier[missing])
+            found += self._flag('yoy', np.abs(values - reference) > self.rule['max_yoy'], periods, values,
+                                reference)
+
+        if self._last is None or periods[-1] > self._last[0]:
+            self._last = (periods[-1], values[-1])
+        self.rows += len(batch)
+        self.batches += 1
+        self.seconds += time.perf_counter() - started
+        return found
+
+    def finish(self):
+        """Every issue found so far as a DataFrame of ISSUE_COLUMNS, in date order"""
+        frames = []
+        for check, mask, periods, values, reference in self._found:
+            rows, cols = np.nonzero(mask)
+            frames.append(pd.DataFrame({
+                'check': check,
+                'severity': SEVERITY[check],
+                'column': np.asarray(self.columns if check != 'gap' else [''], dtype=object)[cols],
+                'date': period_dates(periods[rows], self.rule['period']),
+                'value': values[rows, cols],
+                'reference': reference[rows, cols],
+            }, columns=ISSUE_COLUMNS))
+        if not frames:
+            return pd.DataFrame(columns=ISSUE_COLUMNS)
+        return pd.concat(frames, ignore_index=True).sort_values(['date', 'check'], kind='stable') \
+            .reset_index(drop=True)
+
+
+def describe(issue, rule):
+    """One line for an issue row"""
+    unit = rule['period']
+    day = issue['date'].strftime('%Y-%m' if unit == 'month' else '%Y-%m-%d')
+    if issue['check'] == 'gap':
+        return f"gap    {int(issue['value'])} missing {unit}(s) from {day}"
+    if issue['check'] == 'range':
+        low, high = range_for(rule, issue['column'])
+        return f"range  {issue['column']} {day}: {issue['value']:.4g} outside {low:g}-{high:g}"
+    if issue['check'] == 'jump':
+        return (f"jump   {issue['column']} {day}: {issue['reference']:.4g} -> {issue['value']:.4g} "
+                f"from the previous {unit} (max step {rule['max_step']:g})")
+    return (f"yoy    {issue['column']} {day}: {issue['reference']:.4g} a year earlier -> {issue['value']:.4g} "
+            f"(max change {rule['max_yoy']:g})")
+
+
+def report(monitor, limit=REPORT_LIMIT):
+    """Print a monitor's issues (the first `limit` of them) and return them all"""
+    issues = monitor.finish()
+    if monitor.rule is None or monitor.batches == 0:
+        return issues
+    checked = (f"{len(monitor.columns)} column(s) x {monitor.rows} rows in {monitor.batches} batch(es), "
+               f"{monitor.seconds * 1000:.1f}ms")
+    if not len(issues):
+        print(f"🔎 {monitor.metric}: no anomalies ({checked})")
+        return issues
+
+    counts = issues.groupby('check', sort=False).size()
+    summary = ', '.join(f"{check} {counts[check]}" + (' (error)' if SEVERITY[check] == 'error' else '')
+                        for check in CHECKS if check in counts)
+    print(f"⚠️ {monitor.metric}: {len(issues)} issue(s): {summary} ({checked})")
+    # Errors first, then warnings, each in date order
+    shown = issues.sort_values('severity', kind='stable').head(limit)
+    for _, issue in shown.iterrows():
+        print(f"   {describe(issue, monitor.rule)}")
+    if len(issues) > limit:
+        print(f"   ... {len(issues) - limit} more (python anomaly_checks.py check {monitor.metric})")
+    return issues
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the stored chart metrics for anomalies')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('rules', help='List the checks of each chart template')
+
+    check_parser = subparsers.add_parser('check', help='Check a stored metric, a month partition at a time')
+    check_parser.add_argument('metric', help='Named query (see sql_templates.py list)')
+    check_parser.add_argument('--start-date', help='First day, YYYY-MM-DD (inclusive)')
+    check_parser.add_argument('--end-date', help='Last day, YYYY-MM-DD (exclusive)')
+    check_parser.add_argument('--checks', default=','.join(CHECKS),
+                              help=f"Comma-separated checks (default: {','.join(CHECKS)})")
+    check_parser.add_argument('--limit', type=int, default=50, help='Issues to print')
+    check_parser.add_argument('--local', action='store_true', help='Check the local store')
+    args = parser.parse_args(argv)
+
+    if args.command == 'rules':
+        print(f"{'Template':<44} {'Period':<7} {'Max step':>9} {'Max YoY':>8}  Ranges")
+        for template, rule in RULES.items():
+            ranges = ', '.join(f"{segment} {low:g}-{high:g}" for segment, (low, high) in rule['ranges'].items())
+            print(f"{template:<44} {rule['period']:<7} {rule['max_step']:>9g} {rule['max_yoy']:>8g}  {ranges}")
+        return 0
+
+    if rule_for(args.metric) is None:
+        print(f"❌ No checks for {args.metric!r}; checked: "
+              f"{', '.join(name for name in PRESETS if rule_for(name))}")
+        return 1
+    checks = [check.strip() for check in args.checks.split(',')]
+    unknown = set(checks) - set(CHECKS)
+    if unknown:
+        print(f"❌ Unknown check(s) {', '.join(sorted(unknown))}; known: {', '.join(CHECKS)}")
+        return 1
+
+    store_dir = None
+    if args.local:
+        import local_backend
+        store_dir = local_backend.METRICS_DIR
+    try:
+        df = metric_store.read(args.metric, start_date=args.start_date, end_date=args.end_date,
+                               store_dir=store_dir)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        return 1
+
+    monitor = AnomalyMonitor(args.metric, store_dir=store_dir, checks=checks)
+    date_column = date_column_of(df)
+    for _, batch in df.groupby(df[date_column].dt.strftime('%Y-%m'), sort=True):
+        monitor.update(batch)
+    issues = report(monitor, limit=args.limit)
+    return 1 if (issues['severity'] == 'error').any() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Asynchronous query submission with a resumable run journal
+
+execute_query holds the process (and a connection) for as long as the warehouse runs
+the statement, up to an hour, and nothing survives if the process dies or the laptop
+sleeps. Here queries are submitted with cursor.execute_async(), which returns as soon as
+Snowflake has a query ID, and every ID is saved in a run journal:
+
+    data/query_runs/<run_id>.json
+    {"run_id": "...", "backend": "snowflake", "created_at": "...",
+     "queries": {"soft_churn": {"query_id": "01b9...", "status": "running",
+                                "sql": "...", "params": [...], "submitted_at": "...", ...}}}
+
+collect() polls the submitted queries with exponential backoff (POLL_INITIAL_SECONDS up
+to POLL_MAX_SECONDS) and fetches each finished result by its query ID with
+cursor.get_results_from_sfqid(), so a later invocation picks up the results instead of
+re-executing. Snowflake keeps results for RESULT_RETENTION_HOURS; fetched results are
+also written next to the journal (data/query_runs/<run_id>/<name>.parquet), so collecting
+twice never goes back to the warehouse. Queries that failed or whose results expired can
+be resubmitted from the SQL kept in the journal.
+
+Statuses: submitted -> running -> succeeded -> fetched, or failed / expired.
+
+Connections without execute_async (the local DuckDB backend) run the query at submit
+time and store the result straight away, so the same journal works offline.
+
+Usage:
+    python async_queries.py submit soft_churn_r7 spot_allocation_r7 --start-date 2023-01-01
+    python async_queries.py list
+    python async_queries.py status 20251201-093000-1a2b3c
+    python async_queries.py collect 20251201-093000-1a2b3c --timeout 3600
+    python async_queries.py resubmit 20251201-093000-1a2b3c
+"""
+import sys
+import os
+import json
+import time
+import uuid
+import argparse
+from datetime import datetime, timedelta
+import pandas as pd
+
+import snowflake_connection
+from snowflake_connection import BACKENDS, close_connection, get_pool, use_backend
+from sql_templates import PRESETS, TemplateError, render_preset
+import query_metrics
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+RUNS_DIR = os.path.join(PROJECT_ROOT, 'data', 'query_runs')
+
+# Poll intervals: start short, multiply by POLL_BACKOFF after every round, cap at POLL_MAX_SECONDS
+POLL_INITIAL_SECONDS = 2.0
+POLL_MAX_SECONDS = 60.0
+POLL_BACKOFF = 1.5
+
+# Snowflake keeps a query's result for 24 hours
+RESULT_RETENTION_HOURS = 24
+
+PENDING_STATUSES = ('submitted', 'running')
+DONE_STATUSES = ('succeeded', 'fetched')
+RETRY_STATUSES = ('failed', 'expired')
+
+# Entry fields written by this module; anything else is a caller's label
+JOURNAL_FIELDS = ('sql', 'params', 'query_id', 'status', 'error', 'submitted_at', 'finished_at', 'fetched_at', 'rows')
+
+
+def _runs_dir(runs_dir):
+    return runs_dir or RUNS_DIR
+
+
+def _journal_path(run_id, runs_dir=None):
+    return os.path.join(_runs_dir(runs_dir), f"{run_id}.json")
+
+
+def _result_path(run, name, runs_dir=None):
+    return os.path.join(_runs_dir(runs_dir), run['run_id'], f"{name}.parquet")
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def save_run(run, runs_dir=None):
+    """Write the journal atomically"""
+    path = _journal_path(run['run_id'], runs_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(run, f, indent=2, sort_keys=True, default=str)
+    os.replace(tmp_path, path)
+
+
+def load_run(run_id, runs_dir=None):
+    """Read a run journal; raises KeyError if there is none"""
+    path = _journal_path(run_id, runs_dir)
+    if not os.path.exists(path):
+        raise KeyError(f"No run journal {run_id!r} in {_runs_dir(runs_dir)}")
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_runs(runs_dir=None):
+    """All run journals, oldest first"""
+    directory = _runs_dir(runs_dir)
+    if not os.path.isdir(directory):
+        return []
+    return [load_run(name[:-len('.json')], runs_dir)
+            for name in sorted(os.listdir(directory)) if name.endswith('.json')]
+
+
+def _status_name(status):
+    """QueryStatus enum (or a stand-in's string) as a plain name"""
+    return getattr(status, 'name', str(status))
+
+
+def _fetch_dataframe(cursor, record):
+    """Whole result of an executed cursor as one DataFrame (Arrow-backed when available)"""
+    with record.phase('fetch'):
+        batches = list(snowflake_connection._iter_cursor_batches(cursor, fetch_mode='pandas'))
+    with record.phase('dataframe'):
+        if batches:
+            df = pd.concat(batches, ignore_index=True)
+        else:
+            df = pd.DataFrame(columns=[col[0] for col in cursor.description or []])
+    record.set_result(df)
+    return df
+
+
+def _store_result(run, name, df, runs_dir=None):
+    path = _result_path(run, name, runs_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+    entry = run['queries'][name]
+    entry.update(status='fetched', rows=len(df), fetched_at=_now())
+
+
+def submit(queries, params=None, run_id=None, runs_dir=None, timeout_seconds=3600, labels=None):
+    """
+    Submit queries without waiting for them and journal their query IDs
+
+    Args:
+        queries: Dict of query name -> SQL string
+        params: Optional dict of query name -> bind values for that query's ? placeholders
+        run_id: Add the queries to this run (default: a new run)
+        runs_dir: Journal location (default: data/query_runs)
+        timeout_seconds: Statement timeout for the submitted queries
+        labels: Optional dict of query name -> extra fields to journal with it (e.g. {'preset': ...})
+
+    Returns:
+        The run journal (dict); its 'run_id' is what collect() and --resume take
+    """
+    params = params or {}
+    labels = labels or {}
+    if run_id is None:
+        run = {'run_id': f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}",
+               'backend': snowflake_connection.get_backend(), 'created_at': _now(), 'queries': {}}
+    else:
+        run = load_run(run_id, runs_dir)
+    save_run(run, runs_dir)
+
+    pool = get_pool()
+    for name, query in queries.items():
+        record = query_metrics.QueryRecord('submit', name=name, query=query, params=params.get(name),
+                                           backend=run['backend'])
+        conn = snowflake_connection._acquire(pool, record)
+        discard = False
+        cursor = conn.cursor()
+        try:
+            with record.phase('alter_session'):
+                snowflake_connection._set_statement_timeout(conn, cursor, timeout_seconds, pool)
+            entry = {**labels.get(name, {}), 'sql': query, 'params': params.get(name), 'submitted_at': _now(),
+                     'error': None}
+            with record.phase('execute'):
+                if hasattr(cursor, 'execute_async'):
+                    cursor.execute_async(query, params.get(name))
+                    entry.update(query_id=cursor.sfqid, status='submitted')
+                else:
+                    # No async execution on this connection: run now and keep the result
+                    if params.get(name) is None:
+                        cursor.execute(query)
+                    else:
+                        cursor.execute(query, params.get(name))
+                    entry.update(query_id=getattr(cursor, 'sfqid', None), status='succeeded')
+            record.set_cursor(cursor)
+            run['queries'][name] = entry
+            if entry['status'] == 'succeeded':
+                _store_result(run, name, _fetch_dataframe(cursor, record), runs_dir)
+            save_run(run, runs_dir)
+            record.finish()
+            query_id = f" as {entry['query_id']}" if entry['query_id'] else ""
+            print(f"📤 [{name}] submitted{query_id}")
+        except Exception as e:
+            discard = snowflake_connection._should_discard(e)
+            record.finish('error', e)
+            run['queries'][name] = {**labels.get(name, {}), 'sql': query, 'params': params.get(name),
+                                    'submitted_at': _now(),
+                                    'query_id': None, 'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+            save_run(run, runs_dir)
+            print(f"❌ [{name}] could not be submitted: {e}")
+        finally:
+            cursor.close()
+            pool.release(conn, discard=discard)
+
+    print(f"📒 Run {run['run_id']}: {len(queries)} quer{'y' if len(queries) == 1 else 'ies'} journaled in "
+          f"{_journal_path(run['run_id'], runs_dir)}")
+    return run
+
+
+def poll(run, runs_dir=None):
+    """
+    Check the status of every pending query once and journal any change
+
+    Returns:
+        Dict of query name -> status
+    """
+    pending = {name: entry for name, entry in run['queries'].items() if entry['status'] in PENDING_STATUSES}
+    if pending:
+        pool = get_pool()
+        with pool.connection() as conn:
+            changed = False
+            for name, entry in pending.items():
+                status = conn.get_query_status(entry['query_id'])
+                if conn.is_still_running(status):
+                    new_status, error = 'running', None
+                elif conn.is_an_error(status):
+                    new_status, error = 'failed', _status_name(status)
+                elif _status_name(status) == 'NO_DATA':
+                    # Not registered yet right after submission, or purged after the retention period
+                    submitted = datetime.fromisoformat(entry['submitted_at'])
+                    expired = datetime.now() - submitted > timedelta(hours=RESULT_RETENTION_HOURS)
+                    new_status, error = ('expired', 'result no longer available') if expired else (entry['status'], None)
+                else:
+                    new_status, error = 'succeeded', None
+                if new_status != entry['status']:
+                    entry.update(status=new_status, error=error, **({'finished_at': _now()}
+                                                                    if new_status not in PENDING_STATUSES else {}))
+                    changed = True
+            if changed:
+                save_run(run, runs_dir)
+    return {name: entry['status'] for name, entry in run['queries'].items()}
+
+
+def fetch(run, name, runs_dir=None):
+    """
+    Result of a finished query, by query ID (or from the copy stored by an earlier fetch)
+
+    Returns:
+        DataFrame
+    """
+    entry = run['queries'][name]
+    path = _result_path(run, name, runs_dir)
+    if entry['status'] == 'fetched' and os.path.exists(path):
+        return pd.read_parquet(path)
+    if entry['status'] not in DONE_STATUSES:
+        raise RuntimeError(f"{name} is {entry['status']}, not finished")
+
+    record = query_metrics.QueryRecord('fetch', name=name, query=entry['sql'], params=entry['params'],
+                                       backend=run['backend'])
+    pool = get_pool()
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.get_results_from_sfqid(entry['query_id'])
+                record.set_cursor(cursor)
+                df = _fetch_dataframe(cursor, record)
+            finally:
+                cursor.close()
+    except Exception as e:
+        record.finish('error', e)
+        raise
+    record.finish()
+    _store_result(run, name, df, runs_dir)
+    save_run(run, runs_dir)
+    return df
+
+
+def collect(run, timeout_seconds=None, runs_dir=None, initial_interval=POLL_INITIAL_SECONDS,
+            max_interval=POLL_MAX_SECONDS):
+    """
+    Wait for the run's queries with backoff and fetch every result
+
+    Safe to interrupt: the journal keeps the query IDs, so calling collect() again later
+    (in another process) continues where this one stopped.
+
+    Args:
+        run: Run journal (from submit() or load_run())
+        timeout_seconds: Stop waiting after this long and return what has finished (None = no limit)
+        runs_dir: Journal location
+        initial_interval / max_interval: First and largest sleep between status checks
+
+    Returns:
+        Tuple (results, errors): dict of query name -> DataFrame, and dict of query name ->
+        error message for failed, expired or still-pending queries
+    """
+    results = {}
+    errors = {}
+    started = time.perf_counter()
+    interval = initial_interval
+    while True:
+        statuses = poll(run, runs_dir)
+        for name, status in statuses.items():
+            if status in DONE_STATUSES and name not in results and name not in errors:
+                try:
+                    results[name] = fetch(run, name, runs_dir)
+                    print(f"✓ [{name}] retrieved {len(results[name])} rows")
+                except Exception as e:
+                    print(f"❌ [{name}] could not be fetched: {e}")
+                    errors[name] = str(e)
+            elif status in RETRY_STATUSES and name not in errors:
+                errors[name] = f"{status}: {run['queries'][name].get('error')}"
+                print(f"❌ [{name}] {errors[name]}")
+        pending = [name for name, status in statuses.items() if status in PENDING_STATUSES]
+        if not pending:
+            break
+        elapsed = time.perf_counter() - started
+        if timeout_seconds is not None and elapsed >= timeout_seconds:
+            for name in pending:
+                errors[name] = f"still {statuses[name]} after {elapsed:.0f}s"
+            print(f"⏸️ {len(pending)} quer{'y' if len(pending) == 1 else 'ies'} still running; "
+                  f"resume with run ID {run['run_id']}")
+            break
+        wait = interval if timeout_seconds is None else min(interval, timeout_seconds - elapsed)
+        print(f"⏳ Waiting on {', '.join(pending)} ({elapsed:.0f}s elapsed, next check in {wait:.1f}s)")
+        time.sleep(wait)
+        interval = min(interval * POLL_BACKOFF, max_interval)
+
+    print(f"✓ {len(results)}/{len(run['queries'])} queries collected for run {run['run_id']}")
+    return results, errors
+
+
+def resubmit(run, names=None, runs_dir=None, timeout_seconds=3600):
+    """
+    Submit failed or expired queries of a run again, from the SQL kept in the journal
+
+    Args:
+        names: Queries to resubmit (default: every failed or expired one)
+
+    Returns:
+        The updated run journal
+    """
+    names = names or [name for name, entry in run['queries'].items() if entry['status'] in RETRY_STATUSES]
+    if not names:
+        print(f"✓ Nothing to resubmit in run {run['run_id']}")
+        return run
+    queries = {name: run['queries'][name]['sql'] for name in names}
+    params = {name: run['queries'][name]['params'] for name in names}
+    labels = {name: {key: value for key, value in run['queries'][name].items() if key not in JOURNAL_FIELDS}
+              for name in names}
+    return submit(queries, params=params, run_id=run['run_id'], runs_dir=runs_dir, timeout_seconds=timeout_seconds,
+                  labels=labels)
+
+
+def print_status(run):
+    """Print one line per query of a run"""
+    print(f"Run {run['run_id']} ({run['backend']}, created {run['created_at']})")
+    for name, entry in run['queries'].items():
+        detail = f" - {entry['error']}" if entry.get('error') else (f" - {entry['rows']} rows" if 'rows' in entry else "")
+        print(f"  {name:<32} {entry['status']:<10} {entry.get('query_id') or '':<40}{detail}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Submit queries asynchronously and collect them later by query ID')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    submit_parser = subparsers.add_parser('submit', help='Submit named queries and exit')
+    submit_parser.add_argument('presets', nargs='+', help=f"Named queries ({', '.join(PRESETS)})")
+    submit_parser.add_argument('--start-date', help='Override the first day, YYYY-MM-DD (inclusive)')
+    submit_parser.add_argument('--end-date', help='Override the last day, YYYY-MM-DD (exclusive)')
+    submit_parser.add_argument('--backend', choices=BACKENDS, default='snowflake',
+                               help='Submit to the warehouse or run on the local DuckDB extract')
+    submit_parser.add_argument('--wait', action='store_true', help='Collect the results before exiting')
+
+    subparsers.add_parser('list', help='List the run journals')
+    for command, help_text in (('status', 'Check and print the status of a run'),
+                               ('collect', 'Wait for a run and fetch its results'),
+                               ('resubmit', 'Submit the failed or expired queries of a run again')):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument('run_id')
+    subparsers.choices['collect'].add_argument('--timeout', type=float,
+                                               help='Stop waiting after this many seconds')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'list':
+            runs = list_runs()
+            if not runs:
+                print(f"No runs in {RUNS_DIR}")
+            for run in runs:
+                counts = pd.Series([entry['status'] for entry in run['queries'].values()]).value_counts()
+                print(f"  {run['run_id']:<26} {run['backend']:<10} "
+                      f"{', '.join(f'{count} {status}' for status, count in counts.items())}")
+            return 0
+
+        if args.command == 'submit':
+            use_backend(args.backend)
+            queries, params = {}, {}
+            for preset in args.presets:
+                queries[preset], params[preset] = render_preset(preset, start_date=args.start_date,
+                                                                end_date=args.end_date)
+            run = submit(queries, params=params, labels={preset: {'preset': preset} for preset in queries})
+            if not args.wait:
+                print(f"\nCollect with: python async_queries.py collect {run['run_id']}")
+                return 0
+            _, errors = collect(run)
+            return 1 if errors else 0
+
+        run = load_run(args.run_id)
+        use_backend(run['backend'])
+        if args.command == 'status':
+            poll(run)
+            print_status(run)
+            return 0
+        if args.command == 'resubmit':
+            resubmit(run)
+            return 0
+        results, errors = collect(run, timeout_seconds=args.timeout)
+        for name, df in results.items():
+            print(f"\n{name}: {len(df)} rows (stored in {_result_path(run, name)})")
+            print(df.tail(5).to_string(index=False))
+        return 1 if errors else 0
+    except (KeyError, TemplateError) as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        close_connection()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+"""
+Benchmark the metric pipeline on synthetic data
+
+Generates the five source tables at a chosen scale (synthetic_data.py), writes them as
+a local extract and runs every stage of the pipeline on the local DuckDB backend,
+timing each one:
+
+    generate      synthetic source tables written as the extract
+    render_sql    sql_templates.render_preset
+    execute       the query in DuckDB (cursor.execute)
+    fetch         cursor.fetchall()
+    dataframe     typed DataFrame construction from the fetched rows (result_types.typed_frame)
+    checks        anomaly_checks.AnomalyMonitor over the result (range, jump, YoY, gap)
+    store         metric_store.write (upsert into month partitions)
+    combine       metric_store.read of the stored window (what combine_* scripts do)
+    render_table  the runner's display_results table
+    split         schedule_metrics.split of the single-scan 09_schedule_metrics_combined.sql
+                  result (execute/fetch target 'schedule_metrics'), to compare with the
+                  separate spot allocation and disabled schedules queries
+    rolling       08_soft_churn_venue_days.sql pulled as Arrow batches and run through
+                  the rolling distinct-count engine (rolling_distinct.py)
+    startup       cold start of a fresh interpreter for the light commands (STARTUP_COMMANDS:
+                  cli.py --help / list, a runner's --help, import snowflake_connection), so
+                  an import that creeps back to module level shows up as a regression
+
+For every stage it records seconds (best and median over --repeat runs), rows
+processed, throughput and peak resident memory, and appends the run to
+data/benchmarks/history.jsonl, so wins and regressions can be compared across commits
+with `compare`.
+
+Usage:
+    python benchmark.py run --scale small
+    python benchmark.py run --venues 50000 --years 2 --repeat 3 --label "after pool change"
+    python benchmark.py startup --repeat 5
+    python benchmark.py history
+    python benchmark.py compare --threshold 0.1
+"""
+import sys
+import os
+import io
+import json
+import time
+import uuid
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import statistics
+import contextlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+BENCHMARK_DIR = os.path.join(PROJECT_ROOT, 'data', 'benchmarks')
+HISTORY_PATH = os.path.join(BENCHMARK_DIR, 'history.jsonl')
+
+# Named scales: venues and days of history
+SCALES = {
+    'small': {'venues': 2_000, 'days': 90},
+    'medium': {'venues': 10_000, 'days': 365},
+    'large': {'venues': 100_000, 'days': 730},
+    'xl': {'venues': 500_000, 'days': 1825},
+}
+DEFAULT_START_DATE = '2023-01-01'
+
+# Chart queries benchmarked by default (sql_templates.PRESETS names)
+DEFAULT_PRESETS = ['spot_allocation_r7', 'disabled_schedules_r7', 'soft_churn_r7',
+                   'spot_allocation_monthly', 'disabled_schedules_monthly', 'soft_churn_monthly']
+
+# Fact rows are generated in blocks of about this many venue-days, to bound memory
+BLOCK_VENUE_DAYS = 2_000_000
+
+RSS_SAMPLE_SECONDS = 0.01
+
+# Commands timed by the startup stage: target -> python arguments, run from scripts/
+STARTUP_COMMANDS = {
+    'cli --help': ['cli.py', '--help'],
+    'cli list': ['cli.py', 'list'],
+    'runner --help': ['run_rolling_7day_queries.py', '--help'],
+    'import snowflake_connection': ['-c', 'import snowflake_connection'],
+}
+
+
+def _rss_bytes():
+    """Current resident set size, or None where /proc isn't available"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class PeakMemory:
+    """
+    Context manager sampling RSS in a background thread
+
+    Captures native allocations (DuckDB, Arrow, NumPy) as well as Python objects.
+    After the block, .peak_mb is the highest RSS seen and .delta_mb how far it rose
+    above the starting RSS (None for both where RSS can't be read).
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak_mb = None
+        self.delta_mb = None
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            rss = _rss_bytes()
+            if rss is not None and rss > self._peak:
+                self._peak = rss
+
+    def __enter__(self):
+        self._start = _rss_bytes()
+        if self._start is None:
+            return self
+        self._peak = self._start
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._start is None:
+            return
+        self._done.set()
+        self._thread.join()
+        self._peak = max(self._peak, _rss_bytes() or 0)
+        self.peak_mb = round(self._peak / 2**20, 1)
+        self.delta_mb = round((self._peak - self._start) / 2**20, 1)
+
+
+class StageTimer:
+    """Collects per-stage timings, row counts and memory for one benchmark run"""
+
+    def __init__(self):
+        self.samples = {}   # (stage, target) -> list of (seconds, rows, peak_mb, delta_mb)
+
+    @contextlib.contextmanager
+    def stage(self, name, target='', rows=None):
+        """
+        Time a block; set result['rows'] inside the block if rows isn't known up front
+        """
+        result = {'rows': rows}
+        with PeakMemory() as memory:
+            started = time.perf_counter()
+            yield result
+            seconds = time.perf_counter() - started
+        self.samples.setdefault((name, target), []).append(
+            (seconds, result['rows'], memory.peak_mb, memory.delta_mb))
+
+    def records(self):
+        """One dict per (stage, target) with best/median seconds, throughput and memory"""
+        records = []
+        for (name, target), samples in self.samples.items():
+            seconds = [s[0] for s in samples]
+            rows = samples[-1][1]
+            best = min(seconds)
+            peaks = [s[2] for s in samples if s[2] is not None]
+            deltas = [s[3] for s in samples if s[3] is not None]
+            records.append({
+                'stage': name,
+                'target': target,
+                'runs': len(samples),
+                'seconds': round(best, 6),
+                'median_seconds': round(statistics.median(seconds), 6),
+                'rows': rows,
+                'rows_per_second': round(rows / best) if rows and best > 0 else None,
+                'peak_rss_mb': max(peaks) if peaks else None,
+                'rss_delta_mb': max(deltas) if deltas else None,
+            })
+        return records
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _versions():
+    versions = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__}
+    for module in ('duckdb', 'pyarrow'):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return versions
+
+
+def generate_extract(local_dir, n_venues, n_days, start_date, seed=0, schedules_per_venue_day=3.0):
+    """
+    Write a synthetic extract of n_venues x n_days block by block
+
+    Returns:
+        Dict of table name -> rows written
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import local_backend
+    from synthetic_data import dimension_tables, fact_tables
+
+    os.makedirs(local_dir, exist_ok=True)
+    dimensions = dimension_tables(n_venues, start_date=start_date, seed=seed)
+    venue_ids = dimensions['partner_details']['venue_id'].to_numpy()
+
+    row_counts = {}
+    for table, df in dimensions.items():
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), os.path.join(local_dir, f'{table}.parquet'))
+        row_counts[table] = len(df)
+
+    block_days = max(1, BLOCK_VENUE_DAYS // n_venues)
+    writers = {}
+    next_schedule_id = 1
+    try:
+        for block, offset in enumerate(range(0, n_days, block_days)):
+            facts = fact_tables(venue_ids, start_date=start_date + timedelta(days=offset),
+                                n_days=min(block_days, n_days - offset),
+                                schedules_per_venue_day=schedules_per_venue_day,
+                                first_schedule_id=next_schedule_id, seed=(seed, block))
+            next_schedule_id += len(facts['sched_schedules'])
+            for table, df in facts.items():
+                arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+                if table not in writers:
+                    writers[table] = pq.ParquetWriter(os.path.join(local_dir, f'{table}.parquet'),
+                                                      arrow_table.schema)
+                writers[table].write_table(arrow_table.cast(writers[table].schema))
+                row_counts[table] = row_counts.get(table, 0) + len(df)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    local_backend.record_extract(local_dir, start_date + timedelta(days=local_backend.LOOKBACK_DAYS),
+                                  start_date + timedelta(days=n_days), row_counts,
+                                  source=f'benchmark (venues={n_venues}, days={n_days}, seed={seed})')
+    return row_counts
+
+
+def _input_table(template):
+    return 'venue_adds_and_churns' if 'soft_churn' in template else 'sched_schedules'
+
+
+def _display_results(preset):
+    """The runner's display_results for a preset (rolling or monthly)"""
+    if preset.endswith('_r7'):
+        from run_rolling_7day_queries import QUERIES, display_results
+    else:
+        from run_all_queries_by_tenure import QUERIES, display_results
+    query_names = {preset_name: query_name for query_name, preset_name in QUERIES.items()}
+    return query_names.get(preset), display_results
+
+
+def benchmark_query(timer, conn, preset, start_date, end_date, input_rows, store_dir):
+    """Run one preset through render -> execute -> fetch -> DataFrame -> checks -> store -> combine -> table"""
+    import anomaly_checks
+    import metric_store
+    import result_types
+    from sql_templates import PRESETS, render_preset
+
+    with timer.stage('render_sql', preset, rows=1):
+        sql, params = render_preset(preset, start_date=start_date, end_date=end_date)
+
+    cursor = conn.cursor()
+    with timer.stage('execute', preset, rows=input_rows[_input_table(PRESETS[preset]['template'])]):
+        cursor.execute(sql, params)
+    with timer.stage('fetch', preset) as stage:
+        rows = cursor.fetchall()
+        stage['rows'] = len(rows)
+    with timer.stage('dataframe', preset, rows=len(rows)):
+        df = result_types.typed_frame(rows, cursor.description)
+    df.columns = df.columns.str.lower()
+    cursor.close()
+
+    with timer.stage('checks', preset, rows=len(df)):
+        anomaly_checks.AnomalyMonitor(preset, store_dir=store_dir).update(df)
+    with timer.stage('store', preset, rows=len(df)):
+        metric_store.write(preset, df, source='benchmark.py', store_dir=store_dir)
+    with timer.stage('combine', preset, rows=len(df)):
+        metric_store.read(preset, start_date=start_date, end_date=end_date, store_dir=store_dir)
+
+    query_name, display_results = _display_results(preset)
+    if query_name:
+        with timer.stage('render_table', preset, rows=len(df)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                display_results(query_name, df)
+
+
+def benchmark_combined(timer, conn, start_date, end_date, input_rows):
+    """Run 09_schedule_metrics_combined.sql once and split it into every spot allocation / disabled output"""
+    import schedule_metrics
+    from sql_templates import SEGMENTS, render
+
+    segments = list(SEGMENTS)
+    sql, params = render(schedule_metrics.TEMPLATE, segments=segments, start_date=start_date, end_date=end_date)
+    cursor = conn.cursor()
+    with timer.stage('execute', 'schedule_metrics', rows=input_rows['sched_schedules']):
+        cursor.execute(sql, params)
+    with timer.stage('fetch', 'schedule_metrics') as stage:
+        rows = cursor.fetchall()
+        stage['rows'] = len(rows)
+    df = pd.DataFrame(rows, columns=[col[0].lower() for col in cursor.description])
+    cursor.close()
+    with timer.stage('split', 'schedule_metrics', rows=len(df)):
+        schedule_metrics.split(df, segments)
+
+
+def benchmark_rolling(timer, conn, start_date, end_date):
+    """Pull venue-day rows as Arrow batches and run the rolling distinct-count engine"""
+    from rolling_distinct import soft_churn_r7_partials, soft_churn_r7_rates
+    from sql_templates import render
+
+    sql, params = render('08_soft_churn_venue_days.sql', start_date=start_date, end_date=end_date)
+    cursor = conn.cursor()
+    with timer.stage('execute', 'venue_days') as stage:
+        cursor.execute(sql, params)
+        stage['rows'] = None
+    with timer.stage('fetch', 'venue_days') as stage:
+        batches = list(cursor.fetch_pandas_batches())
+        rows = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+        rows.columns = rows.columns.str.lower()
+        stage['rows'] = len(rows)
+    cursor.close()
+    with timer.stage('rolling', 'soft_churn_r7', rows=len(rows)):
+        soft_churn_r7_rates(soft_churn_r7_partials(rows))
+
+
+def benchmark_startup(timer, commands=None):
+    """Time each command in a fresh interpreter (best of the passes is recorded)"""
+    env = dict(os.environ, QUERY_LOG_PATH='off')
+    for target, args in (commands or STARTUP_COMMANDS).items():
+        with timer.stage('startup', target):
+            subprocess.run([sys.executable] + args, cwd=SCRIPT_DIR, env=env, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _record_run(timer, scale, input_rows, started, label=None, history_path=None):
+    """Build the run record from the timer and append it to the history"""
+    records = timer.records()
+    peaks = [r['peak_rss_mb'] for r in records if r['peak_rss_mb'] is not None]
+    run = {
+        'run_id': uuid.uuid4().hex[:12],
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'label': label,
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'versions': _versions(),
+        'scale': scale,
+        'input_rows': input_rows,
+        'stages': records,
+        'total_seconds': round(time.perf_counter() - started, 3),
+        'peak_rss_mb': max(peaks) if peaks else None,
+    }
+
+    history_path = history_path or HISTORY_PATH
+    os.makedirs(os.path.dirname(history_path), exist_ok=True)
+    with open(history_path, 'a') as f:
+        f.write(json.dumps(run, sort_keys=True) + '\n')
+    return run
+
+
+def run_startup_benchmark(repeat=5, label=None, history_path=None):
+    """
+    Time only the startup stage and append the run to the history
+
+    Recorded with a zero scale (no venues, no days), so `compare` pairs it with the
+    previous startup-only run.
+    """
+    timer = StageTimer()
+    started = time.perf_counter()
+    for attempt in range(repeat):
+        print(f"⏳ Pass {attempt + 1}/{repeat}")
+        benchmark_startup(timer)
+    scale = {'venues': 0, 'days': 0, 'start_date': None, 'seed': 0, 'repeat': repeat, 'presets': []}
+    return _record_run(timer, scale, {}, started, label=label, history_path=history_path)
+
+
+def run_benchmark(n_venues, n_days, start_date=DEFAULT_START_DATE, presets=None, repeat=1, seed=0,
+                  data_dir=None, label=None, history_path=None):
+    """
+    Generate data at the given scale, benchmark every stage and append the run to the history
+
+    Args:
+        n_venues: Venues in the synthetic extract
+        n_days: Days of history
+        start_date: First day of the synthetic history
+        presets: Named queries to benchmark (default: DEFAULT_PRESETS)
+        repeat: Times to run the query stages; the best and median are recorded
+        seed: Random seed for the synthetic data
+        data_dir: Where to write the extract and store; reused if it already holds an
+            extract of this scale (default: a temporary directory, removed afterwards)
+        label: Free-text note saved with the run
+        history_path: JSON-lines history file (default: data/benchmarks/history.jsonl)
+
+    Returns:
+        The run record that was appended to the history
+    """
+    import local_backend
+
+    presets = presets or DEFAULT_PRESETS
+    start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    query_start = start + timedelta(days=local_backend.LOOKBACK_DAYS)
+    end = start + timedelta(days=n_days)
+    work_dir = data_dir or tempfile.mkdtemp(prefix='benchmark-')
+    local_dir = os.path.join(work_dir, 'extract')
+    store_dir = os.path.join(work_dir, 'metrics')
+    source = f'benchmark (venues={n_venues}, days={n_days}, seed={seed})'
+
+    # Every run upserts into an empty store, so store timings are comparable
+    shutil.rmtree(store_dir, ignore_errors=True)
+
+    timer = StageTimer()
+    started = time.perf_counter()
+    try:
+        manifest = local_backend.load_extract_manifest(local_dir)
+        if manifest and manifest.get('source') == source and manifest.get('start_date') == query_start.isoformat():
+            print(f"♻️ Reusing extract in {local_dir}")
+            input_rows = {table: info['rows'] for table, info in manifest['tables'].items()}
+        else:
+            print(f"⏳ Generating {n_venues:,} venues x {n_days} days...")
+            with timer.stage('generate', 'extract') as stage:
+                input_rows = generate_extract(local_dir, n_venues, n_days, start, seed=seed)
+                stage['rows'] = sum(input_rows.values())
+            print(f"✓ Generated {sum(input_rows.values()):,} rows "
+                  f"({input_rows['sched_schedules']:,} schedules, {input_rows['venue_adds_and_churns']:,} venue-days)")
+
+        conn = local_backend.connect(local_dir)
+        try:
+            for attempt in range(repeat):
+                print(f"⏳ Pass {attempt + 1}/{repeat}")
+                for preset in presets:
+                    benchmark_query(timer, conn, preset, query_start.isoformat(), end.isoformat(), input_rows,
+                                    store_dir)
+                benchmark_combined(timer, conn, query_start.isoformat(), end.isoformat(), input_rows)
+                benchmark_rolling(timer, conn, query_start.isoformat(), end.isoformat())
+                benchmark_startup(timer)
+        finally:
+            conn.close()
+    finally:
+        if data_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    scale = {'venues': n_venues, 'days': n_days, 'start_date': start.isoformat(), 'seed': seed,
+             'repeat': repeat, 'presets': presets}
+    return _record_run(timer, scale, input_rows, started, label=label, history_path=history_path)
+
+
+def load_history(history_path=None):
+    """Return every recorded run, oldest first"""
+    history_path = history_path or HISTORY_PATH
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _scale_key(run):
+    scale = run['scale']
+    return (scale['venues'], scale['days'], scale['seed'])
+
+
+def stage_totals(run):
+    """Total best-of seconds per stage across targets"""
+    totals = {}
+    for record in run['stages']:
+        totals[record['stage']] = totals.get(record['stage'], 0.0) + record['seconds']
+    return totals
+
+
+def compare_runs(baseline, current, threshold=0.1):
+    """
+    Compare two runs stage by stage
+
+    Returns:
+        List of (stage, target, baseline seconds, current seconds, relative change, flag)
+        where flag is 'regression', 'improvement' or ''
+    """
+    before = {(r['stage'], r['target']): r['seconds'] for r in baseline['stages']}
+    rows = []
+    for record in current['stages']:
+        key = (record['stage'], record['target'])
+        if key not in before or before[key] <= 0:
+            continue
+        change = record['seconds'] / before[key] - 1
+        flag = 'regression' if change > threshold else 'improvement' if change < -threshold else ''
+        rows.append((record['stage'], record['target'], before[key], record['seconds'], change, flag))
+    return rows
+
+
+def print_run(run):
+    print(f"\n{'='*100}")
+    scale = run['scale']
+    print(f"Benchmark {run['run_id']} @ {run['commit'] or 'unknown commit'}: {scale['venues']:,} venues x "
+          f"{scale['days']} days, best of {scale['repeat']}")
+    print(f"{'='*100}")
+    print(f"{'Stage':<13} {'Target':<28} {'Seconds':>9} {'Median':>9} {'Rows':>12} {'Rows/s':>13} {'Peak MB':>9}")
+    print("-" * 100)
+    for r in run['stages']:
+        print(f"{r['stage']:<13} {r['target']:<28} {r['seconds']:>9.4f} {r['median_seconds']:>9.4f} "
+              f"{r['rows'] if r['rows'] is not None else '':>12} {r['rows_per_second'] or '':>13} "
+              f"{r['peak_rss_mb'] if r['peak_rss_mb'] is not None else '':>9}")
+    print("-" * 100)
+    for stage, seconds in stage_totals(run).items():
+        print(f"{stage:<13} {'(all targets)':<28} {seconds:>9.4f}")
+    print(f"\nTotal: {run['total_seconds']:.1f}s, peak RSS {run['peak_rss_mb']} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the metric pipeline on synthetic data')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Generate data, time every stage and record the run')
+    run_parser.add_argument('--scale', choices=SCALES, default='small',
+                            help=', '.join(f"{name}: {s['venues']:,} venues x {s['days']} days"
+                                           for name, s in SCALES.items()))
+    run_parser.add_argument('--venues', type=int, help='Override the number of venues')
+    run_parser.add_argument('--days', type=int, help='Override the days of history')
+    run_parser.add_argument('--years', type=float, help='Days of history in years (overrides --days)')
+    run_parser.add_argument('--start-date', default=DEFAULT_START_DATE, help='First day of the synthetic history')
+    run_parser.add_argument('--presets', help='Comma-separated named queries (default: the six chart queries)')
+    run_parser.add_argument('--repeat', type=int, default=1, help='Passes over the query stages')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--data-dir', help='Keep the extract here and reuse it on the next run')
+    run_parser.add_argument('--label', help='Note saved with the run')
+
+    startup_parser = subparsers.add_parser('startup', help='Time cold starts of the light commands only')
+    startup_parser.add_argument('--repeat', type=int, default=5, help='Passes over the commands')
+    startup_parser.add_argument('--label', help='Note saved with the run')
+
+    history_parser = subparsers.add_parser('history', help='List recorded runs')
+    history_parser.add_argument('--last', type=int, default=20)
+
+    compare_parser = subparsers.add_parser('compare', help='Compare the latest run with an earlier one')
+    compare_parser.add_argument('--baseline', help='Run ID to compare against (default: the previous run '
+                                                   'at the same scale)')
+    compare_parser.add_argument('--run', help='Run ID to compare (default: the latest)')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='Relative change that counts as a regression or improvement')
+    compare_parser.add_argument('--fail-on-regression', action='store_true',
+                                help='Exit with status 1 if any stage regressed')
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        scale = SCALES[args.scale]
+        n_venues = args.venues or scale['venues']
+        n_days = round(args.years * 365) if args.years else args.days or scale['days']
+        presets = args.presets.split(',') if args.presets else None
+        run = run_benchmark(n_venues, n_days, start_date=args.start_date, presets=presets, repeat=args.repeat,
+                            seed=args.seed, data_dir=args.data_dir, label=args.label)
+        print_run(run)
+        print(f"\n💾 Recorded run {run['run_id']} in {HISTORY_PATH}")
+        return 0
+
+    if args.command == 'startup':
+        run = run_startup_benchmark(repeat=args.repeat, label=args.label)
+        print_run(run)
+        print(f"\n💾 Recorded run {run['run_id']} in {HISTORY_PATH}")
+        return 0
+
+    history = load_history()
+    if not history:
+        print(f"No benchmark runs recorded in {HISTORY_PATH}")
+        return 1
+
+    if args.command == 'history':
+        print(f"{'Run':<13} {'When':<20} {'Commit':<9} {'Venues':>9} {'Days':>5} {'Total s':>9} {'Peak MB':>9}  Label")
+        for run in history[-args.last:]:
+            print(f"{run['run_id']:<13} {run['timestamp']:<20} {run['commit'] or '':<9} "
+                  f"{run['scale']['venues']:>9} {run['scale']['days']:>5} {run['total_seconds']:>9.1f} "
+                  f"{run['peak_rss_mb'] if run['peak_rss_mb'] is not None else '':>9}  {run['label'] or ''}")
+        return 0
+
+    by_id = {run['run_id']: run for run in history}
+    current = by_id.get(args.run) if args.run else history[-1]
+    if current is None:
+        print(f"❌ Unknown run {args.run}")
+        return 1
+    if args.baseline:
+        baseline = by_id.get(args.baseline)
+    else:
+        earlier = [run for run in history if _scale_key(run) == _scale_key(current)
+                   and run['timestamp'] <= current['timestamp'] and run is not current]
+        baseline = earlier[-1] if earlier else None
+    if baseline is None:
+        print(f"❌ No baseline run for {current['run_id']} at the same scale")
+        return 1
+
+    rows = compare_runs(baseline, current, threshold=args.threshold)
+    print(f"{current['run_id']} ({current['commit']}) vs {baseline['run_id']} ({baseline['commit']})")
+    print(f"{'Stage':<13} {'Target':<28} {'Before':>9} {'After':>9} {'Change':>8}")
+    for stage, target, before, after, change, flag in rows:
+        marker = '⚠️' if flag == 'regression' else '✅' if flag == 'improvement' else ''
+        print(f"{stage:<13} {target:<28} {before:>9.4f} {after:>9.4f} {change:>+8.1%} {marker}")
+    regressions = [row for row in rows if row[5] == 'regression']
+    print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
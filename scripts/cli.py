@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the chart queries
+
+    run RUNNER [runner args]   run a runner (rolling: R7 Oct-Nov, tenure: monthly by tenure);
+                               everything after RUNNER goes to the runner, e.g. --parallel
+    combine [args]             combine the stored R7 soft churn history (combine_soft_churn_r7_data.py)
+    refresh [args]             recompute only the metrics whose upstream tables changed
+                               (refresh_scheduler.py: plan / run / status)
+    check [args]               check a stored chart metric for anomalies (anomaly_checks.py)
+    compare [args]             compare a stored metric with a year or period earlier
+                               (period_compare.py)
+    show RUNNER [QUERY]        print stored results as the runner's tables, without querying
+    list                       runners, their named queries and what is in the metric store
+    test-connection            run the Snowflake connection check query
+
+Modules are imported by the subcommand that needs them, so --help and list start
+instantly, and show never loads the Snowflake connector. Cold-start times are tracked
+by `python benchmark.py startup`.
+
+Usage:
+    python cli.py run rolling --parallel
+    python cli.py run tenure --backend local --combined
+    python cli.py show rolling soft_churn --start-date 2025-11-01
+    python cli.py combine --output soft_churn_r7_full.csv
+    python cli.py refresh run
+    python cli.py check soft_churn_r7 --start-date 2025-01-01
+    python cli.py compare soft_churn_r7 --start-date 2025-10-01 --end-date 2025-12-01 --align weekday
+    python cli.py list
+    python cli.py test-connection
+"""
+import sys
+import argparse
+import importlib
+
+# Runner name -> module defining QUERIES, RUNNER and display_results
+RUNNERS = {
+    'rolling': 'run_rolling_7day_queries',
+    'tenure': 'run_all_queries_by_tenure',
+}
+
+# Subcommands that hand their arguments to another script's main()
+PASSTHROUGH_COMMANDS = ('run', 'combine', 'refresh', 'check', 'compare')
+
+
+def _runner(name):
+    return importlib.import_module(RUNNERS[name])
+
+
+def show(runner_name, query_names=None, start_date=None, end_date=None, local=False):
+    """Print stored results of a runner's queries; returns the exit code"""
+    import metric_store
+    module = _runner(runner_name)
+    store_dir = None
+    if local:
+        import local_backend
+        store_dir = local_backend.METRICS_DIR
+
+    status = 0
+    for query_name in query_names or module.QUERIES:
+        if query_name not in module.QUERIES:
+            print(f"❌ Unknown query {query_name!r}; {runner_name} has {', '.join(module.QUERIES)}")
+            return 1
+        metric = module.QUERIES[query_name]
+        try:
+            df = metric_store.read(metric, start_date=start_date, end_date=end_date, store_dir=store_dir)
+        except KeyError:
+            print(f"❌ No {metric} data in the store. Run `python cli.py run {runner_name}` first.")
+            status = 1
+            continue
+        module.display_results(query_name, df)
+    return status
+
+
+def list_queries(local=False):
+    """Print the runners' queries and the stored metrics"""
+    import metric_store
+    from sql_templates import PRESETS
+    store_dir = None
+    if local:
+        import local_backend
+        store_dir = local_backend.METRICS_DIR
+
+    stored = metric_store.metrics(store_dir)
+    print(f"{'Runner':<8} {'Query':<20} {'Named query':<28} {'Template':<44} Stored")
+    for runner_name in RUNNERS:
+        for query_name, preset in _runner(runner_name).QUERIES.items():
+            info = stored.get(preset)
+            summary = f"{info['rows']} rows, {info['min_date']} to {info['max_date']}" if info else '-'
+            print(f"{runner_name:<8} {query_name:<20} {preset:<28} {PRESETS[preset]['template']:<44} {summary}")
+    other = sorted(set(stored) - {preset for name in RUNNERS for preset in _runner(name).QUERIES.values()})
+    if other:
+        print(f"\nAlso stored ({store_dir or metric_store.STORE_DIR}): {', '.join(other)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run, combine and show the chart queries')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run a runner; arguments after RUNNER go to it',
+                                       add_help=False)
+    run_parser.add_argument('runner', choices=RUNNERS)
+    run_parser.add_argument('args', nargs=argparse.REMAINDER, help='Runner arguments (see run RUNNER --help)')
+
+    combine_parser = subparsers.add_parser('combine', help='Combine the stored R7 soft churn history',
+                                           add_help=False)
+    combine_parser.add_argument('args', nargs=argparse.REMAINDER, help='combine_soft_churn_r7_data.py arguments')
+
+    refresh_parser = subparsers.add_parser('refresh', help='Recompute only the metrics whose upstream tables '
+                                                           'changed', add_help=False)
+    refresh_parser.add_argument('args', nargs=argparse.REMAINDER, help='refresh_scheduler.py arguments')
+
+    check_parser = subparsers.add_parser('check', help='Check a stored chart metric for anomalies',
+                                         add_help=False)
+    check_parser.add_argument('args', nargs=argparse.REMAINDER, help='anomaly_checks.py check arguments')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare a stored metric with a year or period '
+                                                           'earlier', add_help=False)
+    compare_parser.add_argument('args', nargs=argparse.REMAINDER, help='period_compare.py arguments')
+
+    show_parser = subparsers.add_parser('show', help='Print stored results without querying')
+    show_parser.add_argument('runner', choices=RUNNERS)
+    show_parser.add_argument('queries', nargs='*', help='Query names (default: all of the runner\'s)')
+    show_parser.add_argument('--start-date', help='First day, YYYY-MM-DD (inclusive)')
+    show_parser.add_argument('--end-date', help='Last day, YYYY-MM-DD (exclusive)')
+    show_parser.add_argument('--local', action='store_true', help='Show results of --backend local runs')
+
+    list_parser = subparsers.add_parser('list', help='List the queries and what is stored')
+    list_parser.add_argument('--local', action='store_true', help='List the local store')
+
+    subparsers.add_parser('test-connection', help='Run the Snowflake connection check query')
+    # Options in front of a passthrough command's arguments (combine --output x) aren't
+    # captured by REMAINDER, so they arrive as unknown arguments
+    args, unknown = parser.parse_known_args(argv)
+    if unknown and args.command not in PASSTHROUGH_COMMANDS:
+        parser.error(f"unrecognized arguments: {' '.join(unknown)}")
+    if args.command in PASSTHROUGH_COMMANDS:
+        args.args = unknown + args.args
+
+    if args.command == 'run':
+        return _runner(args.runner).main(args.args)
+    if args.command == 'combine':
+        import combine_soft_churn_r7_data
+        return combine_soft_churn_r7_data.main(args.args)
+    if args.command == 'refresh':
+        import refresh_scheduler
+        return refresh_scheduler.main(args.args)
+    if args.command == 'check':
+        import anomaly_checks
+        return anomaly_checks.main(['check'] + args.args)
+    if args.command == 'compare':
+        import period_compare
+        return period_compare.main(args.args)
+    if args.command == 'show':
+        return show(args.runner, args.queries, start_date=args.start_date, end_date=args.end_date, local=args.local)
+    if args.command == 'list':
+        list_queries(local=args.local)
+        return 0
+
+    from snowflake_connection import close_connection, test_connection
+    try:
+        test_connection()
+        return 0
+    except Exception as e:
+        print(f"❌ Connection failed: {e}")
+        return 1
+    finally:
+        close_connection()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,62 +1,68 @@
 #!/usr/bin/env python3
 """
-Combine Jan-Sep 2024 R7 soft churn data with existing Oct-Nov 2024 & 2025 data
+Combine the stored R7 soft churn history into one series (Jan 2024 onwards)
+
+Every run of the R7 soft churn query (full history, Oct-Nov window or shards) upserts
+into the soft_churn_r7 metric of the Parquet store, so combining is a single filtered
+read: only the partitions in the window are opened and no dates are re-parsed. The
+combined series is checked for out-of-range values, jumps and year-over-year changes
+(anomaly_checks.py) before it is written out. Older timestamped CSV dumps can be loaded
+first with:
+
+    python metric_store.py import soft_churn_r7 ../data/soft_churn_*_results_*.csv
+
+Usage:
+    python combine_soft_churn_r7_data.py
+    python combine_soft_churn_r7_data.py --start-date 2024-01-01 --output soft_churn_r7_full.csv
 """
 import sys
-import os
+import argparse
 import pandas as pd
-from datetime import datetime
-
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
-DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
-
-def main():
-    # Find the most recent extended historical file (Jan-Sep 2024)
-    import glob
-    extended_files = glob.glob(os.path.join(DATA_DIR, 'soft_churn_r7_extended_historical_*.csv'))
-    if not extended_files:
-        print("❌ No extended historical file found. Please run the query first.")
+
+import anomaly_checks
+import metric_store
+
+METRIC = 'soft_churn_r7'
+DEFAULT_START_DATE = '2024-01-01'
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Combine the stored R7 soft churn history')
+    parser.add_argument('--start-date', default=DEFAULT_START_DATE, help='First day, YYYY-MM-DD (inclusive)')
+    parser.add_argument('--end-date', help='Last day, YYYY-MM-DD (exclusive)')
+    parser.add_argument('--output', help='Also write the combined series to this CSV file')
+    args = parser.parse_args(argv)
+
+    try:
+        df_combined = metric_store.read(METRIC, start_date=args.start_date, end_date=args.end_date)
+    except KeyError:
+        print(f"❌ No {METRIC} data in the store. Please run the query first.")
         return 1
-    
-    extended_file = max(extended_files, key=os.path.getctime)
-    print(f"📖 Reading Jan-Sep 2024 data from: {os.path.basename(extended_file)}")
-    
-    # Find the existing Oct-Nov 2024 & 2025 file
-    oct_nov_files = glob.glob(os.path.join(DATA_DIR, 'soft_churn_rolling_7day_results_*.csv'))
-    if not oct_nov_files:
-        print("❌ No Oct-Nov 2024 & 2025 file found.")
+
+    if len(df_combined) == 0:
+        print(f"❌ No {METRIC} rows from {args.start_date}.")
         return 1
-    
-    oct_nov_file = max(oct_nov_files, key=os.path.getctime)
-    print(f"📖 Reading Oct-Nov 2024 & 2025 data from: {os.path.basename(oct_nov_file)}")
-    
-    # Read both files
-    df_extended = pd.read_csv(extended_file)
-    df_oct_nov = pd.read_csv(oct_nov_file)
-    
-    # Filter extended to Jan-Sep 2024 only (in case it includes buffer days)
-    df_extended['date'] = pd.to_datetime(df_extended['date'])
-    df_extended = df_extended[(df_extended['date'] >= '2024-01-01') & (df_extended['date'] < '2024-10-01')]
-    
-    # Ensure Oct-Nov data has date as datetime
-    df_oct_nov['date'] = pd.to_datetime(df_oct_nov['date'])
-    
-    # Combine and sort
-    df_combined = pd.concat([df_extended, df_oct_nov], ignore_index=True)
-    df_combined = df_combined.sort_values('date').reset_index(drop=True)
-    
-    # Save combined file
-    output_file = os.path.join(DATA_DIR, f'soft_churn_r7_full_2024_2025_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv')
-    df_combined.to_csv(output_file, index=False)
-    
+
+    # Days without a row (e.g. a window that was never queried)
+    all_days = pd.date_range(df_combined['date'].min(), df_combined['date'].max(), freq='D')
+    missing_days = all_days.difference(df_combined['date'])
+
     print(f"\n✅ Combined data:")
     print(f"   Date range: {df_combined['date'].min().date()} to {df_combined['date'].max().date()}")
     print(f"   Total rows: {len(df_combined)}")
-    print(f"   Jan-Sep 2024: {len(df_extended)} rows")
-    print(f"   Oct-Nov 2024 & 2025: {len(df_oct_nov)} rows")
-    print(f"\n💾 Saved to: {os.path.basename(output_file)}")
-    
+    for year, rows in df_combined.groupby(df_combined['date'].dt.year):
+        print(f"   {year}: {len(rows)} rows")
+    if len(missing_days):
+        print(f"   ⚠️ {len(missing_days)} missing day(s), first: {missing_days[0].date()}")
+
+    # Missing days are counted above
+    monitor = anomaly_checks.AnomalyMonitor(METRIC, checks=('range', 'jump', 'yoy'))
+    monitor.update(df_combined)
+    anomaly_checks.report(monitor)
+
+    if args.output:
+        df_combined.to_csv(args.output, index=False)
+        print(f"\n💾 Saved to: {args.output}")
+
     return 0
 
 if __name__ == '__main__':
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Thread-safe pool of DB-API connections
+
+snowflake_connection.py used to keep one global connection and, on every reuse, run
+ALTER SESSION + SELECT 1 as a liveness check and another ALTER SESSION before each
+statement: three extra round-trips per query, and no way to serve concurrent callers.
+
+The pool:
+- opens connections lazily with a connect() factory, up to max_size at once; session
+  parameters are set by the factory when the connection is created
+- hands out idle connections most-recently-used first and only checks liveness
+  (SELECT 1) when a connection has been idle longer than idle_check_seconds
+- tracks each connection's statement timeout so ALTER SESSION is only issued when a
+  query asks for a different timeout than the session already has
+- discards connections returned after a failure, and closes everything on close()
+
+In the common case a query costs exactly one round-trip. The pool doesn't import the
+Snowflake connector, so it can be exercised with fake_connector.py.
+"""
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_IDLE_CHECK_SECONDS = 300
+DEFAULT_STATEMENT_TIMEOUT_SECONDS = 3600
+
+
+class PoolClosedError(RuntimeError):
+    """Raised when acquiring from a pool that has been closed"""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of connections created by a factory
+
+    Args:
+        connect: Callable returning a new open connection (session parameters already set)
+        max_size: Maximum number of open connections, idle plus checked out
+        idle_check_seconds: Connections idle longer than this get a SELECT 1 before reuse
+        statement_timeout_seconds: Statement timeout the factory sets on new sessions
+        clock: Time source, for tests
+    """
+
+    def __init__(self, connect, max_size=DEFAULT_POOL_SIZE, idle_check_seconds=DEFAULT_IDLE_CHECK_SECONDS,
+                 statement_timeout_seconds=DEFAULT_STATEMENT_TIMEOUT_SECONDS, clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError(f"max_size must be at least 1, got {max_size}")
+        self.connect = connect
+        self.max_size = max_size
+        self.idle_check_seconds = idle_check_seconds
+        self.statement_timeout_seconds = statement_timeout_seconds
+        self._clock = clock
+
+        self._lock = threading.Condition()
+        self._idle = deque()          # (connection, last_used), most recently used on the right
+        self._timeouts = {}           # id(connection) -> current session statement timeout
+        self._open_count = 0
+        self._closed = False
+        self._local = threading.local()
+        self.stats = {'opened': 0, 'reused': 0, 'liveness_checks': 0, 'discarded': 0,
+                      'timeout_changes': 0}
+
+    @property
+    def size(self):
+        """Number of open connections (idle plus checked out)"""
+        with self._lock:
+            return self._open_count
+
+    @property
+    def idle_count(self):
+        with self._lock:
+            return len(self._idle)
+
+    def _is_alive(self, conn, idle_seconds):
+        """Cheap local check first; SELECT 1 only after a long idle period"""
+        is_closed = getattr(conn, 'is_closed', None)
+        if callable(is_closed) and is_closed():
+            return False
+        if idle_seconds < self.idle_check_seconds:
+            return True
+        with self._lock:
+            self.stats['liveness_checks'] += 1
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout=None):
+        """
+        Check out a connection, opening one if none is idle and the pool isn't full
+
+        Args:
+            timeout: Seconds to wait for a connection when the pool is full (None = forever)
+
+        Raises:
+            PoolClosedError: If the pool has been closed
+            TimeoutError: If no connection became available within timeout
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        started = time.perf_counter()
+        info = {'pool_wait': 0.0, 'connect': 0.0, 'liveness_check': 0.0, 'opened': False}
+        self._local.last_acquire = info
+        while True:
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise PoolClosedError("Connection pool is closed")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._open_count < self.max_size:
+                        # Reserve the slot, then connect outside the lock
+                        self._open_count += 1
+                        conn = None
+                        break
+                    remaining = None if deadline is None else deadline - self._clock()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError(f"No connection available within {timeout} seconds "
+                                           f"(pool size {self.max_size})")
+                    self._lock.wait(remaining)
+
+            if conn is None:
+                connect_started = time.perf_counter()
+                try:
+                    conn = self.connect()
+                except Exception:
+                    with self._lock:
+                        self._open_count -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._timeouts[id(conn)] = self.statement_timeout_seconds
+                    self.stats['opened'] += 1
+                info['connect'] += time.perf_counter() - connect_started
+                info['opened'] = True
+                info['pool_wait'] = time.perf_counter() - started - info['connect'] - info['liveness_check']
+                return conn
+
+            check_started = time.perf_counter()
+            alive = self._is_alive(conn, self._clock() - last_used)
+            info['liveness_check'] += time.perf_counter() - check_started
+            if alive:
+                with self._lock:
+                    self.stats['reused'] += 1
+                info['pool_wait'] = time.perf_counter() - started - info['connect'] - info['liveness_check']
+                return conn
+            # Dead connection: drop it and try the next idle one (or open a new one)
+            self._discard(conn)
+
+    def last_acquire(self):
+        """
+        Timings of this thread's most recent acquire()
+
+        Returns:
+            Dict with pool_wait, connect and liveness_check seconds and opened (True if a
+            new connection was opened), or None if this thread hasn't acquired yet
+        """
+        return getattr(self._local, 'last_acquire', None)
+
+    def release(self, conn, discard=False):
+        """
+        Return a checked-out connection
+
+        Args:
+            conn: Connection from acquire()
+            discard: Close the connection instead of reusing it (e.g. after a failed or
+                timed-out query, when its state is unknown)
+        """
+        with self._lock:
+            if not discard and not self._closed:
+                self._idle.append((conn, self._clock()))
+                self._lock.notify()
+                return
+        self._discard(conn)
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._lock:
+            self._timeouts.pop(id(conn), None)
+            self._open_count -= 1
+            self.stats['discarded'] += 1
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that checks a connection out and returns it, discarding it on error"""
+        conn = self.acquire(timeout=timeout)
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+
+    def set_statement_timeout(self, conn, cursor, seconds):
+        """
+        Make sure the session's statement timeout is `seconds`
+
+        Issues ALTER SESSION on the given cursor only if the session currently has a
+        different timeout, so the default timeout costs no round-trip.
+        """
+        with self._lock:
+            current = self._timeouts.get(id(conn))
+        if current == seconds:
+            return
+        cursor.execute(f"ALTER SESSION SET STATEMENT_TIMEOUT_IN_SECONDS = {int(seconds)}")
+        with self._lock:
+            self._timeouts[id(conn)] = seconds
+            self.stats['timeout_changes'] += 1
+
+    def close(self):
+        """Close idle connections now and checked-out ones when they are released"""
+        with self._lock:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._lock.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+In-process stand-in for the Snowflake connector
+
+FakeConnector.connect() returns DB-API connections that record every statement, answer
+with canned results, and can simulate latency, failures and dropped sessions. Pass
+FakeConnector().connect wherever a connect() factory is accepted
+(ConnectionPool, execute_queries_parallel, configure_pool) to exercise connection
+handling and query orchestration without a warehouse or SSO.
+
+Example:
+    fake = FakeConnector(latency_seconds=0.05, results={'from spots': ([('DATE',), ('VALUE',)], rows)})
+    configure_pool(connect=fake.connect)
+    execute_query("select date, value from spots")
+    fake.statements  # every statement sent, including ALTER SESSION and SELECT 1
+
+execute_async() / get_query_status() / get_results_from_sfqid() are supported too: an
+async query reports RUNNING until latency_seconds have passed, and its result can be
+fetched by ID from any connection of the same connector.
+"""
+import time
+import threading
+
+
+class FakeCursor:
+    """DB-API cursor over a FakeConnection"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self._rows = []
+        self.sfqid = None
+
+    def execute(self, query, params=None):
+        self.connection._execute(query, params, self)
+        return self
+
+    def execute_async(self, query, params=None):
+        self.connection._execute_async(query, params, self)
+        return {'queryId': self.sfqid}
+
+    def get_results_from_sfqid(self, sfqid):
+        self.connection._results_from_sfqid(sfqid, self)
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """DB-API connection created by FakeConnector.connect()"""
+
+    def __init__(self, connector, number):
+        self.connector = connector
+        self.number = number
+        self.closed = False
+        self.alive = True
+
+    def cursor(self):
+        if self.closed:
+            raise RuntimeError("Connection is closed")
+        return FakeCursor(self)
+
+    def is_closed(self):
+        return self.closed
+
+    def get_query_status(self, sfqid):
+        """'RUNNING', 'SUCCESS', 'FAILED_WITH_ERROR' or 'NO_DATA' (unknown ID)"""
+        query = self.connector.async_queries.get(sfqid)
+        if query is None:
+            return 'NO_DATA'
+        if time.monotonic() < query['ready_at']:
+            return 'RUNNING'
+        return 'FAILED_WITH_ERROR' if query['error'] is not None else 'SUCCESS'
+
+    @staticmethod
+    def is_still_running(status):
+        return status in ('RUNNING', 'QUEUED', 'RESUMING_WAREHOUSE')
+
+    @staticmethod
+    def is_an_error(status):
+        return status in ('FAILED_WITH_ERROR', 'ABORTED', 'FAILED_WITH_INCIDENT')
+
+    def close(self):
+        self.closed = True
+
+    def _record(self, query, params):
+        connector = self.connector
+        with connector._lock:
+            connector.statements.append((self.number, query, params))
+        if not self.alive:
+            raise RuntimeError("Session no longer exists (simulated dropped connection)")
+
+    def _answer(self, query):
+        """(description, rows) for a query statement, raising its configured failure"""
+        connector = self.connector
+        for pattern, error in connector.failures.items():
+            if pattern in query:
+                raise error
+        for pattern, (description, rows) in connector.results.items():
+            if pattern in query:
+                return [col if isinstance(col, tuple) else (col,) for col in description], list(rows)
+        return list(connector.default_result[0]), list(connector.default_result[1])
+
+    def _execute(self, query, params, cursor):
+        self._record(query, params)
+        statement = query.strip()
+        if statement.upper().startswith('ALTER SESSION') or statement.upper() == 'SELECT 1':
+            cursor.description = [('1',)]
+            cursor._rows = [(1,)]
+            return
+
+        if self.connector.latency_seconds:
+            time.sleep(self.connector.latency_seconds)
+        cursor.description, cursor._rows = self._answer(query)
+
+    def _execute_async(self, query, params, cursor):
+        self._record(query, params)
+        connector = self.connector
+        try:
+            answer, error = self._answer(query), None
+        except Exception as e:
+            answer, error = None, e
+        with connector._lock:
+            cursor.sfqid = f"fake-{len(connector.async_queries):06d}"
+            connector.async_queries[cursor.sfqid] = {
+                'ready_at': time.monotonic() + connector.latency_seconds, 'answer': answer, 'error': error}
+
+    def _results_from_sfqid(self, sfqid, cursor):
+        query = self.connector.async_queries.get(sfqid)
+        if query is None:
+            raise RuntimeError(f"Unknown query ID {sfqid} (simulated expired result)")
+        if query['error'] is not None:
+            raise query['error']
+        cursor.sfqid = sfqid
+        cursor.description, cursor._rows = query['answer'][0], list(query['answer'][1])
+
+
+class FakeConnector:
+    """
+    Factory of fake connections
+
+    Args:
+        latency_seconds: Sleep per query statement (not ALTER SESSION / SELECT 1)
+        results: Dict of SQL substring -> (column names, rows) returned by matching queries
+        failures: Dict of SQL substring -> exception raised by matching queries
+        connect_seconds: Sleep per connect(), to model login cost
+    """
+
+    def __init__(self, latency_seconds=0.0, results=None, failures=None, connect_seconds=0.0):
+        self.latency_seconds = latency_seconds
+        self.results = results or {}
+        self.failures = failures or {}
+        self.connect_seconds = connect_seconds
+        self.default_result = ([('VALUE',)], [(1,)])
+        self.connections = []
+        self.statements = []
+        self.async_queries = {}
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self.connect_seconds:
+            time.sleep(self.connect_seconds)
+        with self._lock:
+            conn = FakeConnection(self, len(self.connections))
+            self.connections.append(conn)
+        return conn
+
+    def round_trips(self, kind=None):
+        """Count recorded statements, optionally only 'alter', 'ping' or 'query'"""
+        def classify(query):
+            statement = query.strip().upper()
+            if statement.startswith('ALTER SESSION'):
+                return 'alter'
+            if statement == 'SELECT 1':
+                return 'ping'
+            return 'query'
+        return sum(1 for _, query, _ in self.statements if kind is None or classify(query) == kind)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Incremental refresh of the R7 soft churn series
+
+Keeps daily R7 partial aggregates (soft churn sums and active venue counts per
+segment) in the Parquet metric store and only queries the days that aren't stored yet, plus the 6-day
+lookback the R7 window needs. Re-running is idempotent: refreshed days replace the
+stored ones, so daily refresh cost stays constant instead of growing with history.
+
+With --engine local, the warehouse only returns venue-day rows and the R7 sums and
+distinct counts are computed by the rolling distinct-count engine (rolling_distinct.py)
+instead of the correlated subqueries.
+
+Usage:
+    python incremental_r7_refresh.py                    # append new days up to yesterday
+    python incremental_r7_refresh.py --rebuild          # recompute everything from 2023-01-01
+    python incremental_r7_refresh.py --end-date 2025-12-01
+    python incremental_r7_refresh.py --engine local
+    python incremental_r7_refresh.py --rebuild --shard-months 3   # backfill in parallel 3-month shards
+"""
+import sys
+import argparse
+from datetime import date, datetime, timedelta
+import pandas as pd
+
+from snowflake_connection import execute_query, execute_query_batches, close_connection
+from rolling_distinct import R7_WINDOW_DAYS, SEGMENTS, soft_churn_r7_partials, soft_churn_r7_rates
+from sql_templates import render
+from sharded_query import run_sharded
+import metric_store
+
+PARTIALS_TEMPLATE = '07_soft_churn_r7_daily_partials.sql'
+VENUE_DAYS_TEMPLATE = '08_soft_churn_venue_days.sql'
+PARTIALS_METRIC = 'soft_churn_r7_partials'
+
+# Same history start as 06_soft_churn_r7_rolling_7day.sql
+HISTORY_START = date(2023, 1, 1)
+
+# The last stored day may have been loaded before upstream finished writing it,
+# so it is always re-pulled and replaced
+REFRESH_OVERLAP_DAYS = 1
+
+ENGINES = ('warehouse', 'local')
+
+PARTIAL_COLUMNS = ['date'] + [f'r7_{measure}{suffix}'
+                              for suffix in SEGMENTS
+                              for measure in ('soft_churns', 'venue_count')]
+
+
+def load_store(store_dir=None):
+    """Load the stored daily partials, or an empty frame if nothing is stored yet"""
+    try:
+        df = metric_store.read(PARTIALS_METRIC, store_dir=store_dir)
+    except KeyError:
+        return pd.DataFrame(columns=PARTIAL_COLUMNS)
+    df['date'] = df['date'].dt.date
+    return df[PARTIAL_COLUMNS]
+
+
+def save_store(new_rows, store_dir=None):
+    """Upsert freshly queried days; only the months they fall in are rewritten"""
+    if len(new_rows) == 0:
+        return
+    metric_store.write(PARTIALS_METRIC, new_rows[PARTIAL_COLUMNS], source='incremental_r7_refresh.py',
+                       store_dir=store_dir)
+
+
+def last_complete_day(store):
+    """Return the last stored day that is considered complete, or None if the store is empty"""
+    if len(store) == 0:
+        return None
+    return max(store['date']) - timedelta(days=REFRESH_OVERLAP_DAYS)
+
+
+def merge_partials(store, new_rows):
+    """Merge freshly queried days into the store; days present in both take the new values"""
+    if len(new_rows) == 0:
+        return store
+    merged = pd.concat([store, new_rows[PARTIAL_COLUMNS]], ignore_index=True)
+    merged = merged.drop_duplicates(subset='date', keep='last')
+    return merged.sort_values('date').reset_index(drop=True)
+
+
+def fetch_partials(start_date, end_date, engine='warehouse', shard_months=None):
+    """
+    Get R7 partials for days in [start_date, end_date)
+
+    Raw rows are read from start_date - 6 days so the first day has a full window.
+
+    Args:
+        start_date: First day to return
+        end_date: First day NOT to return
+        engine: 'warehouse' computes the R7 partials in SQL; 'local' streams venue-day rows
+            and computes them with the rolling distinct-count engine
+        shard_months: With the warehouse engine, split the window into shards of this many
+            months and run them in parallel. 07_soft_churn_r7_daily_partials.sql reads its own
+            lookback, so the shards need no overlap.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {ENGINES}, got {engine!r}")
+
+    if engine == 'warehouse':
+        if shard_months:
+            df = run_sharded(PARTIALS_TEMPLATE, start_date, end_date, shard_months=shard_months)
+        else:
+            query, params = render(PARTIALS_TEMPLATE, start_date=start_date, end_date=end_date)
+            df = execute_query(query, fetch_data=True, reuse_connection=True, params=params)
+        df.columns = df.columns.str.lower()
+        df['date'] = pd.to_datetime(df['date']).dt.date
+        return df
+
+    lookback_start = start_date - timedelta(days=R7_WINDOW_DAYS - 1)
+    query, params = render(VENUE_DAYS_TEMPLATE, start_date=lookback_start, end_date=end_date)
+    batches = list(execute_query_batches(query, fetch_mode='pandas', params=params))
+    rows = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+    rows.columns = rows.columns.str.lower()
+    if len(rows) == 0:
+        return pd.DataFrame(columns=PARTIAL_COLUMNS)
+
+    partials = soft_churn_r7_partials(rows)
+    return partials[partials['date'] >= start_date].reset_index(drop=True)
+
+
+def refresh(end_date=None, rebuild=False, store_dir=None, engine='warehouse', shard_months=None):
+    """
+    Bring the store up to date and return it
+
+    Args:
+        end_date: First day NOT to load (default: today, since today's data is incomplete)
+        rebuild: If True, ignore the stored days and recompute from HISTORY_START
+        store_dir: Location of the metric store (default: data/metrics)
+        engine: Where the R7 partials are computed (see fetch_partials)
+        shard_months: Shard size for warehouse queries (see fetch_partials)
+    """
+    end_date = end_date or date.today()
+    store = pd.DataFrame(columns=PARTIAL_COLUMNS) if rebuild else load_store(store_dir)
+
+    last_day = last_complete_day(store)
+    start_date = HISTORY_START if last_day is None else last_day + timedelta(days=1)
+    if start_date >= end_date:
+        print(f"✓ Store is up to date through {last_day}")
+        return store
+
+    print(f"⏳ Querying R7 partials for {start_date} to {end_date - timedelta(days=1)} "
+          f"({(end_date - start_date).days} days)...")
+    new_rows = fetch_partials(start_date, end_date, engine=engine, shard_months=shard_months)
+
+    save_store(new_rows, store_dir)
+    store = merge_partials(store, new_rows)
+    print(f"💾 Store now covers {store['date'].min()} to {store['date'].max()} "
+          f"({len(store)} days) in {PARTIALS_METRIC}")
+    return store
+
+
+def compute_r7_rates(store):
+    """
+    Turn stored partials into the chart-ready R7 percentages
+
+    Output columns match 06_soft_churn_r7_rolling_7day.sql:
+    date, all_fitness_r7_pct, sa_fitness_r7_pct, nonsa_fitness_r7_pct
+    """
+    return soft_churn_r7_rates(store)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Incrementally refresh the R7 soft churn series')
+    parser.add_argument('--end-date', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        help='First day NOT to load, YYYY-MM-DD (default: today)')
+    parser.add_argument('--rebuild', action='store_true',
+                        help=f'Recompute every day from {HISTORY_START} instead of appending')
+    parser.add_argument('--engine', choices=ENGINES, default='warehouse',
+                        help="Compute R7 partials in the warehouse SQL or locally from venue-day rows")
+    parser.add_argument('--shard-months', type=int,
+                        help='Query the warehouse in parallel date shards of this many months')
+    parser.add_argument('--output', help='Also write the R7 percentages to this CSV file')
+    args = parser.parse_args(argv)
+
+    try:
+        store = refresh(end_date=args.end_date, rebuild=args.rebuild, engine=args.engine,
+                        shard_months=args.shard_months)
+        rates = compute_r7_rates(store)
+        if args.output:
+            rates.to_csv(args.output, index=False)
+            print(f"💾 R7 rates saved to: {args.output}")
+        print(rates.tail(7).to_string(index=False))
+        return 0
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        close_connection()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Local DuckDB backend: run the sql/ queries offline on extracted tables
+
+Iterating on a query or a chart used to mean a warehouse round-trip (and credits) per
+try. This backend bulk-extracts the five source tables the queries read, for a date
+window, into columnar files once:
+
+    data/local/
+        extract.json                  window, row counts and source of the extract
+        partner_details.parquet
+        salesforce_venues.parquet
+        sched_schedules.parquet       only the columns and days the queries use
+        venue_adds_and_churns.parquet
+        ineligible_classes.parquet
+
+and then runs the rendered templates in-process with DuckDB. connect() returns a
+DB-API connection, so it plugs in anywhere a connect() factory is accepted; the usual
+way is snowflake_connection.use_backend('local') (or QUERY_BACKEND=local), after which
+execute_query, execute_queries_parallel, the sharded runner and the runners' --backend
+local flag all run against the extract.
+
+Snowflake-only syntax is translated on the fly: the cp_bi_derived.datapipeline.
+prefix is dropped (the extracted tables are views in DuckDB's default schema),
+GREATEST_IGNORE_NULLS becomes greatest (DuckDB's greatest already skips NULLs) and
+dateadd('day', n, x) becomes date arithmetic. ALTER SESSION statements are accepted
+and ignored.
+
+`python local_backend.py synthetic` writes a seeded synthetic extract (see
+synthetic_data.source_tables), a deterministic stand-in for the warehouse.
+
+Usage:
+    python local_backend.py extract --start-date 2024-09-01 --end-date 2025-12-01
+    python local_backend.py synthetic --venues 500 --start-date 2024-10-01 --days 120
+    python local_backend.py info
+    python local_backend.py run soft_churn_r7 --start-date 2024-10-01 --end-date 2024-12-01
+"""
+import sys
+import os
+import re
+import json
+import argparse
+import warnings
+from datetime import datetime, timedelta
+
+from sql_templates import to_date
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+LOCAL_DIR = os.path.join(PROJECT_ROOT, 'data', 'local')
+# Results of local runs go to their own metric store, never mixed with warehouse results
+METRICS_DIR = os.path.join(LOCAL_DIR, 'metrics')
+
+EXTRACT_MANIFEST = 'extract.json'
+SCHEMA_PREFIX = 'cp_bi_derived.datapipeline.'
+
+# Table -> columns to extract (None = all) and the date column that bounds the window
+# (None = dimension table, extracted whole)
+SOURCE_TABLES = {
+    'partner_details': {'columns': None, 'date_column': None},
+    'salesforce_venues': {'columns': None, 'date_column': None},
+    'sched_schedules': {
+        'columns': ['venue_id', 'schedule_id', 'class_id', 'start_date', 'unbookable_reason', 'is_bookable',
+                    'classpass_spots', 'max_capacity', 'total_booked', 'classpass_spots_taken'],
+        'date_column': 'start_date',
+    },
+    'venue_adds_and_churns': {
+        'columns': ['date', 'venue_id', 'soft_churn', 'acquisition_pin', 'venue_inactive'],
+        'date_column': 'date',
+    },
+    'ineligible_classes': {'columns': None, 'date_column': None},
+}
+
+# The R7 queries look back 6 days before their first output day
+LOOKBACK_DAYS = 6
+
+_SCHEMA_PREFIX = re.compile(re.escape(SCHEMA_PREFIX), re.IGNORECASE)
+_GREATEST_IGNORE_NULLS = re.compile(r'\bGREATEST_IGNORE_NULLS\s*\(', re.IGNORECASE)
+_DATEADD_DAY = re.compile(r"\bdateadd\s*\(\s*'?day'?\s*,", re.IGNORECASE)
+_ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def _local_dir(local_dir):
+    return local_dir or LOCAL_DIR
+
+
+def _split_call_args(sql, open_paren):
+    """
+    Split the arguments of the function call whose '(' is at open_paren
+
+    Returns (arguments, index just past the closing paren). Commas inside nested
+    parentheses or string literals don't split.
+    """
+    args = []
+    depth = 0
+    start = open_paren + 1
+    i = start
+    in_literal = False
+    while i < len(sql):
+        char = sql[i]
+        if in_literal:
+            if char == "'":
+                in_literal = False
+        elif char == "'":
+            in_literal = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            if depth == 0:
+                args.append(sql[start:i].strip())
+                return args, i + 1
+            depth -= 1
+        elif char == ',' and depth == 0:
+            args.append(sql[start:i].strip())
+            start = i + 1
+        i += 1
+    raise ValueError(f"Unbalanced parentheses in call at offset {open_paren}")
+
+
+def translate(sql):
+    """
+    Translate a rendered Snowflake query into DuckDB SQL
+
+    Args:
+        sql: Query text as rendered by sql_templates (with ? placeholders)
+
+    Returns:
+        SQL string DuckDB can run against the extracted tables
+    """
+    sql = _SCHEMA_PREFIX.sub('', sql)
+    sql = _GREATEST_IGNORE_NULLS.sub('greatest(', sql)
+
+    # dateadd('day', n, x) -> (CAST(x AS DATE) + (n)), innermost-first so nested calls work
+    while True:
+        match = None
+        for match in _DATEADD_DAY.finditer(sql):
+            pass
+        if match is None:
+            return sql
+        open_paren = sql.index('(', match.start())
+        args, end = _split_call_args(sql, open_paren)
+        if len(args) != 3:
+            raise ValueError(f"Expected dateadd('day', n, x), got: {sql[match.start():end]}")
+        sql = f"{sql[:match.start()]}(CAST({args[2]} AS DATE) + ({args[1]})){sql[end:]}"
+
+
+def load_extract_manifest(local_dir=None):
+    """Return the extract manifest, or None if nothing has been extracted"""
+    path = os.path.join(_local_dir(local_dir), EXTRACT_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _save_extract_manifest(manifest, local_dir):
+    path = os.path.join(local_dir, EXTRACT_MANIFEST)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def record_extract(local_dir, start_date, end_date, row_counts, source):
+    """
+    Record the window and row counts of Parquet files written into local_dir
+
+    Args:
+        local_dir: Extract location
+        start_date: First day covered (inclusive), a date
+        end_date: Last day covered (exclusive), a date
+        row_counts: Dict of table name -> rows in <table>.parquet
+        source: Free-text note (e.g. 'snowflake' or how synthetic data was generated)
+
+    Returns:
+        The updated extract manifest
+    """
+    manifest = load_extract_manifest(local_dir) or {'tables': {}}
+    manifest.update({
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'source': source,
+        'extracted_at': datetime.now().isoformat(timespec='seconds'),
+    })
+    for table, rows in row_counts.items():
+        manifest['tables'][table] = {'path': f'{table}.parquet', 'rows': rows}
+    _save_extract_manifest(manifest, local_dir)
+    return manifest
+
+
+def extraction_query(table, start_date, end_date, fitness_only=True):
+    """
+    Return (sql, params) that pulls one source table for [start_date, end_date)
+
+    Windowed tables start LOOKBACK_DAYS early so the first R7 day has a full window.
+    With fitness_only, schedules and venue-days are limited to Fitness venues, the
+    only venue type the chart queries read (segment_cube.py needs every type).
+    """
+    spec = SOURCE_TABLES[table]
+    columns = ', '.join(f't.{col}' for col in spec['columns']) if spec['columns'] else 't.*'
+    sql = f"select {columns} from {SCHEMA_PREFIX}{table} t"
+    params = []
+    if spec['date_column']:
+        sql += (f"\nwhere t.{spec['date_column']} >= ?::date"
+                f" and t.{spec['date_column']} < ?::date")
+        params = [(start_date - timedelta(days=LOOKBACK_DAYS)).isoformat(), end_date.isoformat()]
+        if fitness_only:
+            sql += (f"\n  and t.venue_id in (select venue_id from {SCHEMA_PREFIX}partner_details"
+                    f" where venue_type = 'Fitness')")
+    return sql, params
+
+
+def extract(start_date, end_date, tables=None, fitness_only=True, local_dir=None):
+    """
+    Bulk-extract the source tables from the warehouse into local Parquet files
+
+    Each table is streamed in Arrow batches straight into its Parquet file (written
+    atomically), so memory stays bounded by the batch size.
+
+    Args:
+        start_date: First day needed by the queries you want to run (inclusive)
+        end_date: Last day (exclusive)
+        tables: Subset of SOURCE_TABLES to (re-)extract (default: all)
+        fitness_only: Limit schedules and venue-days to Fitness venues
+        local_dir: Extract location (default: data/local)
+
+    Returns:
+        The updated extract manifest
+    """
+    import pyarrow.parquet as pq
+    from snowflake_connection import execute_query_batches
+
+    local_dir = _local_dir(local_dir)
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    os.makedirs(local_dir, exist_ok=True)
+
+    row_counts = {}
+    for table in tables or SOURCE_TABLES:
+        sql, params = extraction_query(table, start_date, end_date, fitness_only=fitness_only)
+        print(f"⏳ Extracting {table}...")
+        path = os.path.join(local_dir, f'{table}.parquet')
+        tmp_path = path + '.tmp'
+        writer = None
+        rows = 0
+        try:
+            for batch in execute_query_batches(sql, fetch_mode='arrow', params=params or None):
+                batch = batch.rename_columns([name.lower() for name in batch.column_names])
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, batch.schema)
+                writer.write_table(batch.cast(writer.schema))
+                rows += batch.num_rows
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            print(f"⚠️ {table} returned no rows; keeping the previous extract")
+            continue
+        os.replace(tmp_path, path)
+        row_counts[table] = rows
+        print(f"✓ {table}: {rows} rows")
+
+    return record_extract(local_dir, start_date, end_date, row_counts, source='snowflake')
+
+
+def write_tables(tables, start_date, end_date, source, local_dir=None):
+    """
+    Write DataFrames as an extract (e.g. synthetic_data.source_tables())
+
+    Args:
+        tables: Dict of table name -> DataFrame with the warehouse column names
+        start_date: First day covered (inclusive)
+        end_date: Last day covered (exclusive)
+        source: Free-text note recorded in the manifest
+        local_dir: Extract location (default: data/local)
+
+    Returns:
+        The updated extract manifest
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    local_dir = _local_dir(local_dir)
+    os.makedirs(local_dir, exist_ok=True)
+    row_counts = {}
+    for table, df in tables.items():
+        if table not in SOURCE_TABLES:
+            raise KeyError(f"Unknown source table '{table}'; expected one of {list(SOURCE_TABLES)}")
+        path = os.path.join(local_dir, f'{table}.parquet')
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path + '.tmp')
+        os.replace(path + '.tmp', path)
+        row_counts[table] = len(df)
+    return record_extract(local_dir, to_date(start_date), to_date(end_date), row_counts, source)
+
+
+class LocalCursor:
+    """DB-API cursor over a LocalConnection, mirroring the Snowflake cursor API the scripts use"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._db.cursor()
+        self.description = None
+        self.sfqid = None
+
+    def execute(self, query, params=None):
+        statement = query.strip().rstrip(';')
+        if statement.upper().startswith('ALTER SESSION'):
+            # Session parameters (statement timeout) have no local equivalent
+            statement, params = "select 'Statement executed successfully.' as status", None
+        else:
+            statement = translate(statement)
+            self.connection._check_window(params)
+        self._cursor.execute(statement, params or [])
+        self.description = [(name.upper(),) + tuple(rest) for name, *rest in self._cursor.description]
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def _record_batches(self, batch_size=1_000_000):
+        reader = getattr(self._cursor, 'to_arrow_reader', None) or self._cursor.fetch_record_batch
+        for batch in reader(batch_size):
+            yield batch.rename_columns([name.upper() for name in batch.schema.names])
+
+    def fetch_arrow_batches(self):
+        """Yield the result as pyarrow Tables"""
+        import pyarrow as pa
+        for batch in self._record_batches():
+            yield pa.Table.from_batches([batch])
+
+    def fetch_pandas_batches(self):
+        """Yield the result as typed DataFrames"""
+        for batch in self._record_batches():
+            yield batch.to_pandas()
+
+    def close(self):
+        self._cursor.close()
+
+
+class LocalConnection:
+    """
+    In-memory DuckDB database with one view per extracted table
+
+    Args:
+        local_dir: Extract location (default: data/local)
+    """
+
+    def __init__(self, local_dir=None):
+        import duckdb
+
+        self.local_dir = _local_dir(local_dir)
+        self.manifest = load_extract_manifest(self.local_dir)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No local extract in {self.local_dir}; run "
+                                    f"'python local_backend.py extract' or 'synthetic' first")
+        self._db = duckdb.connect(':memory:')
+        for table, info in self.manifest['tables'].items():
+            path = os.path.join(self.local_dir, info['path']).replace("'", "''")
+            self._db.execute(f"create view {table} as select * from read_parquet('{path}')")
+        self._window = (to_date(self.manifest['start_date']), to_date(self.manifest['end_date']))
+        self._warned = set()
+        self._closed = False
+
+    def _check_window(self, params):
+        """Warn once per date when a query asks for days outside the extract"""
+        start, end = self._window
+        for value in params or []:
+            if not isinstance(value, str) or not _ISO_DATE.match(value) or value in self._warned:
+                continue
+            day = to_date(value)
+            if day < start or day > end:
+                self._warned.add(value)
+                warnings.warn(f"{value} is outside the local extract ({start} to {end}); "
+                              f"results near it will be incomplete", stacklevel=3)
+
+    def cursor(self):
+        if self._closed:
+            raise RuntimeError("Connection is closed")
+        return LocalCursor(self)
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._db.close()
+
+
+def connect(local_dir=None):
+    """Open a connection to the local extract (a connect() factory for ConnectionPool)"""
+    return LocalConnection(local_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract source tables and run the sql/ queries locally')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    extract_parser = subparsers.add_parser('extract', help='Pull the source tables from Snowflake')
+    extract_parser.add_argument('--start-date', required=True, help='First day, YYYY-MM-DD (inclusive)')
+    extract_parser.add_argument('--end-date', required=True, help='Last day, YYYY-MM-DD (exclusive)')
+    extract_parser.add_argument('--tables', help=f"Comma-separated subset of: {', '.join(SOURCE_TABLES)}")
+    extract_parser.add_argument('--all-venue-types', action='store_true',
+                                help='Keep non-Fitness venues in schedules and venue-days')
+
+    synthetic_parser = subparsers.add_parser('synthetic', help='Write a seeded synthetic extract')
+    synthetic_parser.add_argument('--venues', type=int, default=300)
+    synthetic_parser.add_argument('--start-date', default='2024-10-01', help='First day, YYYY-MM-DD')
+    synthetic_parser.add_argument('--days', type=int, default=60)
+    synthetic_parser.add_argument('--seed', type=int, default=0)
+
+    subparsers.add_parser('info', help='Describe the current extract')
+
+    run_parser = subparsers.add_parser('run', help='Run a named query against the extract')
+    run_parser.add_argument('preset', help='Named query from sql_templates.PRESETS')
+    run_parser.add_argument('--start-date', help='Override the first day, YYYY-MM-DD (inclusive)')
+    run_parser.add_argument('--end-date', help='Override the last day, YYYY-MM-DD (exclusive)')
+    run_parser.add_argument('--output', help='Write the result to this CSV file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'extract':
+        manifest = extract(args.start_date, args.end_date,
+                           tables=args.tables.split(',') if args.tables else None,
+                           fitness_only=not args.all_venue_types)
+        print(f"💾 Extract covers {manifest['start_date']} to {manifest['end_date']} in {LOCAL_DIR}")
+        return 0
+
+    if args.command == 'synthetic':
+        from synthetic_data import source_tables
+        start = to_date(args.start_date)
+        tables = source_tables(n_venues=args.venues, start_date=start, n_days=args.days, seed=args.seed)
+        manifest = write_tables(tables, start + timedelta(days=LOOKBACK_DAYS),
+                                start + timedelta(days=args.days),
+                                source=f'synthetic (venues={args.venues}, seed={args.seed})')
+        print(f"💾 Synthetic extract covers {manifest['start_date']} to {manifest['end_date']} in {LOCAL_DIR}")
+        return 0
+
+    if args.command == 'info':
+        manifest = load_extract_manifest()
+        if manifest is None:
+            print(f"No local extract in {LOCAL_DIR}")
+            return 1
+        print(f"Window: {manifest['start_date']} to {manifest['end_date']} "
+              f"(source: {manifest['source']}, extracted {manifest['extracted_at']})")
+        for table, info in manifest['tables'].items():
+            print(f"  {table:<24} {info['rows']:>10} rows")
+        return 0
+
+    from sql_templates import render_preset
+    sql, params = render_preset(args.preset, start_date=args.start_date, end_date=args.end_date)
+    conn = connect()
+    try:
+        cursor = conn.cursor().execute(sql, params)
+        import pandas as pd
+        df = pd.DataFrame(cursor.fetchall(), columns=[col[0].lower() for col in cursor.description])
+    finally:
+        conn.close()
+    if args.output:
+        df.to_csv(args.output, index=False)
+        print(f"💾 {len(df)} rows saved to: {args.output}")
+    else:
+        print(df.to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Partitioned Parquet store for query results
+
+Replaces the timestamped CSV dumps: every run upserts its rows into one dataset per
+metric, partitioned by month of the date column:
+
+    data/metrics/
+        manifest.json
+        soft_churn_r7/month=2024-10/part.parquet
+        soft_churn_r7/month=2024-11/part.parquet
+        ...
+
+The manifest records each metric's date column, schema and, per partition, the row
+count and first/last date. Reads use it to open only the partitions that overlap the
+requested window, then push the column projection and date filter down into the
+Parquet reader. Columns are stored typed (date32, float64, int64), so nothing is
+re-parsed on load.
+
+Writing rows for dates that are already stored replaces those dates, so re-running a
+query is idempotent and "the latest file" no longer needs to be guessed.
+
+Usage:
+    python metric_store.py list
+    python metric_store.py show soft_churn_r7 --start-date 2025-10-01 --columns all_fitness_r7_pct
+    python metric_store.py export soft_churn_r7 soft_churn_r7.csv --start-date 2024-01-01
+    python metric_store.py import soft_churn_r7 soft_churn_rolling_7day_results_20251218_101500.csv
+"""
+import sys
+import os
+import json
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+import query_metrics
+from sql_templates import to_date
+
+# pandas and pyarrow are imported by the functions that read or write data, so listing
+# the store (metrics(), cli.py list) doesn't pay for them
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+STORE_DIR = os.path.join(PROJECT_ROOT, 'data', 'metrics')
+
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+LOCK_NAME = 'manifest.lock'
+
+# Date columns used by the sql/ templates, in lookup order
+DATE_COLUMNS = ('date', 'month_date', 'month')
+
+
+def _store_dir(store_dir):
+    return store_dir or STORE_DIR
+
+
+def load_manifest(store_dir=None):
+    """Return the manifest dict, or an empty one if the store doesn't exist yet"""
+    path = os.path.join(_store_dir(store_dir), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {'version': MANIFEST_VERSION, 'metrics': {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest, store_dir=None):
+    """Write the manifest atomically"""
+    path = os.path.join(_store_dir(store_dir), MANIFEST_NAME)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _replace_atomically(path, lambda tmp_path: _dump_json(manifest, tmp_path))
+
+
+def _dump_json(data, path):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def _replace_atomically(path, write_file):
+    """Write a file through a temp file of its own in the same directory, then move it into place"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.',
+                                    suffix='.tmp')
+    os.close(fd)
+    try:
+        write_file(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Serializes writers in this process; the file lock serializes processes
+_write_lock = threading.Lock()
+
+
+@contextmanager
+def _locked(store_dir):
+    """
+    Hold the store's write lock
+
+    Writers read the manifest and partitions, merge their rows in and write both back,
+    so two writers at once (parallel runners, refresh_scheduler workers) would drop each
+    other's rows and manifest entries.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    with _write_lock, open(os.path.join(store_dir, LOCK_NAME), 'a') as lock_file:
+        try:
+            import fcntl
+        except ImportError:
+            # No advisory file locks (Windows): writers are serialized within the process only
+            fcntl = None
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _date_column(df):
+    """Find the date column of a query result"""
+    for name in DATE_COLUMNS:
+        if name in df.columns:
+            return name
+    raise KeyError(f"No date column ({', '.join(DATE_COLUMNS)}) in {list(df.columns)}")
+
+
+def _typed(df, date_column):
+    """
+    Normalize a query result for storage
+
+    Lower-cases column names, turns the date column into datetime64 and converts object
+    columns holding only numbers (Snowflake NUMBER columns arrive as Decimal) to float64.
+    The compact dtypes of typed query results (result_types.py) are widened back, so every
+    partition of a metric keeps the same schema.
+    """
+    import pandas as pd
+    import result_types
+    df = result_types.widen(df)
+    df.columns = df.columns.str.lower()
+    df[date_column] = pd.to_datetime(df[date_column]).dt.normalize()
+    for col in df.columns:
+        if col == date_column or df[col].dtype != object:
+            continue
+        values = df[col].dropna()
+        if len(values) and values.map(lambda v: isinstance(v, (Decimal, int, float))).all():
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    return df
+
+
+def _to_arrow(df, date_column):
+    """Convert to an Arrow table with the date column as date32"""
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    index = table.schema.get_field_index(date_column)
+    return table.set_column(index, date_column, table.column(date_column).cast(pa.date32()))
+
+
+def _partition_path(metric, month_key):
+    """Partition file path relative to the store directory"""
+    return os.path.join(metric, f'month={month_key}', 'part.parquet')
+
+
+def write(metric, df, source=None, store_dir=None):
+    """
+    Upsert a query result into the store
+
+    Rows are grouped by month of the date column. For each month touched, stored rows
+    for the same dates are replaced and the partition file is rewritten atomically;
+    other months are left alone. The write time, rows and bytes are recorded by
+    query_metrics.
+
+    Args:
+        metric: Dataset name (e.g. 'soft_churn_r7')
+        df: Query result with a date, month_date or month column
+        source: Optional free-text note recorded in the manifest (e.g. the named query)
+        store_dir: Store location (default: data/metrics)
+
+    Returns:
+        List of partition file paths that were written
+    """
+    store_dir = _store_dir(store_dir)
+    record = query_metrics.QueryRecord('write', name=metric)
+    try:
+        with record.phase('write'), _locked(store_dir):
+            written = _write(metric, df, source, store_dir)
+    except Exception as e:
+        record.finish('error', e)
+        raise
+    record.rows = len(df)
+    record.bytes = sum(os.path.getsize(path) for path in written)
+    record.finish()
+    return written
+
+
+def _write(metric, df, source, store_dir):
+    import pandas as pd
+    import pyarrow.parquet as pq
+    manifest = load_manifest(store_dir)
+    entry = manifest['metrics'].get(metric, {'partitions': {}})
+    date_column = entry.get('date_column') or _date_column(df.rename(columns=str.lower))
+    df = _typed(df, date_column)
+
+    written = []
+    months = df[date_column].dt.strftime('%Y-%m')
+    for month_key, rows in df.groupby(months, sort=True):
+        relative_path = _partition_path(metric, month_key)
+        path = os.path.join(store_dir, relative_path)
+        if os.path.exists(path):
+            stored = pq.read_table(path).to_pandas()
+            stored[date_column] = pd.to_datetime(stored[date_column])
+            stored = stored[~stored[date_column].isin(rows[date_column])]
+            rows = pd.concat([stored, rows], ignore_index=True)
+        rows = rows.sort_values(date_column).reset_index(drop=True)
+
+        table = _to_arrow(rows, date_column)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _replace_atomically(path, lambda tmp_path: pq.write_table(table, tmp_path))
+        written.append(path)
+
+        entry['partitions'][month_key] = {
+            'path': relative_path,
+            'rows': len(rows),
+            'min_date': rows[date_column].min().date().isoformat(),
+            'max_date': rows[date_column].max().date().isoformat(),
+            'updated_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        entry['schema'] = {field.name: str(field.type) for field in table.schema}
+
+    entry['date_column'] = date_column
+    if source:
+        entry['source'] = source
+    entry['partitions'] = dict(sorted(entry['partitions'].items()))
+    manifest['metrics'][metric] = entry
+    _save_manifest(manifest, store_dir)
+    return written
+
+
+def read(metric, columns=None, start_date=None, end_date=None, store_dir=None):
+    """
+    Load a metric, reading only what is needed
+
+    Partitions outside [start_date, end_date) are skipped using the manifest; the
+    column list and date filter are pushed down into the Parquet reader.
+
+    Args:
+        metric: Dataset name
+        columns: Columns to load (the date column is always included); None for all
+        start_date: First day to return (inclusive), date or YYYY-MM-DD
+        end_date: Last day to return (exclusive), date or YYYY-MM-DD
+        store_dir: Store location (default: data/metrics)
+
+    Returns:
+        DataFrame sorted by date, with the date column as datetime64
+
+    Raises:
+        KeyError: If the metric isn't in the store
+    """
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    store_dir = _store_dir(store_dir)
+    manifest = load_manifest(store_dir)
+    if metric not in manifest['metrics']:
+        raise KeyError(f"Metric '{metric}' is not in the store; stored: {list(manifest['metrics'])}")
+    entry = manifest['metrics'][metric]
+    date_column = entry['date_column']
+    start_date, end_date = to_date(start_date), to_date(end_date)
+
+    if columns is not None:
+        columns = [date_column] + [col for col in columns if col != date_column]
+    filters = []
+    if start_date:
+        filters.append((date_column, '>=', start_date))
+    if end_date:
+        filters.append((date_column, '<', end_date))
+
+    tables = []
+    for partition in entry['partitions'].values():
+        if start_date and to_date(partition['max_date']) < start_date:
+            continue
+        if end_date and to_date(partition['min_date']) >= end_date:
+            continue
+        tables.append(pq.read_table(os.path.join(store_dir, partition['path']), columns=columns,
+                                    filters=filters or None))
+
+    if not tables:
+        # Nothing in the window: return the stored columns with no rows
+        first = next(iter(entry['partitions'].values()))
+        schema = pq.read_schema(os.path.join(store_dir, first['path']))
+        df = pa.schema([schema.field(name) for name in (columns or schema.names)]).empty_table().to_pandas()
+    else:
+        df = pa.concat_tables(tables, promote_options='permissive').to_pandas()
+    df[date_column] = pd.to_datetime(df[date_column])
+    return df.sort_values(date_column).reset_index(drop=True)
+
+
+def metrics(store_dir=None):
+    """Return {metric: summary} for every stored metric"""
+    summary = {}
+    for metric, entry in load_manifest(store_dir)['metrics'].items():
+        partitions = entry['partitions'].values()
+        summary[metric] = {
+            'date_column': entry['date_column'],
+            'partitions': len(entry['partitions']),
+            'rows': sum(p['rows'] for p in partitions),
+            'min_date': min((p['min_date'] for p in partitions), default=None),
+            'max_date': max((p['max_date'] for p in partitions), default=None),
+            'source': entry.get('source'),
+        }
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect, export or import the Parquet metric store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='List stored metrics')
+
+    for name, help_text in (('show', 'Print stored rows'), ('export', 'Write stored rows to a CSV file')):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('metric')
+        if name == 'export':
+            sub.add_argument('output', help='CSV file to write')
+        sub.add_argument('--start-date', help='First day, YYYY-MM-DD (inclusive)')
+        sub.add_argument('--end-date', help='Last day, YYYY-MM-DD (exclusive)')
+        sub.add_argument('--columns', help='Comma-separated columns to load')
+
+    import_parser = subparsers.add_parser('import', help='Load CSV results (e.g. old timestamped dumps)')
+    import_parser.add_argument('metric')
+    import_parser.add_argument('files', nargs='+', help='CSV files, applied oldest first')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        summary = metrics()
+        if not summary:
+            print(f"Store is empty ({STORE_DIR})")
+            return 0
+        print(f"{'Metric':<34} {'Rows':>7} {'Parts':>6}  {'From':<11} {'To':<11} Source")
+        for metric, info in summary.items():
+            print(f"{metric:<34} {info['rows']:>7} {info['partitions']:>6}  "
+                  f"{info['min_date'] or '':<11} {info['max_date'] or '':<11} {info['source'] or ''}")
+        return 0
+
+    if args.command == 'import':
+        import pandas as pd
+        for path in sorted(args.files, key=os.path.getmtime):
+            paths = write(args.metric, pd.read_csv(path), source=os.path.basename(path))
+            print(f"✓ Imported {os.path.basename(path)} into {len(paths)} partition(s) of {args.metric}")
+        return 0
+
+    try:
+        df = read(args.metric, columns=args.columns.split(',') if args.columns else None,
+                  start_date=args.start_date, end_date=args.end_date)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        return 1
+
+    if args.command == 'export':
+        df.to_csv(args.output, index=False)
+        print(f"💾 {len(df)} rows saved to: {args.output}")
+    else:
+        print(df.to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Year-over-year and period-over-period comparisons of the stored chart series
+
+The R7 charts cover Oct-Nov 2024 and 2025 so that the years can be compared, but the
+comparison was done by hand from two runs. compare() lines each day (month) of a window
+up with its reference period and computes the change for every segment column at once:
+
+    calendar  the same calendar day (month) `years` earlier; Feb 29 maps to Feb 28
+    weekday   364 days (52 weeks) per year earlier, so a Monday is compared with a
+              Monday and weekly patterns don't show up as changes (daily series only)
+    previous  the window of the same length just before it (period over period)
+    offset    a custom number of days (months) earlier, e.g. to line holidays up
+
+Both windows are read from the metric store (metric_store.py), only the partitions they
+touch, so any comparison is a local read of a few hundred rows and never a new warehouse
+query. The references are looked up with one searchsorted over the sorted date index,
+and deltas and ratios are computed over all segment columns as a single numpy array.
+
+For each segment column the result has the value, the reference value (`_ref`), the
+delta (`_delta`, in the metric's units, i.e. % points for rates) and the ratio
+(`_ratio`, value / reference). Periods without a reference row are NaN.
+
+Usage:
+    python period_compare.py soft_churn_r7 --start-date 2025-10-01 --end-date 2025-12-01
+    python period_compare.py spot_allocation_r7 --start-date 2025-10-01 --end-date 2025-12-01 --align weekday
+    python period_compare.py disabled_schedules_r7 --start-date 2025-11-01 --end-date 2025-12-01 --align previous --daily
+    python period_compare.py soft_churn_monthly --start-date 2025-01-01 --align calendar --years 1
+"""
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import metric_store
+from anomaly_checks import date_column_of, lookup_rows, period_dates, period_numbers
+
+ALIGNMENTS = ('calendar', 'weekday', 'previous', 'offset')
+
+# 52 weeks: the closest same-weekday day to a year earlier
+WEEKDAY_YEAR_DAYS = 364
+
+SUMMARY_COLUMNS = ['segment', 'periods', 'value', 'reference', 'delta', 'ratio']
+
+
+def period_of(df):
+    """'day' for daily series, 'month' for monthly ones (month_date / month columns)"""
+    return 'day' if date_column_of(df) == 'date' else 'month'
+
+
+def reference_periods(dates, period, align='calendar', years=1, offset=None):
+    """
+    Period numbers (see anomaly_checks.period_numbers) each date is compared with
+
+    Args:
+        dates: DatetimeIndex of the compared window, sorted
+        period: 'day' or 'month'
+        align: One of ALIGNMENTS
+        years: Years back for calendar and weekday alignment
+        offset: Days (months for monthly series) back for offset alignment
+
+    Raises:
+        ValueError: For an unknown alignment, weekday alignment of a monthly series or
+            offset alignment without an offset
+    """
+    if align not in ALIGNMENTS:
+        raise ValueError(f"Unknown alignment {align!r}; known: {', '.join(ALIGNMENTS)}")
+    periods = period_numbers(dates, period)
+    if align == 'calendar':
+        if period == 'month':
+            return periods - 12 * years
+        return period_numbers(dates - pd.DateOffset(years=years), 'day')
+    if align == 'weekday':
+        if period == 'month':
+            raise ValueError("Weekday alignment needs a daily series")
+        return periods - WEEKDAY_YEAR_DAYS * years
+    if align == 'previous':
+        if len(periods) == 0:
+            return periods
+        return periods - (periods.max() - periods.min() + 1)
+    if offset is None:
+        raise ValueError("Offset alignment needs an offset")
+    return periods - offset
+
+
+def compare(df, history=None, columns=None, align='calendar', years=1, offset=None):
+    """
+    Compare every row of a window with its reference period
+
+    Args:
+        df: The compared window of a stored series (date column plus segment columns)
+        history: Rows holding the references, sorted by date (default: df itself)
+        columns: Segment columns to compare (default: every numeric column)
+        align, years, offset: See reference_periods()
+
+    Returns:
+        DataFrame with the date column, reference_date and, per segment column, the
+        value, `<column>_ref`, `<column>_delta` and `<column>_ratio`
+    """
+    date_column = date_column_of(df)
+    period = period_of(df)
+    if history is None:
+        history = df
+    if columns is None:
+        columns = [col for col in df.columns
+                   if col != date_column and pd.api.types.is_numeric_dtype(df[col])]
+
+    dates = pd.DatetimeIndex(df[date_column])
+    wanted = reference_periods(dates, period, align=align, years=years, offset=offset)
+    values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    reference = lookup_rows(period_numbers(pd.DatetimeIndex(history[date_column]), period),
+                        history[columns].to_numpy(dtype=np.float64, na_value=np.nan), wanted)
+    delta = values - reference
+    ratio = np.full_like(values, np.nan)
+    np.divide(values, reference, out=ratio, where=reference != 0)
+
+    result = {date_column: dates, 'reference_date': period_dates(wanted, period)}
+    for i, column in enumerate(columns):
+        result[column] = values[:, i]
+        result[f"{column}_ref"] = reference[:, i]
+        result[f"{column}_delta"] = delta[:, i]
+        result[f"{column}_ratio"] = ratio[:, i]
+    return pd.DataFrame(result)
+
+
+def summarize(comparison, columns=None):
+    """
+    Window averages per segment over the periods that have both values
+
+    Args:
+        comparison: compare() result
+        columns: Segment columns (default: every column compare() produced)
+
+    Returns:
+        DataFrame with SUMMARY_COLUMNS, one row per segment
+    """
+    if columns is None:
+        columns = [col[:-len('_ref')] for col in comparison.columns if col.endswith('_ref')]
+    values = comparison[columns].to_numpy(dtype=np.float64)
+    reference = comparison[[f"{col}_ref" for col in columns]].to_numpy(dtype=np.float64)
+    paired = ~np.isnan(values) & ~np.isnan(reference)
+    counts = paired.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        value_means = np.where(paired, values, 0).sum(axis=0) / counts
+        reference_means = np.where(paired, reference, 0).sum(axis=0) / counts
+        ratio = np.where(reference_means != 0, value_means / reference_means, np.nan)
+    return pd.DataFrame({'segment': columns, 'periods': counts, 'value': value_means,
+                         'reference': reference_means, 'delta': value_means - reference_means,
+                         'ratio': ratio}, columns=SUMMARY_COLUMNS)
+
+
+def compare_metric(metric, start_date, end_date=None, columns=None, align='calendar', years=1, offset=None,
+                   store_dir=None):
+    """
+    Compare a window of a stored metric with its reference periods
+
+    Reads the window and the reference window from the metric store; nothing is
+    queried.
+
+    Args:
+        metric: Metric store name (e.g. soft_churn_r7)
+        start_date: First day of the window, date or YYYY-MM-DD (inclusive)
+        end_date: Last day of the window (exclusive); None for everything stored
+        columns, align, years, offset: See compare()
+        store_dir: Metric store location (default: data/metrics)
+
+    Returns:
+        compare() result
+
+    Raises:
+        KeyError: If the metric isn't in the store
+        ValueError: For a column the metric doesn't have; see also reference_periods()
+    """
+    if columns is not None:
+        entry = metric_store.load_manifest(store_dir)['metrics'].get(metric)
+        unknown = [col for col in columns if entry and col not in entry['schema']]
+        if unknown:
+            raise ValueError(f"Unknown column(s) {', '.join(unknown)}; {metric} has "
+                             f"{', '.join(col for col in entry['schema'] if col != entry['date_column'])}")
+    df = metric_store.read(metric, columns=columns, start_date=start_date, end_date=end_date,
+                           store_dir=store_dir)
+    if align == 'previous' and end_date is not None and len(df):
+        # The requested window's length, even if its first or last days aren't stored
+        bounds = pd.DatetimeIndex([pd.Timestamp(start_date), pd.Timestamp(end_date)])
+        align, offset = 'offset', int(np.diff(period_numbers(bounds, period_of(df)))[0])
+    if len(df) == 0:
+        return compare(df, columns=columns, align=align, years=years, offset=offset)
+    date_column = date_column_of(df)
+    period = period_of(df)
+    dates = pd.DatetimeIndex(df[date_column])
+    wanted = reference_periods(dates, period, align=align, years=years, offset=offset)
+    # The reference window, read separately so the stretch between the two isn't loaded
+    reference_dates = period_dates([wanted.min(), wanted.max()], period)
+    end = reference_dates[1] + (pd.DateOffset(months=1) if period == 'month' else pd.Timedelta(days=1))
+    history = metric_store.read(metric, columns=columns, start_date=reference_dates[0].date(),
+                                end_date=end.date(), store_dir=store_dir)
+    if len(history) and history[date_column].max() >= dates[0] and history[date_column].min() <= dates[-1]:
+        # Overlapping windows (short offsets): one copy of each row
+        history = (pd.concat([history, df], ignore_index=True).drop_duplicates(date_column)
+                   .sort_values(date_column, ignore_index=True))
+    return compare(df, history=history, columns=columns, align=align, years=years, offset=offset)
+
+
+def _print_summary(summary, decimals):
+    print(f"{'Segment':<28} {'Periods':>7} {'Value':>10} {'Reference':>10} {'Delta':>10} {'Ratio':>8}")
+    print('-' * 78)
+    for row in summary.itertuples(index=False):
+        print(f"{row.segment:<28} {row.periods:>7} {row.value:>10.{decimals}f} {row.reference:>10.{decimals}f} "
+              f"{row.delta:>+10.{decimals}f} {row.ratio:>8.3f}")
+
+
+def _print_daily(comparison, columns, decimals):
+    date_column = comparison.columns[0]
+    print(f"\n{'Date':<12} {'Reference':<12} " + ' '.join(f"{col[:22]:>22}" for col in columns))
+    print('-' * (25 + 23 * len(columns)))
+    for i in range(len(comparison)):
+        cells = []
+        for col in columns:
+            value, delta = comparison[col].iat[i], comparison[f"{col}_delta"].iat[i]
+            cells.append(f"{f'{value:.{decimals}f} ({delta:+.{decimals}f})':>22}")
+        print(f"{comparison[date_column].iat[i]:%Y-%m-%d}   {comparison['reference_date'].iat[i]:%Y-%m-%d}   "
+              + ' '.join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare a stored chart metric with a year (or period) earlier')
+    parser.add_argument('metric', help='Metric store name (see metric_store.py list)')
+    parser.add_argument('--start-date', required=True, help='First day of the window, YYYY-MM-DD (inclusive)')
+    parser.add_argument('--end-date', help='Last day of the window, YYYY-MM-DD (exclusive)')
+    parser.add_argument('--align', choices=ALIGNMENTS, default='calendar',
+                        help='How periods are lined up (default: calendar)')
+    parser.add_argument('--years', type=int, default=1, help='Years back for calendar / weekday alignment')
+    parser.add_argument('--offset', type=int, help='Days (months for monthly metrics) back for --align offset')
+    parser.add_argument('--columns', help='Comma-separated segment columns (default: all)')
+    parser.add_argument('--daily', action='store_true', help='Also print every period with its delta')
+    parser.add_argument('--decimals', type=int, default=4, help='Digits after the decimal point')
+    parser.add_argument('--output', help='Write the per-period comparison to this CSV file')
+    parser.add_argument('--local', action='store_true', help='Compare the local store')
+    args = parser.parse_args(argv)
+
+    store_dir = None
+    if args.local:
+        import local_backend
+        store_dir = local_backend.METRICS_DIR
+    columns = [col.strip() for col in args.columns.split(',')] if args.columns else None
+    try:
+        comparison = compare_metric(args.metric, args.start_date, args.end_date, columns=columns,
+                                    align=args.align, years=args.years, offset=args.offset, store_dir=store_dir)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        return 1
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if len(comparison) == 0:
+        print(f"❌ No {args.metric} rows from {args.start_date}.")
+        return 1
+
+    summary = summarize(comparison, columns)
+    date_column = comparison.columns[0]
+    print(f"\n📅 {args.metric}: {comparison[date_column].iloc[0]:%Y-%m-%d} to "
+          f"{comparison[date_column].iloc[-1]:%Y-%m-%d} vs {comparison['reference_date'].iloc[0]:%Y-%m-%d} to "
+          f"{comparison['reference_date'].iloc[-1]:%Y-%m-%d} ({args.align} alignment)\n")
+    if summary['periods'].max() == 0:
+        print(f"❌ No {args.metric} rows stored for the reference periods. Run the query for that window "
+              f"first, e.g. with --start-date {comparison['reference_date'].iloc[0]:%Y-%m-%d}.")
+        return 1
+    _print_summary(summary, args.decimals)
+    missing = len(comparison) - int(summary['periods'].min())
+    if missing:
+        print(f"\n⚠️ {missing} period(s) without a reference row are left out of the averages")
+    if args.daily:
+        _print_daily(comparison, list(summary['segment']), args.decimals)
+    if args.output:
+        comparison.to_csv(args.output, index=False)
+        print(f"\n💾 Saved to: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Local on-disk cache for query results
+
+Results are keyed on the normalized query text plus its bind parameters, so re-running
+an unchanged query (e.g. to re-render a table) returns in milliseconds without using
+warehouse credits. Entries expire after a TTL and the cache is kept under a size limit
+by evicting the least recently used entries.
+
+Usage:
+    python query_cache.py --stats
+    python query_cache.py --clear
+"""
+import sys
+import os
+import re
+import json
+import time
+import threading
+import hashlib
+import argparse
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'data', 'cache')
+
+DEFAULT_TTL_SECONDS = 24 * 3600            # 1 day
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024     # 1 GB
+
+# Single-quoted string literals (with '' escapes) or -- line comments
+_LITERAL_OR_COMMENT = re.compile(r"('(?:[^']|'')*')|(--[^\n]*)")
+
+
+def normalize_query(query):
+    """
+    Normalize SQL text for cache keys: drop -- comments and collapse whitespace
+
+    String literals are left untouched, so '%schedule disable%' and friends keep their meaning.
+    """
+    parts = []
+    last = 0
+    for match in _LITERAL_OR_COMMENT.finditer(query):
+        parts.append(' '.join(query[last:match.start()].split()))
+        if match.group(1):
+            parts.append(match.group(1))
+        last = match.end()
+    parts.append(' '.join(query[last:].split()))
+    return ' '.join(p for p in parts if p).rstrip(';').strip()
+
+
+def cache_key(query, params=None, backend=None):
+    """
+    Return the content-addressed cache key for a query and its bind parameters
+
+    backend names a non-warehouse backend (e.g. 'local'), so its results never answer
+    warehouse queries; None keeps the warehouse keys unchanged.
+    """
+    key = {'query': normalize_query(query), 'params': params}
+    if backend:
+        key['backend'] = backend
+    payload = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _paths(key, cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    return os.path.join(cache_dir, f'{key}.pkl'), os.path.join(cache_dir, f'{key}.json')
+
+
+def get(key, ttl_seconds=DEFAULT_TTL_SECONDS, cache_dir=None):
+    """
+    Return the cached DataFrame for key, or None on a miss or expired entry
+
+    Args:
+        key: Key from cache_key()
+        ttl_seconds: Maximum entry age in seconds (None = never expires)
+        cache_dir: Cache directory (default: data/cache)
+    """
+    data_path, meta_path = _paths(key, cache_dir)
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if ttl_seconds is not None and time.time() - meta['created_at'] > ttl_seconds:
+        invalidate(key, cache_dir=cache_dir)
+        return None
+
+    try:
+        import pandas as pd
+        df = pd.read_pickle(data_path)
+    except Exception:
+        invalidate(key, cache_dir=cache_dir)
+        return None
+
+    # Touch the entry so eviction sees it as recently used
+    try:
+        os.utime(data_path, None)
+    except FileNotFoundError:
+        # Evicted by another thread since it was read; the result is still good
+        pass
+    return df
+
+
+def put(key, df, query=None, params=None, max_bytes=DEFAULT_MAX_BYTES, cache_dir=None):
+    """
+    Store a DataFrame under key, then evict old entries if the cache is over max_bytes
+
+    Args:
+        key: Key from cache_key()
+        df: Query results
+        query: Original query text (kept in the metadata for --stats)
+        params: Bind parameters (kept in the metadata for --stats)
+        max_bytes: Size limit for the whole cache directory
+        cache_dir: Cache directory (default: data/cache)
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path, meta_path = _paths(key, cache_dir)
+
+    # Write to temp files first so concurrent readers never see a partial entry; the
+    # suffix is per thread, as execute_queries_parallel's workers share the process
+    tmp_suffix = f'.tmp{os.getpid()}-{threading.get_ident()}'
+    df.to_pickle(data_path + tmp_suffix)
+    meta = {
+        'created_at': time.time(),
+        'rows': len(df),
+        'query': normalize_query(query)[:200] if query else None,
+        'params': params,
+    }
+    with open(meta_path + tmp_suffix, 'w') as f:
+        json.dump(meta, f, default=str)
+    os.replace(data_path + tmp_suffix, data_path)
+    os.replace(meta_path + tmp_suffix, meta_path)
+
+    evict(max_bytes=max_bytes, cache_dir=cache_dir)
+
+
+def invalidate(key, cache_dir=None):
+    """Remove a single cache entry"""
+    for path in _paths(key, cache_dir):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _entries(cache_dir=None):
+    """Return [(key, size_bytes, last_used)] for every entry in the cache"""
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.pkl'):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            # Evicted or invalidated by another thread while listing
+            continue
+        entries.append((name[:-len('.pkl')], stat.st_size, stat.st_mtime))
+    return entries
+
+
+def evict(max_bytes=DEFAULT_MAX_BYTES, cache_dir=None):
+    """Remove least recently used entries until the cache fits in max_bytes"""
+    entries = sorted(_entries(cache_dir), key=lambda e: e[2])
+    total = sum(size for _, size, _ in entries)
+    for key, size, _ in entries:
+        if total <= max_bytes:
+            break
+        invalidate(key, cache_dir=cache_dir)
+        total -= size
+
+
+def clear(cache_dir=None):
+    """Remove every cache entry and return how many were removed"""
+    entries = _entries(cache_dir)
+    for key, _, _ in entries:
+        invalidate(key, cache_dir=cache_dir)
+    return len(entries)
+
+
+def stats(cache_dir=None):
+    """Return (entry_count, total_bytes) for the cache"""
+    entries = _entries(cache_dir)
+    return len(entries), sum(size for _, size, _ in entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect or clear the local query result cache')
+    parser.add_argument('--clear', action='store_true', help='Remove every cached result')
+    parser.add_argument('--stats', action='store_true', help='Show cache size')
+    args = parser.parse_args(argv)
+
+    if args.clear:
+        print(f"🗑️  Removed {clear()} cached result(s) from {CACHE_DIR}")
+    else:
+        count, total_bytes = stats()
+        print(f"📦 {count} cached result(s), {total_bytes / 1024 / 1024:.1f} MB in {CACHE_DIR}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
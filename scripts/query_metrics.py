@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Per-query instrumentation: phase timings, rows, bytes and warehouse query IDs
+
+Every query run through snowflake_connection.py (and every metric_store write) produces
+one record:
+
+    {"run_id": "...", "kind": "query", "name": "soft_churn", "backend": "snowflake",
+     "query_id": "01b9...", "query_hash": "3f2a...", "status": "ok", "attempt": 1,
+     "phases": {"pool_wait": 0.0, "connect": 0.0, "liveness_check": 0.0,
+                "alter_session": 0.0, "execute": 412.3, "fetch": 1.8, "dataframe": 0.2},
+     "total_seconds": 414.3, "rows": 1065, "bytes": 102400, "untyped_bytes": 389120,
+     "context": {...}}
+
+Phases:
+    cache_lookup    result cache read (query_cache.py)
+    pool_wait       waiting for a free pooled connection
+    connect         opening a new connection (SSO login for Snowflake)
+    liveness_check  SELECT 1 on a connection idle for a long time
+    alter_session   setting a non-default statement timeout
+    execute         cursor.execute: warehouse compile + run until the first result
+    fetch           pulling the result over the network
+    dataframe       building the pandas DataFrame (typed by result_types.py)
+    write           metric store upsert (kind "write" records)
+
+Records are appended as JSON lines to data/query_log/queries.jsonl (QUERY_LOG_PATH
+overrides the file; set it to "off" to disable) and passed to any hooks registered
+with add_hook(), e.g. to forward them to a metrics service. Records of one process share
+a run_id. Fields set with `with context(...)` (query name, template, retry attempt) are
+added to every record started inside the block.
+
+Usage:
+    python query_metrics.py summary                    # slowest queries and phases
+    python query_metrics.py summary --runs 5 --top 20
+    python query_metrics.py summary --warehouse        # add bytes scanned from query history
+    python query_metrics.py tail -n 20
+"""
+import sys
+import os
+import json
+import time
+import uuid
+import argparse
+import threading
+import statistics
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+LOG_PATH = os.path.join(PROJECT_ROOT, 'data', 'query_log', 'queries.jsonl')
+
+PHASES = ('cache_lookup', 'pool_wait', 'connect', 'liveness_check', 'alter_session', 'execute', 'fetch',
+          'dataframe', 'write')
+
+# Identifies the records of one process (one runner invocation); QUERY_RUN_ID overrides
+RUN_ID = os.environ.get('QUERY_RUN_ID') or f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+_log_path = os.environ.get('QUERY_LOG_PATH', LOG_PATH)
+_hooks = []
+_write_lock = threading.Lock()
+_local = threading.local()
+
+
+def set_log_path(path):
+    """Write records to path; None (or 'off') disables the JSON-lines log"""
+    global _log_path
+    _log_path = path
+
+
+def log_path():
+    """Return the JSON-lines log file, or None if logging is disabled"""
+    if not _log_path or _log_path.lower() == 'off':
+        return None
+    return _log_path
+
+
+def add_hook(hook):
+    """Call hook(record_dict) for every finished record"""
+    _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+def _context_stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = [{}]
+    return _local.stack
+
+
+def current_context():
+    """Fields set by the enclosing context() blocks on this thread"""
+    return dict(_context_stack()[-1])
+
+
+@contextmanager
+def context(**fields):
+    """Add fields (e.g. query='soft_churn', attempt=2) to records started in this block"""
+    stack = _context_stack()
+    stack.append({**stack[-1], **fields})
+    try:
+        yield
+    finally:
+        stack.pop()
+
+
+def _emit(record):
+    path = log_path()
+    if path:
+        line = json.dumps(record, sort_keys=True, default=str)
+        with _write_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a') as f:
+                f.write(line + '\n')
+    for hook in list(_hooks):
+        try:
+            hook(record)
+        except Exception as e:
+            # Instrumentation must never fail a query
+            print(f"⚠️ Query metrics hook {getattr(hook, '__name__', hook)} failed: {e}")
+
+
+class QueryRecord:
+    """
+    Timings and counts for one query (or store write), emitted once by finish()
+
+    Args:
+        kind: 'query', 'batches' (streamed), 'submit' / 'fetch' (async_queries.py) or 'write'
+        name: Query name (default: the 'query' context field)
+        query: SQL text, hashed into query_hash (same normalization as the result cache)
+        params: Bind parameters, part of query_hash
+        backend: Backend the query ran on
+        context: Extra fields (default: the current context() fields on this thread)
+    """
+
+    def __init__(self, kind, name=None, query=None, params=None, backend=None, context=None):
+        self.context = current_context() if context is None else dict(context)
+        self.kind = kind
+        self.name = name or self.context.get('query')
+        self.backend = backend
+        self.query_hash = None
+        if query is not None:
+            import query_cache
+            self.query_hash = query_cache.cache_key(query, params)[:16]
+        self.query_id = None
+        self.connection = None
+        self.rows = None
+        self.bytes = None
+        self.untyped_bytes = None
+        self.phases = {}
+        self.started_at = datetime.now().isoformat(timespec='milliseconds')
+        self._started = time.perf_counter()
+        self._finished = False
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block as phase name (repeated phases add up)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - started)
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_acquire(self, info):
+        """Record pool wait / connect / liveness check time from ConnectionPool.last_acquire()"""
+        if not info:
+            return
+        for phase in ('pool_wait', 'connect', 'liveness_check'):
+            if info.get(phase):
+                self.add_phase(phase, info[phase])
+        self.connection = 'opened' if info.get('opened') else 'reused'
+
+    def set_cursor(self, cursor):
+        """Take the warehouse query ID from an executed cursor"""
+        self.query_id = getattr(cursor, 'sfqid', None)
+
+    def set_result(self, result, untyped_bytes=None):
+        """
+        Take rows and in-memory bytes from a DataFrame or Arrow table
+
+        untyped_bytes is what the result would take as an untyped DataFrame
+        (result_types.untyped_bytes), to record what typing saved.
+        """
+        if result is None:
+            return
+        if hasattr(result, 'num_rows'):
+            rows, size = result.num_rows, result.nbytes
+        else:
+            rows, size = len(result), int(result.memory_usage(index=True, deep=True).sum())
+        self.rows = (self.rows or 0) + rows
+        self.bytes = (self.bytes or 0) + size
+        if untyped_bytes is not None:
+            self.untyped_bytes = (self.untyped_bytes or 0) + untyped_bytes
+
+    def to_dict(self, status='ok', error=None):
+        return {
+            'run_id': RUN_ID,
+            'kind': self.kind,
+            'name': self.name,
+            'backend': self.backend,
+            'query_id': self.query_id,
+            'query_hash': self.query_hash,
+            'connection': self.connection,
+            'status': status,
+            'error': None if error is None else f"{type(error).__name__}: {error}"[:500],
+            'attempt': self.context.get('attempt', 1),
+            'started_at': self.started_at,
+            'phases': {phase: round(seconds, 6) for phase, seconds in self.phases.items()},
+            'total_seconds': round(time.perf_counter() - self._started, 6),
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'untyped_bytes': self.untyped_bytes,
+            'context': self.context,
+        }
+
+    def finish(self, status='ok', error=None):
+        """Emit the record to the log and hooks (only the first call counts)"""
+        if self._finished:
+            return None
+        self._finished = True
+        record = self.to_dict(status, error)
+        _emit(record)
+        return record
+
+
+def phase(record, name):
+    """record.phase(name), or a no-op when there is no record"""
+    return nullcontext() if record is None else record.phase(name)
+
+
+def load_records(path=None, runs=None):
+    """
+    Read recorded queries
+
+    Args:
+        path: JSON-lines file (default: the current log path)
+        runs: Only the records of the last N runs
+
+    Returns:
+        List of record dicts, oldest first
+    """
+    path = path or log_path() or LOG_PATH
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue    # partially written line
+    if runs:
+        run_ids = list(dict.fromkeys(record['run_id'] for record in records))[-runs:]
+        records = [record for record in records if record['run_id'] in set(run_ids)]
+    return records
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def phase_summary(records):
+    """Return {phase: {'count', 'total', 'p50', 'p95', 'max'}} over records, slowest first"""
+    by_phase = {}
+    for record in records:
+        for name, seconds in record['phases'].items():
+            by_phase.setdefault(name, []).append(seconds)
+    summary = {
+        name: {'count': len(values), 'total': sum(values), 'p50': statistics.median(values),
+               'p95': _percentile(values, 0.95), 'max': max(values)}
+        for name, values in by_phase.items()
+    }
+    return dict(sorted(summary.items(), key=lambda item: -item[1]['total']))
+
+
+def warehouse_stats(query_ids):
+    """
+    Look up bytes scanned and server-side timings for Snowflake query IDs
+
+    Uses INFORMATION_SCHEMA.QUERY_HISTORY, which covers the last 7 days of the
+    current user's queries.
+
+    Returns:
+        Dict of query ID -> {'bytes_scanned', 'execution_ms', 'compilation_ms', 'queued_ms',
+        'rows_produced'}
+    """
+    from snowflake_connection import execute_query
+
+    query_ids = [query_id for query_id in dict.fromkeys(query_ids) if query_id]
+    if not query_ids:
+        return {}
+    placeholders = ', '.join('?' for _ in query_ids)
+    df = execute_query(
+        "select query_id, bytes_scanned, execution_time, compilation_time, queued_overload_time, rows_produced "
+        f"from table(information_schema.query_history(result_limit => 10000)) where query_id in ({placeholders})",
+        params=query_ids)
+    df.columns = df.columns.str.lower()
+    return {
+        row['query_id']: {'bytes_scanned': row['bytes_scanned'], 'execution_ms': row['execution_time'],
+                          'compilation_ms': row['compilation_time'], 'queued_ms': row['queued_overload_time'],
+                          'rows_produced': row['rows_produced']}
+        for _, row in df.iterrows()
+    }
+
+
+def _format_bytes(size):
+    if size is None:
+        return ''
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def print_summary(records, top=10, warehouse=None):
+    """Print runs, the slowest queries and where the time went by phase"""
+    runs = {}
+    for record in records:
+        run = runs.setdefault(record['run_id'], {'started': record['started_at'], 'records': 0,
+                                                 'seconds': 0.0, 'errors': 0, 'retries': 0})
+        run['records'] += 1
+        run['seconds'] += record['total_seconds']
+        run['errors'] += record['status'] not in ('ok', 'cached')
+        run['retries'] += record.get('attempt', 1) > 1
+
+    print(f"\n{'='*100}")
+    print(f"RUNS ({len(runs)})")
+    print(f"{'='*100}")
+    print(f"{'Run':<24} {'Started':<24} {'Records':>8} {'Seconds':>10} {'Errors':>7} {'Retries':>8}")
+    for run_id, run in runs.items():
+        print(f"{run_id:<24} {run['started']:<24} {run['records']:>8} {run['seconds']:>10.1f} "
+              f"{run['errors']:>7} {run['retries']:>8}")
+
+    queries = sorted((r for r in records if r['kind'] != 'write'), key=lambda r: -r['total_seconds'])[:top]
+    print(f"\n{'='*100}")
+    print(f"SLOWEST QUERIES (top {top})")
+    print(f"{'='*100}")
+    print(f"{'Name':<26} {'Seconds':>9} {'Execute':>9} {'Fetch':>8} {'Rows':>9} {'Bytes':>10} "
+          f"{'Status':<8} {'Query ID'}")
+    for record in queries:
+        phases = record['phases']
+        name = record['name'] or record['context'].get('template') or record['query_hash'] or ''
+        print(f"{name[:26]:<26} {record['total_seconds']:>9.2f} {phases.get('execute', 0):>9.2f} "
+              f"{phases.get('fetch', 0):>8.2f} {record['rows'] if record['rows'] is not None else '':>9} "
+              f"{_format_bytes(record['bytes']):>10} {record['status']:<8} {record['query_id'] or ''}")
+        stats = (warehouse or {}).get(record['query_id'])
+        if stats:
+            print(f"{'':<26} warehouse: {_format_bytes(stats['bytes_scanned'])} scanned, "
+                  f"{stats['compilation_ms']} ms compile, {stats['queued_ms']} ms queued, "
+                  f"{stats['execution_ms']} ms executing")
+
+    summary = phase_summary(records)
+    total = sum(info['total'] for info in summary.values()) or 1
+    print(f"\n{'='*100}")
+    print("TIME BY PHASE")
+    print(f"{'='*100}")
+    print(f"{'Phase':<16} {'Count':>7} {'Total s':>10} {'Share':>7} {'p50 s':>9} {'p95 s':>9} {'Max s':>9}")
+    for name, info in summary.items():
+        print(f"{name:<16} {info['count']:>7} {info['total']:>10.2f} {info['total'] / total:>7.1%} "
+              f"{info['p50']:>9.3f} {info['p95']:>9.3f} {info['max']:>9.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Summarize recorded query timings')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    summary_parser = subparsers.add_parser('summary', help='Slowest queries and phases over past runs')
+    summary_parser.add_argument('--runs', type=int, help='Only the last N runs (default: all)')
+    summary_parser.add_argument('--top', type=int, default=10, help='Slowest queries to list')
+    summary_parser.add_argument('--name', help='Only records with this query name')
+    summary_parser.add_argument('--warehouse', action='store_true',
+                                help='Look up bytes scanned and queue time for the listed Snowflake query IDs')
+
+    tail_parser = subparsers.add_parser('tail', help='Print the most recent records')
+    tail_parser.add_argument('-n', type=int, default=10)
+    parser.add_argument('--log', help=f'Log file (default: {LOG_PATH})')
+    args = parser.parse_args(argv)
+
+    records = load_records(args.log, runs=getattr(args, 'runs', None))
+    if not records:
+        print(f"No query records in {args.log or log_path() or LOG_PATH}")
+        return 1
+
+    if args.command == 'tail':
+        for record in records[-args.n:]:
+            print(json.dumps(record, sort_keys=True))
+        return 0
+
+    if args.name:
+        records = [record for record in records if record['name'] == args.name]
+    warehouse = None
+    if args.warehouse:
+        slowest = sorted(records, key=lambda r: -r['total_seconds'])[:args.top]
+        warehouse = warehouse_stats(record['query_id'] for record in slowest if record['backend'] != 'local')
+    print_summary(records, top=args.top, warehouse=warehouse)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Freshness-aware refresh of the stored chart metrics
+
+The runners always recompute every chart, even when venue_adds_and_churns and
+sched_schedules haven't changed since the last run. The scheduler asks one cheap
+question first - the upstream watermarks - and only recomputes what they say is stale:
+
+    watermark   per source table: last_altered and row_count (information_schema, no
+                table scan) and, for the fact tables, the max date. On the local backend
+                they come from the extract files.
+    state       refresh_state.json in the metric store records the watermarks each metric
+                was built from and its window.
+    plan        a metric whose upstream tables are unchanged is skipped. A changed
+                dimension table (partner_details, salesforce_venues, ineligible_classes)
+                recomputes the metric's whole window. A changed fact table recomputes from
+                REFRESH_OVERLAP_DAYS before its previous max date (from the start of that
+                month for monthly metrics), and not at all if that is past the metric's
+                window. Metrics the scheduler hasn't built yet are recomputed whole.
+    run         stale metrics run concurrently (execute_queries_parallel). R7 metrics read
+                6 extra days before a partial window so every kept day has its full window,
+                as sharded_query.py does. Results are checked for anomalies
+                (anomaly_checks.py) and upserted into the metric store, and a metric's state
+                is only updated once its result is stored.
+
+With nothing upstream changed, a refresh is one metadata query.
+
+Usage:
+    python refresh_scheduler.py plan                         # what a refresh would recompute
+    python refresh_scheduler.py run
+    python refresh_scheduler.py run --metrics soft_churn_r7 --full
+    python refresh_scheduler.py run --backend local --workers 6
+    python refresh_scheduler.py status
+"""
+import sys
+import os
+import re
+import json
+import argparse
+from datetime import datetime, timedelta
+
+from snowflake_connection import BACKENDS
+from sql_templates import to_date
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+SQL_DIR = os.path.join(PROJECT_ROOT, 'sql')
+
+STATE_NAME = 'refresh_state.json'
+STATE_VERSION = 1
+
+# The runners' chart queries (sql_templates.PRESETS names)
+DEFAULT_METRICS = ['spot_allocation_monthly', 'disabled_schedules_monthly', 'soft_churn_monthly',
+                   'spot_allocation_r7', 'disabled_schedules_r7', 'soft_churn_r7']
+
+# Days before a fact table's previous max date that are recomputed when it changes:
+# late-arriving rows and restatements of the last few days land there
+REFRESH_OVERLAP_DAYS = 3
+
+DEFAULT_MAX_WORKERS = 4
+
+_TABLE_REFERENCE = re.compile(r'cp_bi_derived\.datapipeline\.(\w+)', re.IGNORECASE)
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def upstream_tables(template):
+    """Source tables a sql/ template reads, in order of first reference"""
+    with open(os.path.join(SQL_DIR, template), 'r') as f:
+        return list(dict.fromkeys(name.lower() for name in _TABLE_REFERENCE.findall(f.read())))
+
+
+def watermark_query(tables):
+    """
+    Return (sql, params) for the Snowflake watermarks of tables
+
+    last_altered and row_count come from information_schema.tables, which is metadata
+    only; max(date column) of the fact tables is answered from micro-partition metadata.
+    """
+    from local_backend import SCHEMA_PREFIX, SOURCE_TABLES
+    max_dates = [f"select '{table}' as table_name, max({SOURCE_TABLES[table]['date_column']})::date as max_date "
+                 f"from {SCHEMA_PREFIX}{table}"
+                 for table in tables if SOURCE_TABLES.get(table, {}).get('date_column')]
+    if not max_dates:
+        max_dates = ["select null as table_name, null::date as max_date"]
+    sql = ("select lower(t.table_name) as table_name, t.last_altered, t.row_count, d.max_date\n"
+           "from cp_bi_derived.information_schema.tables t\n"
+           "left join (\n    " + "\n    union all\n    ".join(max_dates) + "\n) d on d.table_name = lower(t.table_name)\n"
+           "where t.table_schema = 'DATAPIPELINE'\n"
+           f"and lower(t.table_name) in ({', '.join('?' for _ in tables)})")
+    return sql, list(tables)
+
+
+def _local_watermarks(tables, local_dir=None):
+    """Watermarks of the local extract: file modification time, manifest rows and max date"""
+    import local_backend
+    manifest = local_backend.load_extract_manifest(local_dir)
+    if manifest is None:
+        raise FileNotFoundError("No local extract; run 'python local_backend.py extract' or 'synthetic' first")
+    local_dir = local_dir or local_backend.LOCAL_DIR
+    conn = local_backend.connect(local_dir)
+    try:
+        watermarks = {}
+        for table in tables:
+            info = manifest['tables'].get(table)
+            if info is None:
+                continue
+            path = os.path.join(local_dir, info['path'])
+            watermark = {
+                'last_altered': datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec='seconds'),
+                'row_count': info['rows'],
+                'max_date': None,
+            }
+            date_column = local_backend.SOURCE_TABLES.get(table, {}).get('date_column')
+            if date_column:
+                cursor = conn.cursor()
+                cursor.execute(f"select max({date_column})::date from {table}")
+                max_date = cursor.fetchone()[0]
+                cursor.close()
+                watermark['max_date'] = max_date.isoformat() if max_date else None
+            watermarks[table] = watermark
+        return watermarks
+    finally:
+        conn.close()
+
+
+def fetch_watermarks(tables, backend='snowflake'):
+    """
+    Current watermarks of the source tables
+
+    Args:
+        tables: Source table names (lower case)
+        backend: 'snowflake' (one information_schema query) or 'local' (the extract)
+
+    Returns:
+        Dict of table -> {'last_altered', 'row_count', 'max_date'} as JSON-friendly values;
+        tables that don't exist are left out
+    """
+    tables = list(dict.fromkeys(tables))
+    if backend == 'local':
+        return _local_watermarks(tables)
+
+    from snowflake_connection import execute_query
+    sql, params = watermark_query(tables)
+    df = execute_query(sql, params=params)
+    df.columns = df.columns.str.lower()
+    watermarks = {}
+    for row in df.itertuples(index=False):
+        max_date = to_date(row.max_date) if row.max_date is not None and row.max_date == row.max_date else None
+        watermarks[row.table_name] = {
+            'last_altered': str(row.last_altered),
+            'row_count': None if row.row_count != row.row_count else int(row.row_count),
+            'max_date': max_date.isoformat() if max_date else None,
+        }
+    return watermarks
+
+
+def load_state(store_dir=None):
+    """Return the refresh state of a metric store (empty if the scheduler never ran on it)"""
+    import metric_store
+    path = os.path.join(store_dir or metric_store.STORE_DIR, STATE_NAME)
+    if not os.path.exists(path):
+        return {'version': STATE_VERSION, 'metrics': {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_state(state, store_dir=None):
+    """Write the refresh state atomically"""
+    import metric_store
+    store_dir = store_dir or metric_store.STORE_DIR
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, STATE_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def plan_metric(metric, watermarks, state, stored=True, full=False, overlap_days=REFRESH_OVERLAP_DAYS):
+    """
+    Decide whether and from when a metric needs recomputing
+
+    Args:
+        metric: Name in sql_templates.PRESETS
+        watermarks: Current watermarks (fetch_watermarks)
+        state: Refresh state (load_state)
+        stored: Whether the metric is in the store at all
+        full: Recompute the whole window regardless of the watermarks
+        overlap_days: See REFRESH_OVERLAP_DAYS
+
+    Returns:
+        Dict with metric, action ('refresh' or 'skip'), reason, start_date and end_date
+        (the days to recompute, end exclusive) and the metric's upstream watermarks
+    """
+    from local_backend import SOURCE_TABLES
+    from sql_templates import PRESETS
+
+    preset = PRESETS[metric]
+    window_start, window_end = to_date(preset['start_date']), to_date(preset['end_date'])
+    tables = upstream_tables(preset['template'])
+    current = {table: watermarks.get(table) for table in tables}
+    plan = {'metric': metric, 'action': 'refresh', 'start_date': window_start, 'end_date': window_end,
+            'watermarks': current}
+
+    previous = state['metrics'].get(metric)
+    if full:
+        return dict(plan, reason='full refresh requested')
+    if previous is None or not stored:
+        return dict(plan, reason='not built by the scheduler yet' if stored else 'not in the store')
+    if (previous['start_date'], previous['end_date']) != (window_start.isoformat(), window_end.isoformat()):
+        return dict(plan, reason='window changed')
+
+    changed = [table for table in tables if current[table] != previous['watermarks'].get(table)]
+    if not changed:
+        return dict(plan, action='skip', reason='upstream unchanged', start_date=None, end_date=None)
+
+    dimensions = [table for table in changed if not SOURCE_TABLES.get(table, {}).get('date_column')]
+    if dimensions:
+        return dict(plan, reason=f"{', '.join(dimensions)} changed")
+
+    # Only fact tables changed: recompute from shortly before their previous max date
+    starts = []
+    for table in changed:
+        previous_max = to_date((previous['watermarks'].get(table) or {}).get('max_date'))
+        if previous_max is None:
+            return dict(plan, reason=f'{table} changed (no previous max date)')
+        starts.append(previous_max - timedelta(days=overlap_days))
+    start = max(min(starts), window_start)
+    if 'monthly' in preset['template']:
+        start = max(_month_start(start), window_start)
+    reason = f"{', '.join(changed)} changed"
+    if start >= window_end:
+        # New days are past the window: nothing stored can change, so the stored result
+        # counts as built from the new watermarks
+        return dict(plan, action='skip', reason=f'{reason} after the window', start_date=None, end_date=None,
+                    advance=True)
+    return dict(plan, reason=reason, start_date=start)
+
+
+def plan(metrics=None, backend='snowflake', store_dir=None, full=False, overlap_days=REFRESH_OVERLAP_DAYS,
+         watermarks=None):
+    """
+    Plan a refresh of metrics against the current upstream watermarks
+
+    Returns:
+        (list of plan_metric() dicts in metric order, watermarks)
+    """
+    import metric_store
+    from sql_templates import PRESETS
+
+    metrics = metrics or DEFAULT_METRICS
+    if watermarks is None:
+        tables = [table for metric in metrics for table in upstream_tables(PRESETS[metric]['template'])]
+        watermarks = fetch_watermarks(tables, backend=backend)
+    state = load_state(store_dir)
+    stored = metric_store.metrics(store_dir)
+    plans = [plan_metric(metric, watermarks, state, stored=metric in stored, full=full, overlap_days=overlap_days)
+             for metric in metrics]
+    return plans, watermarks
+
+
+def run_plans(plans, store_dir=None, max_workers=DEFAULT_MAX_WORKERS, timeout_seconds=3600):
+    """
+    Recompute the stale metrics concurrently, store them and record their watermarks
+
+    Returns:
+        Tuple (refreshed, errors): dict of metric -> rows stored and dict of metric -> error
+    """
+    import anomaly_checks
+    import metric_store
+    import query_metrics
+    from sharded_query import ROLLING_WINDOW_DAYS, lookback_rows, trim
+    from snowflake_connection import execute_queries_parallel
+    from sql_templates import PRESETS, render
+
+    jobs = {p['metric']: p for p in plans if p['action'] == 'refresh'}
+    # Metric -> days read before its first recomputed day (R7 windows only)
+    lookbacks = {metric: (ROLLING_WINDOW_DAYS.get(PRESETS[metric]['template']) or 1) - 1 for metric in jobs}
+
+    state = load_state(store_dir)
+    refreshed, errors = {}, {}
+    while jobs:
+        queries, params, query_starts = {}, {}, {}
+        for metric, job in jobs.items():
+            preset = PRESETS[metric]
+            window_start = to_date(preset['start_date'])
+            # Like the sharded runner, nothing is read before the window itself
+            query_starts[metric] = max(job['start_date'] - timedelta(days=lookbacks[metric]), window_start)
+            queries[metric], params[metric] = render(preset['template'], segments=preset['segments'],
+                                                     start_date=query_starts[metric], end_date=job['end_date'])
+
+        print(f"⏳ Recomputing {len(queries)} metric(s), {min(max_workers, len(queries))} at a time")
+        with query_metrics.context(scheduler='refresh'):
+            frames, failed = execute_queries_parallel(queries, max_workers=min(max_workers, len(queries)),
+                                                      timeout_seconds=timeout_seconds, params=params)
+        errors.update(failed)
+
+        retry = {}
+        for metric, df in frames.items():
+            job, lookback = jobs[metric], lookbacks[metric]
+            window_days = lookback + 1
+            if lookback and query_starts[metric] > to_date(PRESETS[metric]['start_date']) \
+                    and lookback_rows(df, job['start_date']) < window_days - 1:
+                # Gaps in the data: the R7 values of the first kept days would be short
+                lookbacks[metric] = lookback * 2
+                retry[metric] = job
+                print(f"↩️  [{metric}] lookback had {lookback_rows(df, job['start_date'])} day(s); "
+                      f"re-running with {lookbacks[metric]} days")
+                continue
+            if lookback:
+                df = trim(df, job['start_date'])
+            df.columns = df.columns.str.lower()
+            monitor = anomaly_checks.AnomalyMonitor(metric, store_dir=store_dir)
+            monitor.update(df)
+            anomaly_checks.report(monitor)
+            if len(df):
+                metric_store.write(metric, df, source=f'refresh_scheduler.py ({job["reason"]})',
+                                   store_dir=store_dir)
+            state['metrics'][metric] = {
+                'watermarks': job['watermarks'],
+                'start_date': PRESETS[metric]['start_date'],
+                'end_date': PRESETS[metric]['end_date'],
+                'refreshed_at': datetime.now().isoformat(timespec='seconds'),
+                'refreshed_from': job['start_date'].isoformat(),
+            }
+            save_state(state, store_dir)
+            refreshed[metric] = len(df)
+            print(f"💾 {metric}: {len(df)} rows from {job['start_date']} stored")
+        jobs = retry
+    return refreshed, errors
+
+
+def refresh(metrics=None, backend='snowflake', store_dir=None, full=False, overlap_days=REFRESH_OVERLAP_DAYS,
+            max_workers=DEFAULT_MAX_WORKERS, dry_run=False):
+    """
+    Plan and run a refresh
+
+    Args:
+        metrics: Names in sql_templates.PRESETS (default: DEFAULT_METRICS)
+        backend: 'snowflake' or 'local' (store_dir then defaults to the local store)
+        store_dir: Metric store location
+        full: Recompute every metric's whole window
+        overlap_days: See REFRESH_OVERLAP_DAYS
+        max_workers: Metrics recomputed at once
+        dry_run: Only print the plan
+
+    Returns:
+        Tuple (plans, refreshed, errors)
+    """
+    from snowflake_connection import close_connection, use_backend
+    import local_backend
+
+    use_backend(backend)
+    if backend == 'local' and store_dir is None:
+        store_dir = local_backend.METRICS_DIR
+    try:
+        plans, watermarks = plan(metrics, backend=backend, store_dir=store_dir, full=full,
+                                 overlap_days=overlap_days)
+        print_plan(plans, watermarks)
+        if dry_run:
+            return plans, {}, {}
+        advanced = [p for p in plans if p.get('advance')]
+        if advanced:
+            state = load_state(store_dir)
+            for p in advanced:
+                state['metrics'][p['metric']]['watermarks'] = p['watermarks']
+            save_state(state, store_dir)
+        if not any(p['action'] == 'refresh' for p in plans):
+            print("\n✅ Everything is up to date; nothing to recompute.")
+            return plans, {}, {}
+        refreshed, errors = run_plans(plans, store_dir=store_dir, max_workers=max_workers)
+    finally:
+        close_connection()
+    for metric, error in errors.items():
+        print(f"❌ {metric}: {error}")
+    print(f"\n✅ Refreshed {len(refreshed)} metric(s), skipped "
+          f"{sum(p['action'] == 'skip' for p in plans)}, {len(errors)} failed")
+    return plans, refreshed, errors
+
+
+def print_plan(plans, watermarks):
+    print(f"{'Table':<24} {'Max date':<12} {'Rows':>12}  Last altered")
+    for table, watermark in sorted(watermarks.items()):
+        print(f"{table:<24} {watermark['max_date'] or '-':<12} {watermark['row_count'] or '':>12}  "
+              f"{watermark['last_altered']}")
+    print(f"\n{'Metric':<28} {'Action':<8} {'From':<12} {'To':<12} Reason")
+    for p in plans:
+        print(f"{p['metric']:<28} {p['action']:<8} {str(p['start_date'] or '-'):<12} "
+              f"{str(p['end_date'] or '-'):<12} {p['reason']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recompute only the chart metrics whose upstream tables changed')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('plan', 'Show what a refresh would recompute'),
+                            ('run', 'Recompute the stale metrics concurrently')):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('--metrics', help='Comma-separated named queries (default: the six chart queries)')
+        sub.add_argument('--full', action='store_true', help="Recompute every metric's whole window")
+        sub.add_argument('--overlap-days', type=int, default=REFRESH_OVERLAP_DAYS,
+                         help="Days before a fact table's previous max date to recompute when it changes")
+        sub.add_argument('--backend', choices=BACKENDS, default='snowflake')
+        if name == 'run':
+            sub.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS, help='Metrics recomputed at once')
+    status_parser = subparsers.add_parser('status', help='Watermarks and last refresh of each metric')
+    status_parser.add_argument('--backend', choices=BACKENDS, default='snowflake')
+    args = parser.parse_args(argv)
+
+    if args.command == 'status':
+        import local_backend
+        state = load_state(local_backend.METRICS_DIR if args.backend == 'local' else None)
+        if not state['metrics']:
+            print("The scheduler hasn't refreshed any metric yet")
+            return 1
+        print(f"{'Metric':<28} {'Refreshed at':<20} {'From':<12} Upstream max dates")
+        for metric, entry in sorted(state['metrics'].items()):
+            dates = ', '.join(f"{table} {w['max_date']}" for table, w in entry['watermarks'].items()
+                              if w and w.get('max_date'))
+            print(f"{metric:<28} {entry['refreshed_at']:<20} {entry['refreshed_from']:<12} {dates}")
+        return 0
+
+    metrics = args.metrics.split(',') if args.metrics else None
+    _, _, errors = refresh(metrics, backend=args.backend, full=args.full, overlap_days=args.overlap_days,
+                           max_workers=getattr(args, 'workers', DEFAULT_MAX_WORKERS),
+                           dry_run=args.command == 'plan')
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Compact, typed DataFrames from query results
+
+pd.DataFrame(rows) leaves Snowflake NUMBER(p, s) values as Decimal objects, DATE values as
+datetime.date objects and VARCHAR values as one Python string per row, so long venue-day
+pulls (venue_id and account_classification on every row) take several times the memory
+they need. typed_frame() builds each column from cursor.description instead:
+
+    NUMBER(p, 0), integers  int32 when every value fits, else int64; with NULLs, float32
+                            when every value is below 2**24 (exact), else float64
+    NUMBER(p, s), s > 0     float32 when every value has at most 6 significant digits at
+                            scale s (so it reads back exactly), else float64
+    FLOAT / DOUBLE          float64 (float32 for DuckDB's 4-byte FLOAT)
+    VARCHAR                 categorical when at most half the values are distinct
+                            (account_classification, venue_type), else str
+    DATE / TIMESTAMP        datetime64
+    BOOLEAN                 bool (left as objects when there are NULLs)
+
+Columns the description doesn't type (stand-in cursors give names only) are typed from
+their values. compact() applies the same rules to a DataFrame that is already built
+(fetch_pandas_batches), and widen() turns the narrow dtypes back into int64 / float64 /
+plain strings where a stable schema matters (metric_store.py).
+
+execute_query records the untyped and typed sizes in the query log and prints the saving
+for results over REPORT_MIN_BYTES.
+
+Usage:
+    python result_types.py soft_churn_r7                       # dtype and memory per column
+    python result_types.py 10_segment_cube_venue_days.sql --backend local --start-date 2024-10-01
+"""
+import sys
+import argparse
+from decimal import Decimal
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# Text columns with at most this share of distinct values become categorical
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# float32 holds every integer below 2**24 and every decimal of up to 6 significant digits
+FLOAT32_MAX_INTEGER = 2**24
+FLOAT32_MAX_DIGITS = 6
+
+# The untyped size is measured on an even sample of this many rows and scaled up
+REPORT_SAMPLE_ROWS = 10_000
+
+# execute_query prints the memory saved for results at least this large (untyped)
+REPORT_MIN_BYTES = 2**20
+
+# Snowflake cursor.description type codes (snowflake.connector.constants.FIELD_TYPES)
+SNOWFLAKE_TYPE_CODES = {
+    0: 'fixed', 1: 'real', 2: 'text', 3: 'date', 4: 'timestamp', 6: 'timestamp', 7: 'timestamp',
+    8: 'timestamp', 13: 'boolean',
+}
+
+DUCKDB_INTEGER_TYPES = ('TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT', 'UTINYINT', 'USMALLINT',
+                        'UINTEGER', 'UBIGINT', 'UHUGEINT')
+
+
+def _duckdb_kind(type_name):
+    """(kind, scale) for a DuckDB type name such as DECIMAL(38,6) or VARCHAR"""
+    if type_name in DUCKDB_INTEGER_TYPES:
+        return 'integer', 0
+    if type_name.startswith('DECIMAL'):
+        scale = int(type_name.rstrip(')').split(',')[1])
+        return ('integer', 0) if scale == 0 else ('decimal', scale)
+    if type_name == 'FLOAT':
+        return 'float32', None
+    if type_name == 'DOUBLE':
+        return 'real', None
+    if type_name == 'VARCHAR':
+        return 'text', None
+    if type_name == 'DATE':
+        return 'date', None
+    if type_name.startswith('TIMESTAMP'):
+        return 'timestamp', None
+    if type_name == 'BOOLEAN':
+        return 'boolean', None
+    return None, None
+
+
+def column_types(description):
+    """
+    Read column names and types from a DB-API cursor.description
+
+    Understands Snowflake's ResultMetadata (integer type codes with precision and scale)
+    and DuckDB's type objects (local_backend.py). Entries with no type, as from
+    fake_connector.py, get kind None and are typed from their values.
+
+    Returns:
+        List of (name, kind, scale), kind one of 'integer', 'decimal', 'real', 'float32',
+        'text', 'date', 'timestamp', 'boolean' or None
+    """
+    types = []
+    for column in description:
+        name = column[0]
+        type_code = column[1] if len(column) > 1 else None
+        kind, scale = None, None
+        if isinstance(type_code, int):
+            kind = SNOWFLAKE_TYPE_CODES.get(type_code)
+            if kind == 'fixed':
+                scale = column[5] if len(column) > 5 and column[5] is not None else 0
+                kind = 'integer' if scale == 0 else 'decimal'
+        elif type_code is not None:
+            kind, scale = _duckdb_kind(str(type_code).upper())
+        types.append((name, kind, scale))
+    return types
+
+
+def _is_null(value):
+    return value is None or value is pd.NA or (isinstance(value, float) and np.isnan(value))
+
+
+def _infer_kind(values):
+    """(kind, scale) from the first non-null value, for columns the description doesn't type"""
+    sample = next((v for v in values if not _is_null(v)), None)
+    if isinstance(sample, bool):
+        return 'boolean', None
+    if isinstance(sample, (int, np.integer)):
+        return 'integer', 0
+    if isinstance(sample, Decimal):
+        exponents = [v.as_tuple().exponent for v in values if isinstance(v, Decimal) and v.is_finite()]
+        scale = max(0, -min(exponents))
+        return ('integer', 0) if scale == 0 else ('decimal', scale)
+    if isinstance(sample, (float, np.floating)):
+        return 'real', None
+    if isinstance(sample, datetime):
+        return 'timestamp', None
+    if isinstance(sample, date):
+        return 'date', None
+    if isinstance(sample, str):
+        return 'text', None
+    return None, None
+
+
+def _compact_integers(numbers):
+    """int32 / int64, or float32 / float64 when there are NULLs"""
+    if numbers.isna().any():
+        finite = numbers.dropna()
+        fits = finite.empty or finite.abs().max() < FLOAT32_MAX_INTEGER
+        return numbers.astype('float32' if fits else 'float64')
+    if numbers.empty:
+        return numbers.astype('int32')
+    info = np.iinfo(np.int32)
+    fits = numbers.min() >= info.min and numbers.max() <= info.max
+    return numbers.astype('int32' if fits else 'int64')
+
+
+def _compact_decimals(numbers, scale):
+    """float32 when every value has at most FLOAT32_MAX_DIGITS significant digits at scale"""
+    numbers = numbers.astype('float64')
+    finite = numbers.dropna().to_numpy()
+    if scale is not None and np.all(np.abs(np.round(finite * 10.0**scale)) < 10**FLOAT32_MAX_DIGITS):
+        return numbers.astype('float32')
+    return numbers
+
+
+def convert(values, kind, scale=None):
+    """
+    Type one column
+
+    Args:
+        values: Column values (sequence of Python objects, or a Series)
+        kind: Kind from column_types() (None to infer it from the values)
+        scale: Digits after the decimal point for 'decimal' columns
+
+    Returns:
+        Series with the compact dtype for the kind
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+    if kind is None:
+        kind, scale = _infer_kind(series)
+
+    if kind == 'integer':
+        return _compact_integers(pd.to_numeric(series, errors='coerce'))
+    if kind == 'decimal':
+        return _compact_decimals(pd.to_numeric(series, errors='coerce'), scale)
+    if kind == 'real':
+        return pd.to_numeric(series, errors='coerce').astype('float64')
+    if kind == 'float32':
+        return pd.to_numeric(series, errors='coerce').astype('float32')
+    if kind in ('date', 'timestamp'):
+        try:
+            return pd.to_datetime(series)
+        except (TypeError, ValueError):
+            # Mixed UTC offsets (TIMESTAMP_TZ): keep the Python objects
+            return series
+    if kind == 'boolean':
+        return series.astype(bool) if series.notna().all() else series
+    if kind == 'text':
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series
+        if len(series) and series.nunique() <= CATEGORY_MAX_UNIQUE_RATIO * len(series):
+            return series.astype('category')
+        return series if series.dtype != object else pd.Series(series.tolist(), index=series.index)
+    return series.infer_objects() if series.dtype == object else series
+
+
+def typed_frame(rows, description):
+    """
+    Build a compact DataFrame from fetched row tuples and cursor.description
+
+    Columns are converted one at a time, so no all-object DataFrame is built.
+
+    Args:
+        rows: List of row tuples (cursor.fetchall() / fetchmany())
+        description: cursor.description of the result
+
+    Returns:
+        DataFrame with the column names as given by the description
+    """
+    types = column_types(description)
+    columns = list(zip(*rows)) if rows else [()] * len(types)
+    return pd.DataFrame({name: convert(list(values), kind, scale)
+                         for (name, kind, scale), values in zip(types, columns)},
+                        columns=[name for name, _, _ in types])
+
+
+def compact(df, description=None):
+    """
+    Narrow the dtypes of an existing DataFrame (e.g. a fetch_pandas_batches batch)
+
+    Args:
+        df: Result DataFrame
+        description: cursor.description of the result; None to type every column from
+            its values
+
+    Returns:
+        New DataFrame with compact dtypes
+    """
+    types = column_types(description) if description else [(name, None, None) for name in df.columns]
+    kinds = {name.lower(): (kind, scale) for name, kind, scale in types}
+    out = {}
+    for name in df.columns:
+        kind, scale = kinds.get(str(name).lower(), (None, None))
+        series = df[name]
+        if kind is None and series.dtype != object:
+            # Already typed by Arrow: only narrow the numbers
+            kind = 'integer' if pd.api.types.is_integer_dtype(series) else None
+        out[name] = convert(series, kind, scale)
+    return pd.DataFrame(out, index=df.index)
+
+
+def widen(df):
+    """
+    Undo the narrow dtypes: int32 -> int64, float32 -> float64, categorical -> its values
+
+    float32 columns are widened through their shortest decimal form, so a value stored
+    as float32 6.35 comes back as float64 6.35 rather than 6.349999904632568.
+    """
+    out = df.copy()
+    for name in out.columns:
+        series = out[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            out[name] = series.astype(series.cat.categories.dtype)
+        elif series.dtype == np.float32:
+            out[name] = pd.to_numeric(series.astype(str), errors='coerce').astype('float64')
+        elif pd.api.types.is_integer_dtype(series) and series.dtype.itemsize < 8:
+            out[name] = series.astype('int64')
+    return out
+
+
+def memory_bytes(df):
+    """In-memory size of a DataFrame's columns, counting the Python objects they hold"""
+    return int(df.memory_usage(index=False, deep=True).sum())
+
+
+def untyped_bytes(rows, columns):
+    """
+    Estimated size of pd.DataFrame(rows, columns=columns), measured on an even sample
+
+    Args:
+        rows: List of row tuples
+        columns: Column names
+
+    Returns:
+        Bytes
+    """
+    if not rows:
+        return 0
+    step = max(1, len(rows) // REPORT_SAMPLE_ROWS)
+    sample = rows[::step]
+    return round(memory_bytes(pd.DataFrame(sample, columns=columns)) * len(rows) / len(sample))
+
+
+def column_report(rows, description):
+    """
+    Per-column dtypes and sizes, untyped vs typed
+
+    Returns:
+        (typed DataFrame, report DataFrame with column, type, untyped_dtype, typed_dtype,
+        untyped_bytes and typed_bytes)
+    """
+    typed = typed_frame(rows, description)
+    untyped = pd.DataFrame(rows, columns=list(typed.columns))
+    report = pd.DataFrame({
+        'column': typed.columns,
+        'type': [kind if kind != 'decimal' else f'decimal({scale})' for _, kind, scale in column_types(description)],
+        'untyped_dtype': [str(dtype) for dtype in untyped.dtypes],
+        'typed_dtype': [str(dtype) for dtype in typed.dtypes],
+        'untyped_bytes': untyped.memory_usage(index=False, deep=True).to_numpy(),
+        'typed_bytes': typed.memory_usage(index=False, deep=True).to_numpy(),
+    })
+    return typed, report
+
+
+def saving(untyped, typed):
+    """'12.3 MB -> 3.1 MB (75% smaller)'"""
+    from query_metrics import _format_bytes
+    share = 1 - typed / untyped if untyped else 0.0
+    return f"{_format_bytes(untyped)} -> {_format_bytes(typed)} ({share:.0%} smaller)"
+
+
+def main(argv=None):
+    from snowflake_connection import BACKENDS, close_connection, get_pool, use_backend
+    from sql_templates import PRESETS, render, render_preset
+
+    parser = argparse.ArgumentParser(description='Show the dtype and memory of each column of a query result, '
+                                                 'untyped vs typed from cursor.description')
+    parser.add_argument('query', help=f"Named query ({', '.join(PRESETS)}) or sql/ template file")
+    parser.add_argument('--start-date', help='First day, YYYY-MM-DD (inclusive)')
+    parser.add_argument('--end-date', help='Last day, YYYY-MM-DD (exclusive)')
+    parser.add_argument('--backend', choices=BACKENDS, default='snowflake')
+    args = parser.parse_args(argv)
+
+    use_backend(args.backend)
+    if args.query in PRESETS:
+        sql, params = render_preset(args.query, start_date=args.start_date, end_date=args.end_date)
+    else:
+        sql, params = render(args.query, start_date=args.start_date, end_date=args.end_date)
+
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        typed, report = column_report(rows, cursor.description)
+        cursor.close()
+    finally:
+        pool.release(conn)
+        close_connection()
+
+    print(f"{'Column':<28} {'Type':<12} {'Untyped':<16} {'Typed':<16} {'Untyped MB':>11} {'Typed MB':>9}")
+    for row in report.itertuples():
+        print(f"{row.column:<28} {row.type or '?':<12} {row.untyped_dtype:<16} {row.typed_dtype:<16} "
+              f"{row.untyped_bytes / 2**20:>11.2f} {row.typed_bytes / 2**20:>9.2f}")
+    print(f"\n{len(typed):,} rows: {saving(int(report['untyped_bytes'].sum()), int(report['typed_bytes'].sum()))}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
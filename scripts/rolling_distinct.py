@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Rolling distinct-count engine for R7 soft churn
+
+The r7_aggregated CTE in 06_soft_churn_r7_rolling_7day.sql runs six correlated subqueries
+per day, each rescanning a 7-day slice of r7_window_calc, which is O(days x rows). This
+engine builds the per-day set of active venues once (as sorted int codes per segment) and
+slides a 7-day window over them, adding the entering day and removing the leaving day.
+Distinct counts and soft churn sums for every segment come out exact in a single pass
+that is O(rows).
+
+Input is the r7_window_calc grain: date, venue_id, account_classification, soft_churn, is_active.
+"""
+import numpy as np
+import pandas as pd
+
+R7_WINDOW_DAYS = 7
+
+# Segment suffix -> row filter on account_classification (matches 06_soft_churn_r7_rolling_7day.sql)
+SEGMENTS = {
+    '': lambda classification: np.ones(len(classification), dtype=bool),
+    '_sa': lambda classification: (classification == 'SA').to_numpy(),
+    '_nonsa': lambda classification: ((classification != 'SA') | classification.isna()).to_numpy(),
+}
+
+# Segment suffix -> chart column prefix
+SEGMENT_NAMES = {
+    '': 'all_fitness',
+    '_sa': 'sa_fitness',
+    '_nonsa': 'nonsa_fitness',
+}
+
+
+def _sorted_unique(values):
+    """Sort-based np.unique; much faster than the hash-based path for large int arrays"""
+    values = np.sort(values)
+    if len(values) == 0:
+        return values
+    keep = np.empty(len(values), dtype=bool)
+    keep[0] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+def rolling_distinct_counts(day_idx, ids, n_days, window_days=R7_WINDOW_DAYS):
+    """
+    Count distinct ids over a trailing calendar window ending on each day
+
+    Args:
+        day_idx: int array, calendar day number (0..n_days-1) of each row
+        ids: int array, dense id codes (0..n_ids-1) of each row; duplicates are fine
+        n_days: Number of calendar days
+        window_days: Window length in days, including the current day
+
+    Returns:
+        int64 array of length n_days with the distinct id count for each window
+    """
+    day_idx = np.asarray(day_idx, dtype=np.int64)
+    ids = np.asarray(ids, dtype=np.int64)
+    result = np.zeros(n_days, dtype=np.int64)
+    if len(ids) == 0:
+        return result
+
+    # Unique (day, id) pairs, sorted by day then id: one sorted id array per day
+    pairs = _sorted_unique(day_idx * (ids.max() + 1) + ids)
+    pair_days = pairs // (ids.max() + 1)
+    pair_ids = pairs % (ids.max() + 1)
+    bounds = np.searchsorted(pair_days, np.arange(n_days + 1))
+
+    counts = np.zeros(ids.max() + 1, dtype=np.int32)
+    distinct = 0
+    for day in range(n_days):
+        entering = pair_ids[bounds[day]:bounds[day + 1]]
+        distinct += int(np.count_nonzero(counts[entering] == 0))
+        counts[entering] += 1
+
+        leaving_day = day - window_days
+        if leaving_day >= 0:
+            leaving = pair_ids[bounds[leaving_day]:bounds[leaving_day + 1]]
+            counts[leaving] -= 1
+            distinct -= int(np.count_nonzero(counts[leaving] == 0))
+
+        result[day] = distinct
+    return result
+
+
+def rolling_sums(day_idx, values, n_days, window_days=R7_WINDOW_DAYS):
+    """
+    Sum values over a trailing calendar window with SQL SUM semantics
+
+    NaN values are ignored; a window whose values are all NaN (or that has no rows) is NaN.
+
+    Returns:
+        float64 array of length n_days
+    """
+    day_idx = np.asarray(day_idx, dtype=np.int64)
+    values = np.asarray(values, dtype=float)
+    not_null = ~np.isnan(values)
+
+    daily_sum = np.bincount(day_idx[not_null], weights=values[not_null], minlength=n_days)
+    daily_count = np.bincount(day_idx[not_null], minlength=n_days)
+
+    def window(daily):
+        cumulative = np.concatenate([[0], np.cumsum(daily)])
+        start = np.maximum(np.arange(n_days) - window_days + 1, 0)
+        return cumulative[1:] - cumulative[start]
+
+    sums = window(daily_sum)
+    sums[window(daily_count) == 0] = np.nan
+    return sums
+
+
+def soft_churn_r7_partials(rows, window_days=R7_WINDOW_DAYS):
+    """
+    Compute R7 soft churn sums and active venue counts for every segment in one pass
+
+    Args:
+        rows: DataFrame at the r7_window_calc grain
+            (date, venue_id, account_classification, soft_churn, is_active)
+        window_days: Window length in days, including the current day
+
+    Returns:
+        DataFrame with one row per date present in rows and columns
+        r7_soft_churns{suffix}, r7_venue_count{suffix} for each segment suffix
+        ('', '_sa', '_nonsa') - the same columns as 07_soft_churn_r7_daily_partials.sql
+    """
+    dates = pd.to_datetime(rows['date']).dt.normalize()
+    if len(rows) == 0:
+        return pd.DataFrame(columns=['date'] + [f'r7_{m}{s}' for s in SEGMENTS
+                                                for m in ('soft_churns', 'venue_count')])
+
+    first_day = dates.min()
+    day_idx = ((dates - first_day) // pd.Timedelta(days=1)).to_numpy(dtype=np.int64)
+    n_days = int(day_idx.max()) + 1
+
+    venue_codes = pd.factorize(rows['venue_id'])[0]
+    soft_churn = pd.to_numeric(rows['soft_churn'], errors='coerce').to_numpy(dtype=float)
+    is_active = rows['is_active'].to_numpy() == 1
+    classification = rows['account_classification']
+
+    # Only days that have rows are output (daily_metrics groups by date)
+    output_days = np.flatnonzero(np.bincount(day_idx, minlength=n_days))
+    result = pd.DataFrame({'date': (first_day + pd.to_timedelta(output_days, unit='D')).date})
+
+    for suffix, segment_filter in SEGMENTS.items():
+        in_segment = segment_filter(classification)
+        # sum(case when <segment> then soft_churn else 0 end)
+        values = np.where(in_segment, soft_churn, 0.0)
+        sums = rolling_sums(day_idx, values, n_days, window_days)
+
+        active = in_segment & is_active
+        venues = rolling_distinct_counts(day_idx[active], venue_codes[active], n_days, window_days)
+
+        result[f'r7_soft_churns{suffix}'] = sums[output_days]
+        result[f'r7_venue_count{suffix}'] = venues[output_days]
+    return result
+
+
+def soft_churn_r7_rates(partials):
+    """
+    Turn R7 partials into chart-ready percentages
+
+    Output columns match 06_soft_churn_r7_rolling_7day.sql:
+    date, all_fitness_r7_pct, sa_fitness_r7_pct, nonsa_fitness_r7_pct
+    """
+    result = pd.DataFrame({'date': partials['date']})
+    for suffix, name in SEGMENT_NAMES.items():
+        churns = partials[f'r7_soft_churns{suffix}'].astype(float)
+        venues = partials[f'r7_venue_count{suffix}'].astype(float).where(lambda v: v != 0)
+        result[f'{name}_r7_pct'] = churns * 1.0 / venues * 100
+    return result
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Soft churn at any grain from stored daily partials
+
+03_soft_churn_monthly.sql and 06_soft_churn_r7_rolling_7day.sql read the same venue-day
+rows and differ only in how days are grouped. The soft churn rate is
+sum(soft_churn) / count(distinct active venue) over the period, and distinct counts
+don't add up across days, so the per-day partials keep the active venues themselves:
+
+    date
+    active_venue_ids     sorted venue IDs active that day (is_active = 1)
+    active_segments      uint8 bitmask per ID, bit i set if the venue-day is in ROLLUP_SEGMENTS[i]
+    soft_churns_{segment}  sum(soft_churn) over the segment's rows
+    venue_days           venue-day rows behind the partial
+
+They are built from 08_soft_churn_venue_days.sql and kept in the metric store
+(soft_churn_daily_partials). Monthly, weekly, daily, trailing-window (R7, R28, any RN)
+and arbitrary-window rates are derived locally by merging the partials: the sums add,
+and the distinct counts come from sort-based unions of the ID arrays, so they are exact.
+A new grain costs no warehouse query. Refreshes only pull days that aren't stored yet.
+
+Segments are evaluated per venue-day with DEFAULT_TENURE_DAYS, as the templates do;
+partials built with another threshold need --rebuild.
+
+Usage:
+    python rollup.py refresh --start-date 2023-01-01
+    python rollup.py show month --start-date 2024-11-01 --end-date 2025-12-01
+    python rollup.py show r28 --segments all_fitness,sa_fitness
+    python rollup.py window --start-date 2025-10-01 --end-date 2025-11-01
+"""
+import sys
+import re
+import argparse
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+from snowflake_connection import BACKENDS, execute_query_batches, close_connection, use_backend
+from sql_templates import CLASSIFICATION_SEGMENTS, DEFAULT_TENURE_DAYS, PRESETS, SEGMENTS, render, to_date
+from sharded_query import lookback_start, preset_window, run_sharded
+from rolling_distinct import rolling_distinct_counts
+import metric_store
+import local_backend
+
+VENUE_DAYS_TEMPLATE = '08_soft_churn_venue_days.sql'
+PARTIALS_METRIC = 'soft_churn_daily_partials'
+
+# Same history start as 06_soft_churn_r7_rolling_7day.sql
+HISTORY_START = date(2023, 1, 1)
+
+# The last stored day may have been loaded before upstream finished writing it
+REFRESH_OVERLAP_DAYS = 1
+
+# Segments kept in the partials, in bitmask order (at most 8)
+ROLLUP_SEGMENTS = list(SEGMENTS)
+
+# Segment name -> venue-day filter, matching the SEGMENTS predicates (NULL is false)
+SEGMENT_FILTERS = {
+    'all_fitness': lambda rows, tenure_days: np.ones(len(rows), dtype=bool),
+    'sa_fitness': lambda rows, tenure_days: (rows['account_classification'] == 'SA').fillna(False).to_numpy(bool),
+    'nonsa_fitness': lambda rows, tenure_days: ((rows['account_classification'] != 'SA')
+                                                | rows['account_classification'].isna()).to_numpy(bool),
+    'long_tenure_gt24mo': lambda rows, tenure_days: (rows['days_tenure'] > tenure_days).fillna(False).to_numpy(bool),
+    'short_tenure_le24mo': lambda rows, tenure_days: (rows['days_tenure'] <= tenure_days).fillna(False).to_numpy(bool),
+}
+
+# Calendar grains -> output date column
+CALENDAR_GRAINS = {'day': 'date', 'week': 'week', 'month': 'month'}
+_ROLLING_GRAIN = re.compile(r'^r(\d+)$')
+
+# Soft churn presets answered from the partials -> grain
+PRESET_GRAINS = {
+    '03_soft_churn_monthly.sql': 'month',
+    '06_soft_churn_r7_rolling_7day.sql': 'r7',
+}
+
+PARTIAL_COLUMNS = (['date', 'active_venue_ids', 'active_segments', 'venue_days']
+                   + [f'soft_churns_{segment}' for segment in ROLLUP_SEGMENTS])
+
+
+def rolling_days(grain):
+    """Window length of a trailing grain ('r7' -> 7), or None for calendar grains"""
+    match = _ROLLING_GRAIN.match(grain)
+    if match and int(match.group(1)) > 0:
+        return int(match.group(1))
+    if grain in CALENDAR_GRAINS:
+        return None
+    raise ValueError(f"Unknown grain {grain!r}; use {', '.join(CALENDAR_GRAINS)} or rN (e.g. r7, r28)")
+
+
+def build_partials(rows, tenure_days=DEFAULT_TENURE_DAYS):
+    """
+    Reduce venue-day rows to one partial per day
+
+    Args:
+        rows: 08_soft_churn_venue_days.sql rows
+            (date, venue_id, account_classification, days_tenure, soft_churn, is_active)
+        tenure_days: Tenure threshold for the tenure segments
+
+    Returns:
+        DataFrame with PARTIAL_COLUMNS, one row per date present in rows
+    """
+    if len(rows) == 0:
+        return pd.DataFrame(columns=PARTIAL_COLUMNS)
+    rows = rows.reset_index(drop=True)
+    dates = pd.to_datetime(rows['date']).dt.normalize()
+    soft_churn = pd.to_numeric(rows['soft_churn'], errors='coerce').fillna(0).to_numpy(float)
+    masks = np.zeros(len(rows), dtype=np.uint8)
+    sums = {}
+    for bit, segment in enumerate(ROLLUP_SEGMENTS):
+        in_segment = SEGMENT_FILTERS[segment](rows, tenure_days)
+        masks |= in_segment.astype(np.uint8) << bit
+        # sum(case when <segment> then soft_churn else 0 end)
+        sums[f'soft_churns_{segment}'] = pd.Series(np.where(in_segment, soft_churn, 0.0)).groupby(dates).sum()
+
+    result = pd.DataFrame(sums)
+    result['venue_days'] = dates.value_counts()
+    result.index.name = 'date'
+
+    # Active venue-days, sorted by (day, venue); duplicate venue-days OR their segment bits
+    active = rows['is_active'].to_numpy() == 1
+    day_number = dates[active].to_numpy('datetime64[D]').astype(np.int64)
+    venue_ids = pd.to_numeric(rows['venue_id'][active]).to_numpy(np.int64)
+    order = np.lexsort((venue_ids, day_number))
+    day_number, venue_ids, active_masks = day_number[order], venue_ids[order], masks[active][order]
+    starts = np.flatnonzero(np.concatenate([[True], (day_number[1:] != day_number[:-1])
+                                            | (venue_ids[1:] != venue_ids[:-1])])) if len(order) else order
+    day_number, venue_ids = day_number[starts], venue_ids[starts]
+    active_masks = np.bitwise_or.reduceat(active_masks, starts) if len(starts) else active_masks
+
+    bounds = np.flatnonzero(np.diff(day_number)) + 1
+    active_days = pd.to_datetime(np.unique(day_number).astype('datetime64[D]'))
+    ids_by_day = pd.Series(np.split(venue_ids, bounds) if len(day_number) else [], index=active_days, dtype=object)
+    masks_by_day = pd.Series(np.split(active_masks, bounds) if len(day_number) else [], index=active_days,
+                             dtype=object)
+    empty_ids, empty_masks = np.array([], dtype=np.int64), np.array([], dtype=np.uint8)
+    result['active_venue_ids'] = [ids_by_day.get(day, empty_ids) for day in result.index]
+    result['active_segments'] = [masks_by_day.get(day, empty_masks) for day in result.index]
+    return result.reset_index()[PARTIAL_COLUMNS]
+
+
+def load_partials(start_date=None, end_date=None, store_dir=None):
+    """Load stored partials for [start_date, end_date), or an empty frame if none are stored"""
+    try:
+        df = metric_store.read(PARTIALS_METRIC, start_date=start_date, end_date=end_date, store_dir=store_dir)
+    except KeyError:
+        return pd.DataFrame(columns=PARTIAL_COLUMNS)
+    return df[PARTIAL_COLUMNS]
+
+
+def fetch_venue_days(start_date, end_date, shard_months=None):
+    """Pull 08_soft_churn_venue_days.sql rows for [start_date, end_date)"""
+    if shard_months:
+        rows = run_sharded(VENUE_DAYS_TEMPLATE, start_date, end_date, shard_months=shard_months)
+    else:
+        query, params = render(VENUE_DAYS_TEMPLATE, start_date=start_date, end_date=end_date)
+        batches = list(execute_query_batches(query, fetch_mode='pandas', params=params))
+        rows = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+    rows.columns = rows.columns.str.lower()
+    return rows
+
+
+def missing_ranges(stored_dates, start_date, end_date):
+    """
+    Date ranges of [start_date, end_date) that need querying
+
+    Days before the first stored day are backfilled; days after the last stored day,
+    plus REFRESH_OVERLAP_DAYS re-pulled stored days, are appended.
+
+    Returns:
+        List of (start, end) date pairs, end exclusive
+    """
+    if len(stored_dates) == 0:
+        return [(start_date, end_date)] if start_date < end_date else []
+    first, last = min(stored_dates), max(stored_dates)
+    ranges = []
+    if start_date < first:
+        ranges.append((start_date, min(first, end_date)))
+    append_from = max(last - timedelta(days=REFRESH_OVERLAP_DAYS - 1), start_date)
+    if append_from < end_date:
+        ranges.append((append_from, end_date))
+    return ranges
+
+
+def refresh(start_date=None, end_date=None, rebuild=False, store_dir=None, shard_months=None):
+    """
+    Make sure the partials cover [start_date, end_date), querying only what is missing
+
+    Args:
+        start_date: First day needed (default: HISTORY_START)
+        end_date: First day NOT needed (default: today, since today's data is incomplete)
+        rebuild: Re-pull the whole window even if it is stored
+        store_dir: Metric store location (default: data/metrics)
+        shard_months: Query in parallel month shards of this size (see sharded_query.py)
+
+    Returns:
+        Number of days written
+    """
+    start_date = to_date(start_date) or HISTORY_START
+    end_date = to_date(end_date) or date.today()
+    stored = [] if rebuild else pd.to_datetime(load_partials(store_dir=store_dir)['date']).dt.date.tolist()
+    ranges = missing_ranges(stored, start_date, end_date)
+    if not ranges:
+        print(f"✓ Daily partials already cover {start_date} to {end_date - timedelta(days=1)}")
+        return 0
+
+    written = 0
+    for range_start, range_end in ranges:
+        print(f"⏳ Querying venue-days for {range_start} to {range_end - timedelta(days=1)} "
+              f"({(range_end - range_start).days} days)...")
+        partials = build_partials(fetch_venue_days(range_start, range_end, shard_months=shard_months))
+        if len(partials):
+            metric_store.write(PARTIALS_METRIC, partials, source=f'rollup.py (tenure_days={DEFAULT_TENURE_DAYS})',
+                               store_dir=store_dir)
+        written += len(partials)
+    print(f"💾 Stored {written} day(s) of partials in {PARTIALS_METRIC}")
+    return written
+
+
+def _explode(partials):
+    """Flatten the ID arrays: (partial row per ID, dense venue code per ID, segment bits per ID)"""
+    lengths = partials['active_venue_ids'].map(len).to_numpy()
+    if lengths.sum() == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.uint8)
+    ids = np.concatenate(partials['active_venue_ids'].tolist()).astype(np.int64)
+    masks = np.concatenate(partials['active_segments'].tolist()).astype(np.uint8)
+    codes = np.unique(ids, return_inverse=True)[1]
+    return np.repeat(np.arange(len(partials)), lengths), codes, masks
+
+
+def _check_segments(segments):
+    unknown = [segment for segment in segments if segment not in ROLLUP_SEGMENTS]
+    if unknown:
+        raise ValueError(f"Segments {unknown} are not in the partials; available: {ROLLUP_SEGMENTS}")
+
+
+def _rate(churns, venues):
+    """sum(soft_churn) * 1.0 / nullif(count(distinct venue), 0) * 100"""
+    venues = np.asarray(venues, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(venues != 0, np.asarray(churns, dtype=float) / venues * 100, np.nan)
+
+
+def rollup(partials, grain, segments=None, start_date=None, end_date=None, include_counts=False):
+    """
+    Soft churn rates at a calendar or trailing grain
+
+    Args:
+        partials: Daily partials (load_partials / build_partials)
+        grain: 'day', 'week' (Monday start), 'month', or 'rN' for a trailing N-day window
+            ending on each day (r7 matches 06_soft_churn_r7_rolling_7day.sql)
+        segments: Segment names (default: CLASSIFICATION_SEGMENTS)
+        start_date / end_date: Periods to output, [start, end). Trailing windows use
+            earlier stored days as lookback; calendar periods use only days inside the window.
+        include_counts: Also return the {segment}_soft_churns and {segment}_venue_count columns
+
+    Returns:
+        DataFrame with the grain's date column and {segment}_pct (calendar grains, as
+        03_soft_churn_monthly.sql) or {segment}_rN_pct (trailing grains, as 06)
+    """
+    segments = segments or CLASSIFICATION_SEGMENTS
+    _check_segments(segments)
+    window_days = rolling_days(grain)
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    partials = partials.sort_values('date').reset_index(drop=True)
+    dates = pd.to_datetime(partials['date'])
+    if window_days is None:
+        keep = np.ones(len(partials), dtype=bool)
+        if start_date:
+            keep &= (dates >= pd.Timestamp(start_date)).to_numpy()
+        if end_date:
+            keep &= (dates < pd.Timestamp(end_date)).to_numpy()
+        partials, dates = partials[keep].reset_index(drop=True), dates[keep].reset_index(drop=True)
+    elif end_date:
+        partials, dates = partials[dates < pd.Timestamp(end_date)], dates[dates < pd.Timestamp(end_date)]
+
+    if window_days is None:
+        date_column = CALENDAR_GRAINS[grain]
+        if grain == 'month':
+            periods = dates.dt.to_period('M').dt.start_time
+        elif grain == 'week':
+            periods = dates - pd.to_timedelta(dates.dt.weekday, unit='D')
+        else:
+            periods = dates
+        period_index, labels = pd.factorize(periods, sort=True)
+        result = pd.DataFrame({date_column: labels})
+        id_rows, codes, masks = _explode(partials)
+        id_periods = period_index[id_rows]
+        n_codes = int(codes.max()) + 1 if len(codes) else 1
+        for bit, segment in enumerate(ROLLUP_SEGMENTS):
+            if segment not in segments:
+                continue
+            selected = (masks >> bit) & 1 == 1
+            # count(distinct venue) per period: unique (period, venue) pairs
+            pairs = np.unique(id_periods[selected] * n_codes + codes[selected])
+            venues = np.bincount(pairs // n_codes, minlength=len(labels))
+            churns = partials[f'soft_churns_{segment}'].astype(float).groupby(period_index).sum().to_numpy()
+            result[f'{segment}_pct'] = _rate(churns, venues)
+            if include_counts:
+                result[f'{segment}_soft_churns'] = churns
+                result[f'{segment}_venue_count'] = venues
+        return result
+
+    # Trailing windows over calendar days, output for the days that have partials
+    if len(partials) == 0:
+        return pd.DataFrame(columns=['date'] + [f'{segment}_{grain}_pct' for segment in segments])
+    day_numbers = dates.to_numpy('datetime64[D]').astype(np.int64)
+    first_day = day_numbers.min()
+    n_days = int(day_numbers.max() - first_day) + 1
+    day_idx = day_numbers - first_day
+    id_rows, codes, masks = _explode(partials)
+    id_idx = day_idx[id_rows]
+    cumulative_start = np.maximum(np.arange(n_days) - window_days + 1, 0)
+    result = pd.DataFrame({'date': dates.to_numpy()})
+    for bit, segment in enumerate(ROLLUP_SEGMENTS):
+        if segment not in segments:
+            continue
+        selected = (masks >> bit) & 1 == 1
+        venues = rolling_distinct_counts(id_idx[selected], codes[selected], n_days, window_days)[day_idx]
+        daily = np.bincount(day_idx, weights=partials[f'soft_churns_{segment}'].astype(float), minlength=n_days)
+        cumulative = np.concatenate([[0.0], np.cumsum(daily)])
+        churns = (cumulative[1:] - cumulative[cumulative_start])[day_idx]
+        result[f'{segment}_{grain}_pct'] = _rate(churns, venues)
+        if include_counts:
+            result[f'{segment}_soft_churns'] = churns
+            result[f'{segment}_venue_count'] = venues
+    if start_date:
+        result = result[result['date'] >= pd.Timestamp(start_date)]
+    return result.reset_index(drop=True)
+
+
+def window_rate(partials, start_date, end_date, segments=None):
+    """
+    Soft churn over one arbitrary window [start_date, end_date)
+
+    Returns:
+        One-row DataFrame: start_date, end_date, and {segment}_pct, {segment}_soft_churns,
+        {segment}_venue_count per segment
+    """
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    dates = pd.to_datetime(partials['date'])
+    inside = partials[(dates >= pd.Timestamp(start_date)) & (dates < pd.Timestamp(end_date))].copy()
+    inside['date'] = pd.Timestamp(start_date)
+    inside = inside.reset_index(drop=True)
+    # Collapse every day onto start_date, so 'day' grain sums and unions the whole window
+    result = rollup(inside, 'day', segments=segments, include_counts=True) if len(inside) else None
+    row = {'start_date': start_date, 'end_date': end_date}
+    for segment in segments or CLASSIFICATION_SEGMENTS:
+        for suffix in ('pct', 'soft_churns', 'venue_count'):
+            column = f'{segment}_{suffix}'
+            row[column] = result[column].iloc[0] if result is not None else np.nan
+    return pd.DataFrame([row])
+
+
+def run_preset(name, start_date=None, end_date=None, store_dir=None, shard_months=None):
+    """
+    Answer a soft churn preset (03 monthly or 06 R7) from the partials, refreshing them first
+
+    The partials are read from sharded_query.lookback_start(), so an R7 result matches
+    06 on every day, including the first days of the preset's window.
+
+    Returns:
+        DataFrame with the same columns as the preset's query
+    """
+    preset = PRESETS[name]
+    grain = PRESET_GRAINS[preset['template']]
+    # A monthly preset answers whole months only, like its query
+    start_date, end_date = preset_window(name, start_date, end_date)
+    start = to_date(start_date or preset['start_date'])
+    end = to_date(end_date or preset['end_date'])
+    # Like the query (and the sharded and plain runners), nothing before the preset's own
+    # start is read, so its first R7 days have the same short windows as 06
+    origin = lookback_start(name, start)
+    refresh(origin, end, store_dir=store_dir, shard_months=shard_months)
+    partials = load_partials(origin, end, store_dir=store_dir)
+    return rollup(partials, grain, segments=preset['segments'], start_date=start, end_date=end)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Soft churn at any grain from stored daily partials')
+    parser.add_argument('--backend', choices=BACKENDS, default='snowflake',
+                        help='Pull venue-days from the warehouse or the local DuckDB extract '
+                             '(local partials go to the local store)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    refresh_parser = subparsers.add_parser('refresh', help='Query the days not stored yet and store their partials')
+    refresh_parser.add_argument('--start-date', help=f'First day, YYYY-MM-DD (default: {HISTORY_START})')
+    refresh_parser.add_argument('--end-date', help='First day NOT to load, YYYY-MM-DD (default: today)')
+    refresh_parser.add_argument('--rebuild', action='store_true', help='Re-pull the whole window')
+    refresh_parser.add_argument('--shard-months', type=int, help='Query in parallel shards of this many months')
+
+    show_parser = subparsers.add_parser('show', help='Print rates at a grain from the stored partials')
+    show_parser.add_argument('grain', help="day, week, month, or rN for a trailing window (r7, r28, ...)")
+    window_parser = subparsers.add_parser('window', help='Print rates over one window from the stored partials')
+    for sub in (show_parser, window_parser):
+        sub.add_argument('--start-date', required=sub is window_parser, help='First day, YYYY-MM-DD (inclusive)')
+        sub.add_argument('--end-date', required=sub is window_parser, help='Last day, YYYY-MM-DD (exclusive)')
+        sub.add_argument('--segments', help=f"Comma-separated segments (available: {','.join(ROLLUP_SEGMENTS)})")
+    show_parser.add_argument('--output', help='Also write the rates to this CSV file')
+    args = parser.parse_args(argv)
+
+    store_dir = None
+    if args.backend == 'local':
+        use_backend('local')
+        store_dir = local_backend.METRICS_DIR
+
+    try:
+        if args.command == 'refresh':
+            refresh(args.start_date, args.end_date, rebuild=args.rebuild, store_dir=store_dir,
+                    shard_months=args.shard_months)
+            return 0
+
+        segments = args.segments.split(',') if args.segments else None
+        window_days = rolling_days(args.grain) if args.command == 'show' else None
+        lookback_start = args.start_date and to_date(args.start_date) - timedelta(days=(window_days or 1) - 1)
+        partials = load_partials(lookback_start, args.end_date, store_dir=store_dir)
+        if len(partials) == 0:
+            print(f"❌ No stored partials in that window; run `python rollup.py refresh` first")
+            return 1
+        if args.command == 'window':
+            print(window_rate(partials, args.start_date, args.end_date, segments=segments).T.to_string(header=False))
+            return 0
+        rates = rollup(partials, args.grain, segments=segments, start_date=args.start_date, end_date=args.end_date)
+        if args.output:
+            rates.to_csv(args.output, index=False)
+            print(f"💾 Rates saved to: {args.output}")
+        print(rates.to_string(index=False))
+        return 0
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        close_connection()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Checkpointed runner runs: a run manifest, retries with backoff, and resume
+
+A runner used to stop at the first exception, and a rerun executed every query again,
+including the ones that had already succeeded and were sitting in the metric store.
+Every run of a runner now keeps a manifest of its queries:
+
+    data/checkpoints/<run_id>.json
+    {"run_id": "...", "runner": "rolling", "created_at": "...", "updated_at": "...",
+     "key": {"backend": "snowflake", "start_date": null, "end_date": null},
+     "queries": {"soft_churn": {"preset": "soft_churn_r7", "status": "stored", "attempts": 1,
+                                "error": null, "started_at": "...", "finished_at": "...",
+                                "output": {"metric": "soft_churn_r7", "store_dir": "...", "rows": 61,
+                                           "min_date": "2025-10-01", "max_date": "2025-11-30"}}}}
+
+Statuses: pending -> running -> stored, or failed once its retries are used up.
+
+    retry    a transient error (network, login, dropped session; see
+             snowflake_connection.is_transient_error) is retried up to DEFAULT_RETRIES
+             times, waiting DEFAULT_BACKOFF_SECONDS and doubling. The pool discards the
+             failed connection, so the retry runs on a fresh pooled connection. The SSO
+             token is cached (client_store_temporary_credential), so no browser login is
+             needed. SQL errors and statement timeouts fail at once.
+    isolate  a query that still fails is marked failed and the run goes on with the
+             other queries; the runner exits with 1 and says how to resume.
+    resume   rerunning the runner with the same backend and window picks up the latest
+             incomplete run from the last RESUME_MAX_AGE_HOURS. Stored queries are read
+             back from their output location instead of being executed; only the
+             failed and unfinished ones run. --fresh starts a new run.
+
+--async runs keep their own journal (async_queries.py) and aren't checkpointed here.
+
+Usage:
+    python run_checkpoints.py list
+    python run_checkpoints.py status 20251201-093000-1a2b3c
+"""
+import sys
+import os
+import json
+import time
+import uuid
+import argparse
+from datetime import date, datetime, timedelta
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+CHECKPOINT_DIR = os.path.join(PROJECT_ROOT, 'data', 'checkpoints')
+
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_SECONDS = 5
+
+# Older incomplete runs are not resumed: their stored results may be out of date
+RESUME_MAX_AGE_HOURS = 24
+
+
+def _checkpoint_dir(checkpoint_dir):
+    return checkpoint_dir or CHECKPOINT_DIR
+
+
+def _manifest_path(run_id, checkpoint_dir=None):
+    return os.path.join(_checkpoint_dir(checkpoint_dir), f"{run_id}.json")
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def save_run(run, checkpoint_dir=None):
+    """Write the manifest atomically"""
+    run['updated_at'] = _now()
+    path = _manifest_path(run['run_id'], checkpoint_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(run, f, indent=2, sort_keys=True, default=str)
+    os.replace(tmp_path, path)
+
+
+def load_run(run_id, checkpoint_dir=None):
+    """Read a run manifest; raises KeyError if there is none"""
+    path = _manifest_path(run_id, checkpoint_dir)
+    if not os.path.exists(path):
+        raise KeyError(f"No run manifest {run_id!r} in {_checkpoint_dir(checkpoint_dir)}")
+    with open(path) as f:
+        return json.load(f)
+
+
+def list_runs(checkpoint_dir=None):
+    """All run manifests, oldest first"""
+    directory = _checkpoint_dir(checkpoint_dir)
+    if not os.path.isdir(directory):
+        return []
+    return [load_run(name[:-len('.json')], checkpoint_dir)
+            for name in sorted(os.listdir(directory)) if name.endswith('.json')]
+
+
+def is_complete(run):
+    """True once every query of the run is stored"""
+    return all(entry['status'] == 'stored' for entry in run['queries'].values())
+
+
+def find_resumable(runner_name, key, queries, checkpoint_dir=None, max_age_hours=RESUME_MAX_AGE_HOURS):
+    """
+    Latest incomplete run of a runner with the same key and queries, or None
+
+    Args:
+        runner_name: Runner spec name ('rolling', 'tenure')
+        key: What the results depend on (backend and window), as passed to start_run
+        queries: Query name -> preset of this invocation
+        max_age_hours: Ignore runs created longer ago than this
+    """
+    cutoff = datetime.now() - timedelta(hours=max_age_hours)
+    for run in reversed(list_runs(checkpoint_dir)):
+        if datetime.fromisoformat(run['created_at']) < cutoff:
+            break
+        if run['runner'] != runner_name or run['key'] != key or is_complete(run):
+            continue
+        if {name: entry['preset'] for name, entry in run['queries'].items()} == queries:
+            return run
+    return None
+
+
+def start_run(runner_name, key, queries, checkpoint_dir=None):
+    """
+    Create and save the manifest of a new run
+
+    Args:
+        runner_name: Runner spec name
+        key: JSON-serializable dict of what the results depend on (backend, window)
+        queries: Query name -> preset
+
+    Returns:
+        The run manifest (dict)
+    """
+    run = {'run_id': f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}", 'runner': runner_name,
+           'key': key, 'created_at': _now(),
+           'queries': {name: {'preset': preset, 'status': 'pending', 'attempts': 0, 'error': None}
+                       for name, preset in queries.items()}}
+    save_run(run, checkpoint_dir)
+    return run
+
+
+def open_run(runner_name, key, queries, fresh=False, checkpoint_dir=None):
+    """Resume the matching incomplete run (unless fresh) or start a new one"""
+    run = None if fresh else find_resumable(runner_name, key, queries, checkpoint_dir)
+    if run is None:
+        run = start_run(runner_name, key, queries, checkpoint_dir)
+        print(f"📒 Run {run['run_id']}: checkpoints in {_manifest_path(run['run_id'], checkpoint_dir)}")
+        return run
+    stored = [name for name, entry in run['queries'].items() if entry['status'] == 'stored']
+    todo = [name for name in run['queries'] if name not in stored]
+    print(f"♻️ Resuming run {run['run_id']} from {run['created_at']}: {len(stored)} already stored "
+          f"({', '.join(stored) or 'none'}), running {', '.join(todo)}")
+    return run
+
+
+def mark(run, name, status, checkpoint_dir=None, **fields):
+    """Set a query's status (and any other fields) and save the manifest"""
+    entry = run['queries'][name]
+    entry.update(status=status, **fields)
+    if status == 'running':
+        entry.update(started_at=_now(), attempts=entry['attempts'] + 1)
+    elif status in ('stored', 'failed'):
+        entry['finished_at'] = _now()
+    save_run(run, checkpoint_dir)
+
+
+def mark_stored(run, name, df, metric, store_dir=None, checkpoint_dir=None):
+    """Record where a query's result was stored"""
+    import pandas as pd
+    import metric_store
+    df = df.rename(columns=str.lower)
+    dates = pd.to_datetime(df[metric_store._date_column(df)])
+    output = {'metric': metric, 'store_dir': store_dir or metric_store.STORE_DIR, 'rows': len(df),
+              'min_date': dates.min().date().isoformat(), 'max_date': dates.max().date().isoformat()}
+    mark(run, name, 'stored', checkpoint_dir, error=None, output=output)
+
+
+def stored_result(run, name):
+    """Read a stored query's result back from its output location in the metric store"""
+    import metric_store
+    output = run['queries'][name]['output']
+    end_date = date.fromisoformat(output['max_date']) + timedelta(days=1)
+    return metric_store.read(output['metric'], start_date=output['min_date'], end_date=end_date,
+                             store_dir=output['store_dir'])
+
+
+def with_retries(run_once, name, retries=DEFAULT_RETRIES, backoff_seconds=DEFAULT_BACKOFF_SECONDS,
+                 on_attempt=None):
+    """
+    Call run_once(), retrying transient errors with exponential backoff
+
+    Args:
+        run_once: Function running one attempt
+        name: Query name for messages
+        retries: Retries after the first attempt
+        backoff_seconds: Wait before the first retry; doubled for each further retry
+        on_attempt: Called with the attempt number (1-based) before each attempt
+
+    Returns:
+        run_once()'s result
+
+    Raises:
+        The last error, once it isn't transient or the retries are used up
+    """
+    from snowflake_connection import is_transient_error
+    attempt = 0
+    while True:
+        attempt += 1
+        if on_attempt is not None:
+            on_attempt(attempt)
+        try:
+            return run_once()
+        except Exception as e:
+            if attempt > retries or not is_transient_error(e):
+                raise
+            delay = backoff_seconds * 2 ** (attempt - 1)
+            print(f"⚠️ [{name}] {type(e).__name__}: {e}; retrying on a fresh connection in {delay}s "
+                  f"(retry {attempt}/{retries})")
+            time.sleep(delay)
+
+
+def print_status(run):
+    """Print one line per query of a run"""
+    state = 'complete' if is_complete(run) else 'incomplete'
+    print(f"Run {run['run_id']} ({run['runner']}, {state}, created {run['created_at']}, key {run['key']})")
+    for name, entry in run['queries'].items():
+        output = entry.get('output')
+        if entry['status'] == 'stored' and output:
+            detail = f"{output['rows']} rows of {output['metric']}, {output['min_date']} to {output['max_date']}"
+        else:
+            detail = entry.get('error') or ''
+        print(f"  {name:<20} {entry['status']:<8} {entry['attempts']} attempt(s)  {detail}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Inspect the checkpointed runs of the runners')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='List the run manifests')
+    status_parser = subparsers.add_parser('status', help='Print the queries of a run')
+    status_parser.add_argument('run_id')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        runs = list_runs()
+        if not runs:
+            print(f"No runs in {CHECKPOINT_DIR}")
+        for run in runs:
+            counts = {}
+            for entry in run['queries'].values():
+                counts[entry['status']] = counts.get(entry['status'], 0) + 1
+            print(f"  {run['run_id']:<26} {run['runner']:<8} {run['key'].get('backend', ''):<10} "
+                  f"{', '.join(f'{count} {status}' for status, count in counts.items())}")
+        return 0
+
+    try:
+        print_status(load_run(args.run_id))
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
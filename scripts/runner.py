@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Shared driver of the chart query runners
+
+run_all_queries_by_tenure.py and run_rolling_7day_queries.py only differ in their named
+queries and how results are printed; both describe themselves with a runner spec and
+call main() here:
+
+    RUNNER = {
+        'name': 'rolling',
+        'description': ...,                  # --help text
+        'queries': QUERIES,                  # query name -> sql_templates.PRESETS name
+        'banner': [...],                     # lines printed before the run
+        'label': 'Rolling 7-day, Oct-Nov 2025',
+        'display': {...},                    # see display_results()
+        'summary_unit': 'days',
+    }
+
+pandas, the Snowflake connector and the pipeline modules are imported inside the
+functions that use them, so --help answers immediately and the cost is only paid once a
+run actually starts.
+"""
+import time
+import argparse
+from datetime import datetime
+
+from run_checkpoints import DEFAULT_RETRIES
+from snowflake_connection import BACKENDS
+
+
+def load_query(preset, start_date=None, end_date=None):
+    """
+    Render a named query, returning (sql, params) or None if it can't be rendered
+
+    With an overridden start_date, R7 queries also read the days their first windows
+    need (sharded_query.lookback_start); keep_window() drops those rows again. Monthly
+    queries run over whole months (sharded_query.preset_window).
+    """
+    from sharded_query import lookback_start, preset_window
+    from sql_templates import TemplateError, render_preset
+    try:
+        return render_preset(preset, start_date=lookback_start(preset, start_date),
+                             end_date=preset_window(preset, end_date=end_date)[1])
+    except (TemplateError, OSError) as e:
+        print(f"❌ Could not render {preset}: {e}")
+        return None
+
+
+def keep_window(df, preset, start_date=None):
+    """Drop the lookback rows load_query() read before an overridden start_date"""
+    from sharded_query import lookback_start, preset_window, trim
+    keep_from = preset_window(preset, start_date)[0]
+    if df is None or start_date is None or lookback_start(preset, start_date) == keep_from:
+        return df
+    return trim(df, keep_from).reset_index(drop=True)
+
+
+def save_results(metric, df, store_dir=None, monitor=None):
+    """
+    Check a result for anomalies, normalize column names and upsert it into the Parquet metric store
+
+    monitor is an anomaly_checks.AnomalyMonitor that already checked the result's batches
+    as they arrived (sharded runs); without one the whole result is checked as one batch.
+    """
+    import anomaly_checks
+    import metric_store
+    df.columns = df.columns.str.lower()
+    if monitor is None:
+        monitor = anomaly_checks.AnomalyMonitor(metric, store_dir=store_dir)
+        monitor.update(df)
+    anomaly_checks.report(monitor)
+
+    paths = metric_store.write(metric, df, source=metric, store_dir=store_dir)
+    print(f"💾 Results saved to: {metric} ({len(paths)} partition(s) in {store_dir or metric_store.STORE_DIR})")
+
+    return metric
+
+
+def run_query(query_name, preset, use_cache=True, refresh_cache=False, start_date=None, end_date=None,
+              shard_months=None, store_dir=None, label=None):
+    """Run a query (or load its cached result) and return (df, metric)"""
+    from snowflake_connection import execute_query
+    from sql_templates import PRESETS
+    from sharded_query import run_sharded_preset
+    import anomaly_checks
+    import query_metrics
+    print(f"\n{'='*100}")
+    print(f"Running {query_name} query{f' ({label})' if label else ''}...")
+    print(f"{'='*100}")
+
+    rendered = load_query(preset, start_date, end_date)
+    if rendered is None:
+        return None
+    query, params = rendered
+
+    print(f"📖 Query: {preset} ({PRESETS[preset]['template']}) with {params}")
+    print("⏳ Executing query...")
+
+    with query_metrics.context(query=query_name, preset=preset):
+        monitor = None
+        if shard_months:
+            # Shards are checked as they finish, in window order
+            monitor = anomaly_checks.AnomalyMonitor(preset, store_dir=store_dir)
+            df = run_sharded_preset(preset, start_date=start_date, end_date=end_date, shard_months=shard_months,
+                                    use_cache=use_cache, refresh_cache=refresh_cache, monitor=monitor)
+        else:
+            df = keep_window(execute_query(query, fetch_data=True, reuse_connection=True, params=params,
+                                           use_cache=use_cache, refresh_cache=refresh_cache),
+                             preset, start_date)
+
+        if df is None or len(df) == 0:
+            print(f"❌ Query returned no results")
+            return None
+
+        print(f"✅ Retrieved {len(df)} rows")
+
+        metric = save_results(preset, df, store_dir=store_dir, monitor=monitor)
+
+    return df, metric
+
+
+def run_queries_parallel(queries, use_cache=True, refresh_cache=False, start_date=None, end_date=None,
+                         store_dir=None, retries=0, checkpoint=None):
+    """
+    Run all queries concurrently
+
+    Queries that failed with a transient error are run again together, with backoff,
+    up to `retries` times. With a checkpoint (run_checkpoints.py), each query's status
+    and output location are recorded as it finishes.
+
+    Returns:
+        Tuple ({query_name: (df, metric)} in query order, {query_name: error} for the
+        queries that failed)
+    """
+    from snowflake_connection import execute_queries_parallel, is_transient_error
+    import query_metrics
+    import run_checkpoints
+    print(f"\n{'='*100}")
+    print(f"Running {len(queries)} queries in parallel...")
+    print(f"{'='*100}")
+
+    sql = {}
+    params = {}
+    failed = {}
+    for query_name, preset in queries.items():
+        rendered = load_query(preset, start_date, end_date)
+        if rendered is not None:
+            sql[query_name], params[query_name] = rendered
+        else:
+            failed[query_name] = f"could not render {preset}"
+
+    stored = {}
+    pending = dict(sql)
+    attempt = 0
+    while pending:
+        attempt += 1
+        if checkpoint is not None:
+            for query_name in pending:
+                run_checkpoints.mark(checkpoint, query_name, 'running')
+        frames, errors = execute_queries_parallel(pending, params={name: params[name] for name in pending},
+                                                  use_cache=use_cache, refresh_cache=refresh_cache)
+        for query_name in pending:
+            df = keep_window(frames.get(query_name), queries[query_name], start_date)
+            if df is None:
+                continue
+            if len(df) == 0:
+                print(f"❌ {query_name} returned no results")
+                failed[query_name] = 'no results'
+                continue
+            with query_metrics.context(query=query_name, preset=queries[query_name]):
+                stored[query_name] = (df, save_results(queries[query_name], df, store_dir=store_dir))
+            if checkpoint is not None:
+                run_checkpoints.mark_stored(checkpoint, query_name, df, queries[query_name], store_dir=store_dir)
+
+        retry = {name: pending[name] for name, error in errors.items()
+                 if is_transient_error(error) and attempt <= retries}
+        # execute_queries_parallel has already printed each failure
+        for query_name, error in errors.items():
+            if query_name not in retry:
+                failed[query_name] = error
+        if retry:
+            delay = run_checkpoints.DEFAULT_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            print(f"⚠️ Retrying {', '.join(retry)} on fresh connections in {delay}s (retry {attempt}/{retries})")
+            time.sleep(delay)
+        pending = retry
+
+    if checkpoint is not None:
+        for query_name, error in failed.items():
+            run_checkpoints.mark(checkpoint, query_name, 'failed', error=str(error))
+    results = {query_name: stored[query_name] for query_name in queries if query_name in stored}
+    return results, failed
+
+
+def run_queries_async(queries, start_date=None, end_date=None, store_dir=None, run_id=None):
+    """
+    Submit the queries (or pick up run_id) and collect them by query ID
+
+    Returns:
+        Tuple ({query_name: (df, metric)}, {query_name: error} for the queries that
+        couldn't be rendered, failed, expired or returned no rows)
+    """
+    import async_queries
+    import query_metrics
+    print(f"\n{'='*100}")
+    if run_id:
+        run = async_queries.load_run(run_id)
+        failed = {query_name: f"not in run {run_id}" for query_name in queries if query_name not in run['queries']}
+        print(f"Resuming run {run_id} ({len(run['queries'])} queries)...")
+        print(f"{'='*100}")
+    else:
+        print(f"Submitting {len(queries)} queries asynchronously...")
+        print(f"{'='*100}")
+        sql = {}
+        params = {}
+        failed = {}
+        for query_name, preset in queries.items():
+            rendered = load_query(preset, start_date, end_date)
+            if rendered is not None:
+                sql[query_name], params[query_name] = rendered
+            else:
+                failed[query_name] = f"could not render {preset}"
+        # The start is journaled so a resumed run drops the same lookback rows
+        run = async_queries.submit(sql, params=params,
+                                   labels={query_name: {'preset': queries[query_name], 'start_date': start_date}
+                                           for query_name in sql})
+        print(f"💡 If this process stops, pick the results up with --resume {run['run_id']}")
+
+    frames, errors = async_queries.collect(run)
+
+    results = {}
+    for query_name, df in frames.items():
+        preset = run['queries'][query_name].get('preset')
+        if preset != queries.get(query_name):
+            print(f"⚠️ Skipping {query_name}: run {run['run_id']} ran {preset}, not a query of this runner")
+            continue
+        df = keep_window(df, preset, run['queries'][query_name].get('start_date'))
+        if len(df) == 0:
+            print(f"❌ {query_name} returned no results")
+            failed[query_name] = 'no results'
+            continue
+        with query_metrics.context(query=query_name, preset=preset):
+            results[query_name] = (df, save_results(preset, df, store_dir=store_dir))
+
+    # collect() has already printed each failure
+    for query_name, error in errors.items():
+        if run['queries'][query_name].get('preset') == queries.get(query_name):
+            failed[query_name] = error
+
+    return results, failed
+
+
+def run_combined_queries(queries, use_cache=True, refresh_cache=False, start_date=None, end_date=None,
+                         store_dir=None):
+    """Run the spot allocation and disabled schedules queries as one scan and return {query_name: (df, metric)}"""
+    import schedule_metrics
+    import query_metrics
+    print(f"\n{'='*100}")
+    print(f"Running the schedule metrics as one combined query...")
+    print(f"{'='*100}")
+
+    frames = schedule_metrics.run_presets(queries, use_cache=use_cache, refresh_cache=refresh_cache,
+                                          start_date=start_date, end_date=end_date)
+
+    results = {}
+    for query_name, df in frames.items():
+        with query_metrics.context(query=query_name, preset=queries[query_name]):
+            results[query_name] = (df, save_results(queries[query_name], df, store_dir=store_dir))
+
+    return results
+
+
+def run_rollup_queries(queries, start_date=None, end_date=None, shard_months=None, store_dir=None):
+    """Derive the soft churn queries from the stored daily partials and return {query_name: (df, metric)}"""
+    from sql_templates import PRESETS
+    import rollup
+    import query_metrics
+    results = {}
+    for query_name, preset in queries.items():
+        if PRESETS[preset]['template'] not in rollup.PRESET_GRAINS:
+            continue
+        print(f"\n{'='*100}")
+        print(f"Deriving {query_name} from the daily partials ({rollup.PARTIALS_METRIC})...")
+        print(f"{'='*100}")
+        with query_metrics.context(query=query_name, preset=preset):
+            df = rollup.run_preset(preset, start_date=start_date, end_date=end_date, store_dir=store_dir,
+                                   shard_months=shard_months)
+            if len(df) == 0:
+                print(f"❌ No partials in the window for {query_name}")
+                continue
+            results[query_name] = (df, save_results(preset, df, store_dir=store_dir))
+
+    return results
+
+
+def format_date(date_val):
+    """Format date to YYYY-MM-DD string"""
+    if isinstance(date_val, datetime):
+        return date_val.strftime('%Y-%m-%d')
+    elif isinstance(date_val, str):
+        try:
+            dt = datetime.strptime(date_val[:10], '%Y-%m-%d')
+            return dt.strftime('%Y-%m-%d')
+        except ValueError:
+            return str(date_val)
+    return str(date_val)
+
+
+def display_results(display, query_name, df):
+    """
+    Print a result as a table
+
+    Args:
+        display: The runner's display spec:
+            title     heading, formatted with {name} (the upper-cased query name)
+            period    (header, substring of the date column name, width)
+            columns   query name -> [(header, result column, width), ...]
+            decimals  digits after the decimal point
+            rule      width of the line under the header
+        query_name: Runner query name (spot_allocation, disabled_schedules, soft_churn)
+        df: Query result
+    """
+    print(f"\n{'='*100}")
+    print(display['title'].format(name=query_name.upper().replace('_', ' ')))
+    print(f"{'='*100}\n")
+
+    columns = display['columns'].get(query_name)
+    if not columns:
+        return
+    period_header, period_match, period_width = display['period']
+    period_col = [col for col in df.columns if period_match in col.lower()][0]
+    decimals = display['decimals']
+
+    print(f"{period_header:<{period_width}} " + ' '.join(f"{header:<{width}}" for header, _, width in columns))
+    print("-" * display['rule'])
+    for _, row in df.iterrows():
+        values = [f"{round(float(row.get(column, 0) or 0), decimals):<{width}.{decimals}f}"
+                  for _, column, width in columns]
+        print(f"{format_date(row[period_col]):<{period_width}} " + ' '.join(values))
+
+
+def build_parser(runner):
+    """Argument parser shared by the runners"""
+    parser = argparse.ArgumentParser(description=runner['description'])
+    parser.add_argument('--parallel', action='store_true',
+                        help='Run all queries at the same time on separate connections')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Bypass the local result cache and always query the warehouse')
+    parser.add_argument('--refresh-cache', action='store_true',
+                        help='Re-run every query and overwrite its cached result')
+    parser.add_argument('--start-date', help='Override the first day, YYYY-MM-DD (inclusive)')
+    parser.add_argument('--end-date', help='Override the last day, YYYY-MM-DD (exclusive)')
+    parser.add_argument('--shard-months', type=int,
+                        help='Split each query into date shards of this many months and run the shards in parallel')
+    parser.add_argument('--combined', action='store_true',
+                        help='Compute spot allocation and disabled schedules from one scan of sched_schedules '
+                             '(09_schedule_metrics_combined.sql); soft churn runs as usual')
+    parser.add_argument('--rollup', action='store_true',
+                        help='Derive soft churn from the stored daily partials (rollup.py), querying only '
+                             'the days not stored yet')
+    parser.add_argument('--async', dest='async_run', action='store_true',
+                        help='Submit the queries without holding a connection, journal their query IDs '
+                             '(data/query_runs/) and collect the results by ID (async_queries.py)')
+    parser.add_argument('--resume', metavar='RUN_ID',
+                        help='Collect the results of an earlier --async run instead of re-executing')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help='Retries of a query that failed with a transient (network, login, session) error, '
+                             f'on a fresh connection with backoff (default: {DEFAULT_RETRIES})')
+    parser.add_argument('--fresh', action='store_true',
+                        help='Start a new run instead of resuming the last incomplete one with the same '
+                             'backend and window (run_checkpoints.py)')
+    parser.add_argument('--backend', choices=BACKENDS, default='snowflake',
+                        help="Where to run the queries: the warehouse, or the local DuckDB extract "
+                             "(results go to a separate store, see local_backend.py)")
+    return parser
+
+
+def run(runner, args):
+    """Run a runner's queries with parsed arguments; returns the exit code"""
+    from snowflake_connection import close_connection, use_backend
+    import local_backend
+
+    def display(query_name, df):
+        display_results(runner['display'], query_name, df)
+
+    print("="*100)
+    for line in runner['banner']:
+        print(line)
+    print("="*100)
+
+    results = {}
+    store_dir = None
+    if args.backend == 'local':
+        use_backend('local')
+        store_dir = local_backend.METRICS_DIR
+        print(f"\n💻 Running on the local extract ({local_backend.LOCAL_DIR})")
+
+    checkpoint = None
+    failed = {}
+    try:
+        import query_metrics
+        import run_checkpoints
+        queries = runner['queries']
+        if not (args.async_run or args.resume):
+            # --async runs are journaled by async_queries.py instead
+            key = {'backend': args.backend, 'start_date': args.start_date, 'end_date': args.end_date}
+            checkpoint = run_checkpoints.open_run(runner['name'], key, queries, fresh=args.fresh)
+            for query_name, entry in checkpoint['queries'].items():
+                if entry['status'] != 'stored':
+                    continue
+                try:
+                    df = run_checkpoints.stored_result(checkpoint, query_name)
+                except KeyError:
+                    # Its output is gone from the store: run it again
+                    continue
+                print(f"\n♻️ {query_name}: {len(df)} rows from run {checkpoint['run_id']} "
+                      f"(stored in {entry['output']['metric']}), not re-executed")
+                results[query_name] = df
+                display(query_name, df)
+            queries = {name: preset for name, preset in queries.items() if name not in results}
+
+        def stored(query_name, df, metric):
+            results[query_name] = df
+            if checkpoint is not None:
+                run_checkpoints.mark_stored(checkpoint, query_name, df, metric, store_dir=store_dir)
+            display(query_name, df)
+
+        with query_metrics.context(**({'run_id': checkpoint['run_id']} if checkpoint else {})):
+            # A failure of the combined or rollup path leaves its queries to the regular path
+            if args.combined and queries:
+                try:
+                    combined_results = run_checkpoints.with_retries(
+                        lambda: run_combined_queries(queries, use_cache=not args.no_cache,
+                                                     refresh_cache=args.refresh_cache,
+                                                     start_date=args.start_date, end_date=args.end_date,
+                                                     store_dir=store_dir),
+                        'schedule metrics', retries=args.retries)
+                except Exception as e:
+                    print(f"❌ Combined schedule metrics failed ({e}); running the queries separately")
+                    combined_results = {}
+                for query_name, (df, metric) in combined_results.items():
+                    stored(query_name, df, metric)
+                queries = {name: preset for name, preset in queries.items() if name not in combined_results}
+
+            if args.rollup and queries:
+                try:
+                    rollup_results = run_checkpoints.with_retries(
+                        lambda: run_rollup_queries(queries, start_date=args.start_date, end_date=args.end_date,
+                                                   shard_months=args.shard_months, store_dir=store_dir),
+                        'rollup', retries=args.retries)
+                except Exception as e:
+                    print(f"❌ Rollup failed ({e}); querying soft churn directly")
+                    rollup_results = {}
+                for query_name, (df, metric) in rollup_results.items():
+                    stored(query_name, df, metric)
+                queries = {name: preset for name, preset in queries.items() if name not in rollup_results}
+
+            if args.async_run or args.resume:
+                async_results, failed = run_queries_async(queries if not args.resume else runner['queries'],
+                                                          start_date=args.start_date, end_date=args.end_date,
+                                                          store_dir=store_dir, run_id=args.resume)
+                for query_name, (df, metric) in async_results.items():
+                    results[query_name] = df
+                    display(query_name, df)
+                queries = {}
+
+            # Sharded runs already run each query's shards in parallel
+            if args.parallel and not args.shard_months and queries:
+                parallel_results, failed = run_queries_parallel(queries, use_cache=not args.no_cache,
+                                                                refresh_cache=args.refresh_cache,
+                                                                start_date=args.start_date, end_date=args.end_date,
+                                                                store_dir=store_dir, retries=args.retries,
+                                                                checkpoint=checkpoint)
+                for query_name, (df, metric) in parallel_results.items():
+                    results[query_name] = df
+                    display(query_name, df)
+            else:
+                for query_name, preset in queries.items():
+                    def attempt(number, query_name=query_name):
+                        if checkpoint is not None:
+                            run_checkpoints.mark(checkpoint, query_name, 'running')
+
+                    try:
+                        # Sharded queries retry their failed shards themselves
+                        result = run_checkpoints.with_retries(
+                            lambda: run_query(query_name, preset, use_cache=not args.no_cache,
+                                              refresh_cache=args.refresh_cache,
+                                              start_date=args.start_date, end_date=args.end_date,
+                                              shard_months=args.shard_months, store_dir=store_dir,
+                                              label=runner['label']),
+                            query_name, retries=0 if args.shard_months else args.retries, on_attempt=attempt)
+                    except Exception as e:
+                        # Keep going: the other queries' results are still worth having
+                        print(f"❌ {query_name} failed: {type(e).__name__}: {e}")
+                        result, failed[query_name] = None, e
+                    if result:
+                        stored(query_name, *result)
+                    else:
+                        failed.setdefault(query_name, 'no results')
+                        if checkpoint is not None:
+                            run_checkpoints.mark(checkpoint, query_name, 'failed', error=str(failed[query_name]))
+
+        print(f"\n{'='*100}")
+        if failed:
+            print(f"⚠️ {len(failed)} of {len(runner['queries'])} queries failed: {', '.join(failed)}")
+        else:
+            print("✅ All queries completed successfully!")
+        print(f"{'='*100}")
+        print("\nSummary:")
+        for query_name in results.keys():
+            print(f"  ✓ {query_name.replace('_', ' ').title()}: {len(results[query_name])} "
+                  f"{runner['summary_unit']} of data")
+        for query_name, error in failed.items():
+            print(f"  ✗ {query_name.replace('_', ' ').title()}: {error}")
+        if failed and checkpoint is not None:
+            print(f"\n💡 Run the same command again to resume run {checkpoint['run_id']}: only the failed "
+                  f"queries are executed (--fresh starts over)")
+
+        return 1 if failed else 0
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        close_connection()
+
+
+def main(runner, argv=None):
+    """Parse a runner's arguments and run it"""
+    return run(runner, build_parser(runner).parse_args(argv))
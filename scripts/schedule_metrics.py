@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Spot allocation and disabled schedules from a single scan of sched_schedules
+
+01/02/04/05 each scan sched_schedules (and rebuild the vids and ineligible class filters)
+for one metric at one grain. 09_schedule_metrics_combined.sql reads the table once and
+returns daily and monthly rows for both metrics and every requested segment; split()
+turns that result into the per-chart outputs, with the same columns as the single-metric
+queries:
+
+    spot_allocation     daily    date, {segment}_daily
+                        r7       date, {segment}_r7          (04_spot_allocation_r7_rolling_7day.sql)
+                        monthly  month_date, {segment}       (01_spot_allocation_monthly.sql)
+    disabled_schedules  daily    date, {segment}_pct
+                        r7       date, {segment}_r7_pct      (05_disabled_schedules_r7_rolling_7day.sql)
+                        monthly  month_date, {segment}_pct   (02_disabled_schedules_monthly.sql)
+
+R7 is the mean of the last 7 daily rows (ROWS BETWEEN 6 PRECEDING AND CURRENT ROW), taken
+over the days each single-metric query would have returned, so the values match. The
+runners use this with --combined.
+
+Usage:
+    python schedule_metrics.py render --start-date 2025-10-01 --end-date 2025-12-01
+    python schedule_metrics.py run --start-date 2025-10-01 --end-date 2025-12-01 --grains r7,monthly
+"""
+import sys
+import argparse
+import pandas as pd
+
+from snowflake_connection import BACKENDS, execute_query, close_connection, use_backend
+from sharded_query import lookback_start, preset_window
+from sql_templates import CLASSIFICATION_SEGMENTS, PRESETS, TemplateError, render, uses_tenure
+import query_metrics
+
+TEMPLATE = '09_schedule_metrics_combined.sql'
+
+METRICS = ('spot_allocation', 'disabled_schedules')
+GRAINS = ('daily', 'r7', 'monthly')
+
+R7_WINDOW_ROWS = 7
+
+# Single-metric template -> the (metric, grain) output of the combined query that replaces it
+TEMPLATE_OUTPUTS = {
+    '01_spot_allocation_monthly.sql': ('spot_allocation', 'monthly'),
+    '02_disabled_schedules_monthly.sql': ('disabled_schedules', 'monthly'),
+    '04_spot_allocation_r7_rolling_7day.sql': ('spot_allocation', 'r7'),
+    '05_disabled_schedules_r7_rolling_7day.sql': ('disabled_schedules', 'r7'),
+}
+
+
+def _numeric(series):
+    """Snowflake NUMBER columns can arrive as Decimal; compute in float64"""
+    return pd.to_numeric(series, errors='coerce').astype('float64')
+
+
+def _pct(disabled, total):
+    """disabled * 1.0 / nullif(total, 0) * 100"""
+    total = _numeric(total)
+    return _numeric(disabled) / total.where(total != 0) * 100
+
+
+def _r7(values):
+    """avg(...) OVER (ORDER BY date ROWS BETWEEN 6 PRECEDING AND CURRENT ROW); NULLs are skipped"""
+    return values.rolling(R7_WINDOW_ROWS, min_periods=1).mean()
+
+
+def split(df, segments, outputs=None):
+    """
+    Split a 09_schedule_metrics_combined.sql result into per-chart frames
+
+    Args:
+        df: Result of the combined query (grain, period and the per-segment columns)
+        segments: Segment names to output; must have been rendered into the query. Monthly
+            spot allocation uses the venue-day grain when any of them is a tenure segment,
+            as 01_spot_allocation_monthly.sql does.
+        outputs: (metric, grain) pairs to build (default: every metric and grain)
+
+    Returns:
+        Dict of (metric, grain) -> DataFrame sorted by its date column
+    """
+    df = df.copy()
+    df.columns = df.columns.str.lower()
+    df['period'] = pd.to_datetime(df['period'])
+    days = df[df['grain'] == 'day'].sort_values('period').reset_index(drop=True)
+    months = df[df['grain'] == 'month'].sort_values('period').reset_index(drop=True)
+    # Days with a bookable venue-day are the rows 04 would return; 05 returns every day
+    spot_days = days[_numeric(days['bookable_venue_days']).fillna(0) > 0].reset_index(drop=True)
+    monthly_spots = 'spots_venue_day_{}' if uses_tenure(segments) else 'spots_{}'
+
+    frames = {}
+    for metric, grain in outputs or [(m, g) for m in METRICS for g in GRAINS]:
+        if metric not in METRICS or grain not in GRAINS:
+            raise ValueError(f"Unknown output ({metric!r}, {grain!r}); metrics {METRICS}, grains {GRAINS}")
+        rows = months if grain == 'monthly' else spot_days if metric == 'spot_allocation' else days
+        out = pd.DataFrame({'month_date' if grain == 'monthly' else 'date': rows['period']})
+        for segment in segments:
+            if metric == 'spot_allocation':
+                if grain == 'monthly':
+                    out[segment] = _numeric(rows[monthly_spots.format(segment)])
+                elif grain == 'r7':
+                    out[f'{segment}_r7'] = _r7(_numeric(rows[f'spots_{segment}']))
+                else:
+                    out[f'{segment}_daily'] = _numeric(rows[f'spots_{segment}'])
+            else:
+                pct = _pct(rows[f'disabled_scheds_{segment}'], rows[f'total_scheds_{segment}'])
+                out[f'{segment}_r7_pct' if grain == 'r7' else f'{segment}_pct'] = _r7(pct) if grain == 'r7' else pct
+        frames[(metric, grain)] = out
+    return frames
+
+
+def run_combined(start_date, end_date, segments=None, tenure_days=None, use_cache=True, refresh_cache=False):
+    """
+    Render and run the combined query once
+
+    Args:
+        start_date / end_date: Schedule start_date window [start, end)
+        segments: Segment names (default: CLASSIFICATION_SEGMENTS)
+        tenure_days: Tenure threshold (default: sql_templates.DEFAULT_TENURE_DAYS)
+        use_cache / refresh_cache: As execute_query
+
+    Returns:
+        The combined result (lower-case columns), for split()
+    """
+    sql, params = render(TEMPLATE, segments=segments or CLASSIFICATION_SEGMENTS, start_date=start_date,
+                         end_date=end_date, tenure_days=tenure_days)
+    df = execute_query(sql, fetch_data=True, reuse_connection=True, params=params,
+                       use_cache=use_cache, refresh_cache=refresh_cache)
+    if df is not None:
+        df.columns = df.columns.str.lower()
+    return df
+
+
+def _union(lists):
+    """Concatenate lists, keeping the first occurrence of each item"""
+    return list(dict.fromkeys(item for items in lists for item in items))
+
+
+def run_presets(queries, use_cache=True, refresh_cache=False, start_date=None, end_date=None):
+    """
+    Answer the spot allocation and disabled schedules presets from one combined query
+
+    Queries whose preset uses another template (soft churn) are left for the caller.
+    The combined query covers the union of the presets' windows and segments, and each
+    output is trimmed back to its preset's window.
+
+    Args:
+        queries: Dict of query name -> named query in sql_templates.PRESETS (a runner's QUERIES)
+        use_cache / refresh_cache: As execute_query
+        start_date / end_date: Override every preset's window
+
+    Returns:
+        Dict of query name -> DataFrame (in the columns of the single-metric query) for the
+        queries that were answered; empty if none apply or the query returned no rows
+    """
+    covered = {name: PRESETS[preset] for name, preset in queries.items()
+               if PRESETS[preset]['template'] in TEMPLATE_OUTPUTS}
+    if not covered:
+        return {}
+
+    segments = _union(preset['segments'] for preset in covered.values())
+    # Each preset's window, with monthly ones widened to whole months
+    windows = {name: preset_window(queries[name], start_date, end_date) for name in covered}
+    # An overridden start also reads the days the first R7 windows need; they are trimmed below
+    start = (min(lookback_start(queries[name], start_date) for name in covered)
+             if start_date else min(preset['start_date'] for preset in covered.values()))
+    end = (max(window_end for _, window_end in windows.values())
+           if end_date else max(preset['end_date'] for preset in covered.values()))
+    print(f"📖 Query: {TEMPLATE} for {', '.join(covered)} ({start} to {end}, {len(segments)} segments)")
+
+    with query_metrics.context(query='schedule_metrics', queries=','.join(covered)):
+        df = run_combined(start, end, segments=segments, use_cache=use_cache, refresh_cache=refresh_cache)
+    if df is None or len(df) == 0:
+        print(f"❌ Combined query returned no results")
+        return {}
+    print(f"✅ Retrieved {len(df)} rows for {len(covered)} charts in one scan")
+
+    results = {}
+    for name, preset in covered.items():
+        output = TEMPLATE_OUTPUTS[preset['template']]
+        frame = split(df, preset['segments'], outputs=[output])[output]
+        date_col = frame.columns[0]
+        window_start, window_end = windows[name]
+        keep = ((frame[date_col] >= pd.Timestamp(window_start or preset['start_date']))
+                & (frame[date_col] < pd.Timestamp(window_end or preset['end_date'])))
+        results[name] = frame[keep].reset_index(drop=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Spot allocation and disabled schedules from one scan')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('render', 'Print the combined query as runnable SQL'),
+                               ('run', 'Run the combined query and print every output')):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument('--start-date', required=True, help='First day, YYYY-MM-DD (inclusive)')
+        sub.add_argument('--end-date', required=True, help='Last day, YYYY-MM-DD (exclusive)')
+        sub.add_argument('--segments', help='Comma-separated segment names (default: All, SA, Non-SA)')
+        sub.add_argument('--tenure-days', type=int, help='Tenure threshold in days')
+    run_parser = subparsers.choices['run']
+    run_parser.add_argument('--grains', default=','.join(GRAINS), help='Comma-separated grains to print')
+    run_parser.add_argument('--no-cache', action='store_true', help='Bypass the local result cache')
+    run_parser.add_argument('--backend', choices=BACKENDS, default='snowflake',
+                            help='Run on the warehouse or on the local DuckDB extract')
+    args = parser.parse_args(argv)
+
+    segments = args.segments.split(',') if args.segments else CLASSIFICATION_SEGMENTS
+    try:
+        if args.command == 'render':
+            sql, _ = render(TEMPLATE, segments=segments, inline=True, start_date=args.start_date,
+                            end_date=args.end_date, tenure_days=args.tenure_days)
+            print(sql)
+            return 0
+        use_backend(args.backend)
+        df = run_combined(args.start_date, args.end_date, segments=segments, tenure_days=args.tenure_days,
+                          use_cache=not args.no_cache)
+    except TemplateError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        close_connection()
+
+    if df is None or len(df) == 0:
+        print("❌ Query returned no results")
+        return 1
+    grains = args.grains.split(',')
+    for (metric, grain), frame in split(df, segments, [(m, g) for m in METRICS for g in grains]).items():
+        print(f"\n{metric} ({grain}): {len(frame)} rows")
+        print(frame.tail(7).to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
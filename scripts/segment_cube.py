@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+Segment cube: daily partial aggregates keyed by venue dimensions
+
+Segments in the sql/ templates are hard-wired predicates (SA vs Non-SA, >730 vs <=730
+days), so every new cut means editing and re-running the queries. The cube stores one
+row per day and cell, where a cell is a combination of
+
+    venue_type              partner_details.venue_type (all types, not just Fitness)
+    account_classification  salesforce_venues.account_classification (NULL kept as null)
+    tenure_bucket           days_tenure bucketed by TENURE_BUCKETS
+
+with the partial aggregates of every chart measure:
+
+    spot_ratio_sum, bookable_venue_days   sum and count of venue-day cp_alloc / bookable schedules
+    total_scheds, disabled_scheds         schedule counts (05/02 filter)
+    soft_churns, churn_venue_days         soft churn sum and venue-days with churn rows
+    active_venue_ids                      sorted IDs of the cell's active venues that day
+
+A segment is any filter over the three dimensions, so tenure x classification cuts or
+finer tenure buckets are answered in memory from the loaded cube. The chart segments are
+special cases (CUBE_SEGMENTS): all_fitness is venue_type = 'Fitness', long_tenure_gt24mo
+is the buckets above DEFAULT_TENURE_DAYS, and so on. Rates are computed as the templates
+do:
+
+    spot_allocation     mean of venue-day ratios (day / week / month: 01 at venue-day grain,
+                        as with tenure segments); rN = mean of the last N daily rows (04)
+    disabled_schedules  disabled / total * 100 (02); rN = mean of the last N daily rows (05)
+    soft_churn          soft churn sum / distinct active venues * 100 (03); rN = trailing
+                        N calendar days with exact distinct counts (06)
+
+Schedule counts add across cells and days because a schedule belongs to one venue and
+one start date.
+
+The cube is built from 10_segment_cube_venue_days.sql and kept in the metric store
+(segment_cube); refreshes only pull days that aren't stored yet. The local extract needs
+`local_backend.py extract --all-venue-types` for venue types other than Fitness.
+
+Usage:
+    python segment_cube.py refresh --start-date 2024-10-01
+    python segment_cube.py dims
+    python segment_cube.py show soft_churn month --segments all_fitness,sa_fitness
+    python segment_cube.py show disabled_schedules r7 --where "venue_type=Fitness" --by tenure_bucket,account_classification
+    python segment_cube.py show spot_allocation month --where "venue_type=Fitness;account_classification!=SA;tenure_bucket=24-36mo|36-60mo"
+"""
+import sys
+import time
+import argparse
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+from snowflake_connection import BACKENDS, execute_query_batches, close_connection, use_backend
+from sql_templates import CLASSIFICATION_SEGMENTS, DEFAULT_TENURE_DAYS, render, to_date
+from sharded_query import run_sharded
+from rolling_distinct import rolling_distinct_counts
+from rollup import HISTORY_START, missing_ranges, rolling_days
+import metric_store
+import local_backend
+
+VENUE_DAYS_TEMPLATE = '10_segment_cube_venue_days.sql'
+CUBE_METRIC = 'segment_cube'
+
+DIMENSIONS = ('venue_type', 'account_classification', 'tenure_bucket')
+
+# Tenure bucket label -> upper bound in days (inclusive); the last bucket is open-ended.
+# DEFAULT_TENURE_DAYS must be a bound so the >24mo / <=24mo segments are unions of buckets.
+TENURE_BUCKETS = {
+    '<=12mo': 365,
+    '12-24mo': DEFAULT_TENURE_DAYS,
+    '24-36mo': 1095,
+    '36-60mo': 1825,
+    '>60mo': None,
+}
+
+MEASURES = ('spot_ratio_sum', 'bookable_venue_days', 'total_scheds', 'disabled_scheds',
+            'soft_churns', 'churn_venue_days')
+CUBE_COLUMNS = ['date', *DIMENSIONS, *MEASURES, 'active_venue_ids']
+
+METRICS = ('spot_allocation', 'disabled_schedules', 'soft_churn')
+
+_LONG_TENURE = [label for label, bound in TENURE_BUCKETS.items() if bound is None or bound > DEFAULT_TENURE_DAYS]
+_SHORT_TENURE = [label for label in TENURE_BUCKETS if label not in _LONG_TENURE]
+
+
+def not_equal(value):
+    """Filter for dimension != value, with NULL included (as the Non-SA predicate)"""
+    return lambda values: (values != value) | values.isna()
+
+
+# sql_templates.SEGMENTS as cube filters
+CUBE_SEGMENTS = {
+    'all_fitness': {'venue_type': 'Fitness'},
+    'sa_fitness': {'venue_type': 'Fitness', 'account_classification': 'SA'},
+    'nonsa_fitness': {'venue_type': 'Fitness', 'account_classification': not_equal('SA')},
+    'long_tenure_gt24mo': {'venue_type': 'Fitness', 'tenure_bucket': _LONG_TENURE},
+    'short_tenure_le24mo': {'venue_type': 'Fitness', 'tenure_bucket': _SHORT_TENURE},
+}
+
+
+def tenure_bucket(days_tenure):
+    """Label each days_tenure with its TENURE_BUCKETS bucket (NULL stays null)"""
+    bounds = [bound for bound in TENURE_BUCKETS.values() if bound is not None]
+    edges = [-np.inf, *bounds, np.inf]
+    return pd.cut(pd.to_numeric(days_tenure, errors='coerce'), edges, labels=list(TENURE_BUCKETS),
+                  right=True).astype(object)
+
+
+def build_cells(rows):
+    """
+    Aggregate 10_segment_cube_venue_days.sql rows into daily cube cells
+
+    Returns:
+        DataFrame with CUBE_COLUMNS, one row per (date, venue_type, account_classification,
+        tenure_bucket) that has any rows
+    """
+    if len(rows) == 0:
+        return pd.DataFrame(columns=CUBE_COLUMNS)
+    rows = rows.reset_index(drop=True)
+    numeric = {col: pd.to_numeric(rows[col], errors='coerce')
+               for col in ('bookable_scheds', 'cp_alloc_adjusted', 'total_scheds', 'disabled_scheds',
+                           'soft_churn', 'is_active', 'churn_rows')}
+    bookable = numeric['bookable_scheds'].fillna(0) > 0
+    frame = pd.DataFrame({
+        'date': pd.to_datetime(rows['date']).dt.normalize(),
+        'venue_type': rows['venue_type'].astype(object),
+        'account_classification': rows['account_classification'].astype(object),
+        'tenure_bucket': tenure_bucket(rows['days_tenure']),
+        # cp_alloc_adjusted * 1.0 / nullif(bookable_scheds, 0), over venue-days with bookable schedules
+        'spot_ratio_sum': (numeric['cp_alloc_adjusted'] / numeric['bookable_scheds'].where(bookable)).fillna(0.0),
+        'bookable_venue_days': bookable.astype(np.int64),
+        'total_scheds': numeric['total_scheds'].fillna(0).astype(np.int64),
+        'disabled_scheds': numeric['disabled_scheds'].fillna(0).astype(np.int64),
+        'soft_churns': numeric['soft_churn'].fillna(0.0),
+        'churn_venue_days': (numeric['churn_rows'].fillna(0) > 0).astype(np.int64),
+    })
+    keys = ['date', *DIMENSIONS]
+    grouped = frame.groupby(keys, dropna=False, sort=True)
+    cells = grouped[list(MEASURES)].sum().reset_index()
+
+    # Distinct active venue IDs per cell: unique (cell, venue) pairs split at cell boundaries
+    active = (numeric['is_active'] == 1).to_numpy()
+    cell_codes = grouped.ngroup().to_numpy()[active]
+    venue_ids = pd.to_numeric(rows['venue_id']).to_numpy(np.int64)[active]
+    pairs = np.unique(np.stack([cell_codes, venue_ids]), axis=1)
+    bounds = np.searchsorted(pairs[0], np.arange(1, len(cells)))
+    cells['active_venue_ids'] = np.split(pairs[1], bounds)
+    return cells[CUBE_COLUMNS]
+
+
+def fetch_venue_days(start_date, end_date, shard_months=None):
+    """Pull 10_segment_cube_venue_days.sql rows for [start_date, end_date)"""
+    if shard_months:
+        rows = run_sharded(VENUE_DAYS_TEMPLATE, start_date, end_date, shard_months=shard_months)
+    else:
+        query, params = render(VENUE_DAYS_TEMPLATE, start_date=start_date, end_date=end_date)
+        batches = list(execute_query_batches(query, fetch_mode='pandas', params=params))
+        rows = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
+    rows.columns = rows.columns.str.lower()
+    return rows
+
+
+def refresh(start_date=None, end_date=None, rebuild=False, store_dir=None, shard_months=None):
+    """
+    Make sure the cube covers [start_date, end_date), querying only what is missing
+
+    Args:
+        start_date: First day needed (default: rollup.HISTORY_START)
+        end_date: First day NOT needed (default: today)
+        rebuild: Re-pull the whole window even if it is stored (e.g. after changing TENURE_BUCKETS)
+        store_dir: Metric store location (default: data/metrics)
+        shard_months: Query in parallel month shards of this size (see sharded_query.py)
+
+    Returns:
+        Number of cells written
+    """
+    start_date = to_date(start_date) or HISTORY_START
+    end_date = to_date(end_date) or date.today()
+    stored = [] if rebuild else SegmentCube.load(store_dir=store_dir).cells['date'].dt.date.unique().tolist()
+    ranges = missing_ranges(stored, start_date, end_date)
+    if not ranges:
+        print(f"✓ Segment cube already covers {start_date} to {end_date - timedelta(days=1)}")
+        return 0
+
+    written = 0
+    for range_start, range_end in ranges:
+        print(f"⏳ Querying venue-days for {range_start} to {range_end - timedelta(days=1)} "
+              f"({(range_end - range_start).days} days)...")
+        cells = build_cells(fetch_venue_days(range_start, range_end, shard_months=shard_months))
+        if len(cells):
+            metric_store.write(CUBE_METRIC, cells, source=f"segment_cube.py (tenure buckets {list(TENURE_BUCKETS)})",
+                               store_dir=store_dir)
+        written += len(cells)
+    print(f"💾 Stored {written} cell(s) in {CUBE_METRIC}")
+    return written
+
+
+def parse_where(text):
+    """
+    Parse a filter such as "venue_type=Fitness;account_classification!=SA;tenure_bucket=24-36mo|36-60mo"
+
+    `null` as a value matches NULL (e.g. account_classification=null).
+
+    Returns:
+        Dict of dimension -> allowed values (list) or not_equal() filter
+    """
+    filters = {}
+    for clause in filter(None, (part.strip() for part in text.split(';'))):
+        negate = '!=' in clause
+        dimension, _, values = clause.partition('!=' if negate else '=')
+        dimension = dimension.strip()
+        if dimension not in DIMENSIONS or not values:
+            raise ValueError(f"Bad filter {clause!r}; use <dimension>=<value>[|<value>] with one of {DIMENSIONS}")
+        values = [None if value.strip() == 'null' else value.strip() for value in values.split('|')]
+        if negate and (len(values) != 1 or values[0] is None):
+            raise ValueError(f"Bad filter {clause!r}; != takes one non-null value")
+        filters[dimension] = not_equal(values[0]) if negate else values
+    return filters
+
+
+class SegmentCube:
+    """
+    Cube cells loaded in memory, indexed for segment queries
+
+    Each query is a few boolean masks over the cells plus bincounts, so any segment
+    combination is answered without touching the warehouse.
+    """
+
+    def __init__(self, cells):
+        self.cells = cells.sort_values('date').reset_index(drop=True)
+        self.cells['date'] = pd.to_datetime(self.cells['date'])
+        self._day_numbers = self.cells['date'].to_numpy('datetime64[D]').astype(np.int64)
+        self._measures = {name: pd.to_numeric(self.cells[name]).to_numpy(float) for name in MEASURES}
+        lengths = self.cells['active_venue_ids'].map(len).to_numpy(np.int64)
+        self._id_cells = np.repeat(np.arange(len(self.cells)), lengths)
+        ids = (np.concatenate(self.cells['active_venue_ids'].tolist()).astype(np.int64)
+               if lengths.sum() else np.array([], dtype=np.int64))
+        self._id_codes = np.unique(ids, return_inverse=True)[1]
+        self._n_codes = int(self._id_codes.max()) + 1 if len(ids) else 1
+
+    @classmethod
+    def load(cls, start_date=None, end_date=None, store_dir=None):
+        """Load the stored cells for [start_date, end_date) (an empty cube if nothing is stored)"""
+        try:
+            cells = metric_store.read(CUBE_METRIC, start_date=start_date, end_date=end_date, store_dir=store_dir)
+        except KeyError:
+            cells = pd.DataFrame({col: pd.Series(dtype='datetime64[ns]' if col == 'date' else object)
+                                  for col in CUBE_COLUMNS})
+        return cls(cells[CUBE_COLUMNS])
+
+    def dimension_values(self):
+        """Dict of dimension -> sorted distinct values (null shown as None)"""
+        values = {}
+        for dimension in DIMENSIONS:
+            present = self.cells[dimension].dropna().unique().tolist()
+            ordered = ([label for label in TENURE_BUCKETS if label in present] if dimension == 'tenure_bucket'
+                       else sorted(present))
+            values[dimension] = ordered + ([None] if self.cells[dimension].isna().any() else [])
+        return values
+
+    def mask(self, filters):
+        """Boolean array over the cells for a dict of dimension -> value, list of values or callable"""
+        keep = np.ones(len(self.cells), dtype=bool)
+        for dimension, allowed in filters.items():
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension {dimension!r}; dimensions are {DIMENSIONS}")
+            values = self.cells[dimension]
+            if callable(allowed):
+                keep &= np.asarray(allowed(values), dtype=bool)
+            else:
+                allowed = [allowed] if isinstance(allowed, str) or allowed is None else list(allowed)
+                keep &= (values.isin([value for value in allowed if value is not None])
+                         | (values.isna() & (None in allowed))).to_numpy()
+        return keep
+
+    def query(self, metric, grain, segments=None, start_date=None, end_date=None):
+        """
+        Rates for each segment at a grain
+
+        Args:
+            metric: 'spot_allocation', 'disabled_schedules' or 'soft_churn'
+            grain: 'day', 'week' (Monday start), 'month', or 'rN' for a trailing window
+            segments: Dict of output name -> filters (see mask), or names from CUBE_SEGMENTS
+                (default: CLASSIFICATION_SEGMENTS)
+            start_date / end_date: Periods to output, [start, end). Trailing windows use
+                earlier cells as lookback.
+
+        Returns:
+            DataFrame in the chart columns: {segment}_daily / {segment} (spot allocation),
+            {segment}_pct (disabled schedules, soft churn), or {segment}_rN / {segment}_rN_pct.
+            The output periods are those with data in any of the segments.
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; metrics are {METRICS}")
+        window_days = rolling_days(grain)
+        segments = segments if segments is not None else CLASSIFICATION_SEGMENTS
+        if not isinstance(segments, dict):
+            unknown = [name for name in segments if name not in CUBE_SEGMENTS]
+            if unknown:
+                raise ValueError(f"Unknown segment(s) {unknown}; known: {list(CUBE_SEGMENTS)}")
+            segments = {name: CUBE_SEGMENTS[name] for name in segments}
+        masks = {name: self.mask(filters) for name, filters in segments.items()}
+
+        start_date, end_date = to_date(start_date), to_date(end_date)
+        in_window = np.ones(len(self.cells), dtype=bool)
+        if end_date:
+            in_window &= self._day_numbers < np.datetime64(end_date, 'D').astype(np.int64)
+        if start_date and window_days is None:
+            in_window &= self._day_numbers >= np.datetime64(start_date, 'D').astype(np.int64)
+
+        presence_measure = {'spot_allocation': 'bookable_venue_days', 'disabled_schedules': 'total_scheds',
+                            'soft_churn': 'churn_venue_days'}[metric]
+        union = np.logical_or.reduce(list(masks.values())) if masks else np.zeros(len(self.cells), dtype=bool)
+        present = in_window & union & (self._measures[presence_measure] > 0)
+        if not present.any():
+            return pd.DataFrame(columns=['date'])
+
+        if window_days is None:
+            result = self._calendar(metric, grain, masks, in_window, present)
+        elif metric == 'soft_churn':
+            result = self._trailing_churn(grain, window_days, masks, in_window, present)
+        else:
+            daily = self._calendar(metric, 'day', masks, in_window, present)
+            result = pd.DataFrame({'date': daily['date']})
+            for name, column in zip(masks, daily.columns[1:]):
+                # avg(daily) OVER (ORDER BY date ROWS BETWEEN N-1 PRECEDING AND CURRENT ROW)
+                suffix = f'_{grain}' if metric == 'spot_allocation' else f'_{grain}_pct'
+                result[f'{name}{suffix}'] = daily[column].rolling(window_days, min_periods=1).mean()
+        if start_date and window_days is not None:
+            result = result[result['date'] >= pd.Timestamp(start_date)].reset_index(drop=True)
+        return result
+
+    def _periods(self, grain, selected):
+        """Period label per selected cell, as (codes, labels)"""
+        dates = self.cells['date'][selected]
+        if grain == 'month':
+            periods = dates.dt.to_period('M').dt.start_time
+        elif grain == 'week':
+            periods = dates - pd.to_timedelta(dates.dt.weekday, unit='D')
+        else:
+            periods = dates
+        return pd.factorize(periods, sort=True)
+
+    def _calendar(self, metric, grain, masks, in_window, present):
+        """Day / week / month rates over the periods that have data"""
+        period_codes = np.full(len(self.cells), -1, dtype=np.int64)
+        codes, labels = self._periods(grain, in_window)
+        period_codes[in_window] = codes
+        has_data = np.zeros(len(labels), dtype=bool)
+        has_data[period_codes[present]] = True
+
+        date_column = {'day': 'date', 'week': 'week'}.get(grain, 'month' if metric == 'soft_churn' else 'month_date')
+        result = pd.DataFrame({date_column: labels})
+        for name, segment_mask in masks.items():
+            selected = in_window & segment_mask
+
+            def total(measure):
+                return np.bincount(period_codes[selected], weights=self._measures[measure][selected],
+                                   minlength=len(labels))
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                if metric == 'spot_allocation':
+                    counts = total('bookable_venue_days')
+                    values = np.where(counts > 0, total('spot_ratio_sum') / counts, np.nan)
+                    result[f'{name}_daily' if grain == 'day' else name] = values
+                elif metric == 'disabled_schedules':
+                    totals = total('total_scheds')
+                    result[f'{name}_pct'] = np.where(totals > 0, total('disabled_scheds') / totals * 100, np.nan)
+                else:
+                    id_selected = selected[self._id_cells]
+                    # count(distinct venue) per period: unique (period, venue) pairs
+                    pairs = np.unique(period_codes[self._id_cells[id_selected]] * self._n_codes
+                                      + self._id_codes[id_selected])
+                    venues = np.bincount(pairs // self._n_codes, minlength=len(labels))
+                    result[f'{name}_pct'] = np.where(venues > 0, total('soft_churns') / venues * 100, np.nan)
+        return result[has_data].reset_index(drop=True)
+
+    def _trailing_churn(self, grain, window_days, masks, in_window, present):
+        """Soft churn over trailing calendar windows with exact distinct venue counts (06)"""
+        first_day = self._day_numbers[in_window].min()
+        n_days = int(self._day_numbers[in_window].max() - first_day) + 1
+        day_idx = self._day_numbers - first_day
+        output_days = np.unique(day_idx[present])
+        result = pd.DataFrame({'date': pd.to_datetime((output_days + first_day).astype('datetime64[D]'))})
+        window_start = np.maximum(np.arange(n_days) - window_days + 1, 0)
+        for name, segment_mask in masks.items():
+            selected = in_window & segment_mask
+            id_selected = selected[self._id_cells]
+            venues = rolling_distinct_counts(day_idx[self._id_cells[id_selected]], self._id_codes[id_selected],
+                                             n_days, window_days)[output_days]
+            daily = np.bincount(day_idx[selected], weights=self._measures['soft_churns'][selected], minlength=n_days)
+            cumulative = np.concatenate([[0.0], np.cumsum(daily)])
+            churns = (cumulative[1:] - cumulative[window_start])[output_days]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result[f'{name}_{grain}_pct'] = np.where(venues > 0, churns / venues * 100, np.nan)
+        return result
+
+    def crosstab(self, metric, grain, by, where=None, start_date=None, end_date=None):
+        """
+        Rates for every combination of the `by` dimensions present in the cube
+
+        Args:
+            by: Dimensions to split on, e.g. ['tenure_bucket', 'account_classification']
+            where: Filters applied to every combination (see mask)
+
+        Returns:
+            As query(), one column per combination, named like 'SA|24-36mo'
+        """
+        where = where or {}
+        subset = self.cells[self.mask(where)]
+        bucket_order = {label: position for position, label in enumerate(TENURE_BUCKETS)}
+        combinations = subset[list(by)].drop_duplicates().sort_values(
+            list(by), na_position='last',
+            key=lambda values: values.map(bucket_order) if values.name == 'tenure_bucket' else values)
+        segments = {}
+        for values in combinations.itertuples(index=False):
+            name = '|'.join('null' if value is None or pd.isna(value) else str(value) for value in values)
+            segments[name] = {**where, **{dim: [None if pd.isna(value) else value] for dim, value in zip(by, values)}}
+        return self.query(metric, grain, segments=segments, start_date=start_date, end_date=end_date)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Segment cube over venue type, classification and tenure')
+    parser.add_argument('--backend', choices=BACKENDS, default='snowflake',
+                        help='Pull venue-days from the warehouse or the local DuckDB extract '
+                             '(the local cube goes to the local store)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    refresh_parser = subparsers.add_parser('refresh', help='Query the days not stored yet and store their cells')
+    refresh_parser.add_argument('--start-date', help=f'First day, YYYY-MM-DD (default: {HISTORY_START})')
+    refresh_parser.add_argument('--end-date', help='First day NOT to load, YYYY-MM-DD (default: today)')
+    refresh_parser.add_argument('--rebuild', action='store_true', help='Re-pull the whole window')
+    refresh_parser.add_argument('--shard-months', type=int, help='Query in parallel shards of this many months')
+
+    subparsers.add_parser('dims', help='List the dimension values in the stored cube')
+
+    show_parser = subparsers.add_parser('show', help='Print rates for segments of the stored cube')
+    show_parser.add_argument('metric', choices=METRICS)
+    show_parser.add_argument('grain', help='day, week, month, or rN for a trailing window (r7, r28, ...)')
+    show_parser.add_argument('--segments', help=f"Comma-separated named segments ({', '.join(CUBE_SEGMENTS)})")
+    show_parser.add_argument('--where', help='Filter, e.g. "venue_type=Fitness;account_classification!=SA"')
+    show_parser.add_argument('--by', help='Comma-separated dimensions to split on (one column per combination)')
+    show_parser.add_argument('--start-date', help='First day, YYYY-MM-DD (inclusive)')
+    show_parser.add_argument('--end-date', help='Last day, YYYY-MM-DD (exclusive)')
+    show_parser.add_argument('--output', help='Also write the rates to this CSV file')
+    args = parser.parse_args(argv)
+
+    store_dir = None
+    if args.backend == 'local':
+        use_backend('local')
+        store_dir = local_backend.METRICS_DIR
+
+    try:
+        if args.command == 'refresh':
+            refresh(args.start_date, args.end_date, rebuild=args.rebuild, store_dir=store_dir,
+                    shard_months=args.shard_months)
+            return 0
+
+        started = time.perf_counter()
+        cube = SegmentCube.load(store_dir=store_dir)
+        if len(cube.cells) == 0:
+            print("❌ The segment cube is empty; run `python segment_cube.py refresh` first")
+            return 1
+        print(f"✓ Loaded {len(cube.cells):,} cells ({cube.cells['date'].min().date()} to "
+              f"{cube.cells['date'].max().date()}) in {time.perf_counter() - started:.2f}s")
+
+        if args.command == 'dims':
+            for dimension, values in cube.dimension_values().items():
+                print(f"  {dimension:<24} {', '.join(str(value) for value in values)}")
+            return 0
+
+        where = parse_where(args.where) if args.where else {}
+        started = time.perf_counter()
+        if args.by:
+            rates = cube.crosstab(args.metric, args.grain, args.by.split(','), where=where,
+                                  start_date=args.start_date, end_date=args.end_date)
+        else:
+            if args.segments:
+                segments = args.segments.split(',')
+            elif where:
+                segments = {'segment': where}
+            else:
+                segments = None
+            rates = cube.query(args.metric, args.grain, segments=segments, start_date=args.start_date,
+                               end_date=args.end_date)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if args.output:
+            rates.to_csv(args.output, index=False)
+            print(f"💾 Rates saved to: {args.output}")
+        print(rates.to_string(index=False))
+        print(f"\n⏱️ Query took {elapsed_ms:.1f} ms")
+        return 0
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    finally:
+        close_connection()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Date-range sharding for long-history queries
+
+A multi-year pull (e.g. soft_churn_r7 from 2023-01-01) runs as one statement under a
+3600-second timeout, so one timeout throws away all of the work. Sharding splits the
+date window into month-aligned chunks, runs the chunks in parallel on separate
+connections, retries failed chunks with backoff, and merges the results.
+
+Rolling templates (R7) read extra days before each shard so every kept day has its full
+window, and the lookback days are trimmed when merging. The R7 windows in 04/05 are
+ROWS BETWEEN 6 PRECEDING, so if a shard's lookback holds fewer than 6 days of output
+(gaps in the data), the shard is re-run with a longer lookback. The merged result is
+the same as running the whole window in one statement.
+
+Usage:
+    python sharded_query.py soft_churn_r7
+    python sharded_query.py soft_churn_r7 --start-date 2023-01-01 --end-date 2025-12-01 --shard-months 3
+    python sharded_query.py spot_allocation_monthly --workers 6 --output spot_allocation_monthly.csv
+"""
+import sys
+import time
+import argparse
+from datetime import date, timedelta
+import pandas as pd
+
+from snowflake_connection import execute_queries_parallel, is_transient_error
+from sql_templates import PRESETS, TemplateError, render, to_date
+import query_metrics
+
+# Template -> R7 window length in days. Templates not listed have no rolling window
+# and need no lookback.
+ROLLING_WINDOW_DAYS = {
+    '04_spot_allocation_r7_rolling_7day.sql': 7,
+    '05_disabled_schedules_r7_rolling_7day.sql': 7,
+    '06_soft_churn_r7_rolling_7day.sql': 7,
+}
+
+DEFAULT_SHARD_MONTHS = 1
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_SECONDS = 5
+
+
+def _add_months(day, months):
+    """First day of the month `months` after day's month"""
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def month_shards(start_date, end_date, shard_months=DEFAULT_SHARD_MONTHS):
+    """
+    Split [start_date, end_date) into month-aligned windows
+
+    Shard boundaries fall on the first of a month, so monthly aggregates never straddle
+    two shards. A start or end date in the middle of a month gives a partial first or
+    last shard.
+
+    Returns:
+        List of (shard_start, shard_end) date tuples covering the window in order
+    """
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    if shard_months < 1:
+        raise ValueError(f"shard_months must be at least 1, got {shard_months}")
+
+    shards = []
+    shard_start = start_date
+    while shard_start < end_date:
+        shard_end = min(_add_months(shard_start, shard_months), end_date)
+        shards.append((shard_start, shard_end))
+        shard_start = shard_end
+    return shards
+
+
+def _date_column(df):
+    """Name of the result's date column (Snowflake returns DATE, local runs return date)"""
+    for col in df.columns:
+        if col.lower() == 'date':
+            return col
+    raise KeyError(f"Rolling query result has no date column: {list(df.columns)}")
+
+
+def lookback_rows(df, keep_from):
+    """Number of output days before keep_from, i.e. how much window history a query (or shard) read"""
+    if len(df) == 0:
+        return 0
+    dates = pd.to_datetime(df[_date_column(df)]).dt.date
+    return int((dates < keep_from).sum())
+
+
+def trim(df, keep_from):
+    """Drop the lookback rows a query (or shard) read before keep_from"""
+    if len(df) == 0:
+        return df
+    dates = pd.to_datetime(df[_date_column(df)]).dt.date
+    return df[(dates >= keep_from).to_numpy()]
+
+
+def run_sharded(template, start_date, end_date, segments=None, shard_months=DEFAULT_SHARD_MONTHS,
+                max_workers=DEFAULT_MAX_WORKERS, retries=DEFAULT_RETRIES,
+                backoff_seconds=DEFAULT_BACKOFF_SECONDS, timeout_seconds=3600, connect=None,
+                use_cache=False, refresh_cache=False, monitor=None, origin=None, **params):
+    """
+    Run a template over [start_date, end_date) as parallel date shards and merge the results
+
+    Args:
+        template: File name in sql/ (see sql_templates.render)
+        start_date: First day (inclusive)
+        end_date: Last day (exclusive)
+        segments: Segments to render (see sql_templates.render)
+        shard_months: Months per shard
+        max_workers: Shards running at once
+        retries: How many times a failed shard is re-run before giving up
+        backoff_seconds: Wait before the first retry; doubled for each further retry
+        timeout_seconds: Per-shard statement timeout
+        connect: Connection factory, passed to execute_queries_parallel
+        use_cache: Cache each shard's result, so a re-run after a failure only runs the
+            shards that didn't finish
+        refresh_cache: Re-run every shard and overwrite its cached result
+        monitor: anomaly_checks.AnomalyMonitor that checks the trimmed shards as they
+            finish, in window order
+        origin: Earliest day any shard reads (default: start_date). An earlier origin
+            gives the first shard lookback days too, so its first R7 values have full
+            windows
+        **params: Other template parameters (e.g. tenure_days)
+
+    Returns:
+        DataFrame with the same rows as running the whole window in one statement
+
+    Raises:
+        RuntimeError: If any shard fails with a permanent error (bad SQL or data), or
+            still fails after all retries
+    """
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    origin = min(to_date(origin), start_date) if origin else start_date
+    window_days = ROLLING_WINDOW_DAYS.get(template)
+    lookback_days = window_days - 1 if window_days else 0
+
+    shards = month_shards(start_date, end_date, shard_months)
+    # Shard name -> (window start, window end, lookback days)
+    pending = {f"{shard_start}..{shard_end}": (shard_start, shard_end, lookback_days)
+               for shard_start, shard_end in shards}
+    print(f"🧩 {template}: {start_date} to {end_date} in {len(shards)} shard(s) "
+          f"of {shard_months} month(s), {max_workers} at a time")
+
+    results = {}
+    shard_names = [f"{shard_start}..{shard_end}" for shard_start, shard_end in shards]
+    checked = 0
+    attempt = 0
+    started = time.perf_counter()
+    while pending:
+        queries = {}
+        bind_values = {}
+        for name, (shard_start, shard_end, lookback) in pending.items():
+            # Nothing is read before the origin, matching the unsharded query
+            query_start = max(shard_start - timedelta(days=lookback), origin)
+            queries[name], bind_values[name] = render(template, segments=segments, start_date=query_start,
+                                                      end_date=shard_end, **params)
+
+        with query_metrics.context(template=template, attempt=attempt + 1):
+            frames, errors = execute_queries_parallel(queries, max_workers=min(max_workers, len(queries)),
+                                                      timeout_seconds=timeout_seconds, connect=connect,
+                                                      use_cache=use_cache, refresh_cache=refresh_cache,
+                                                      params=bind_values)
+
+        retry = {}
+        for name, df in frames.items():
+            shard_start, shard_end, lookback = pending[name]
+            query_start = max(shard_start - timedelta(days=lookback), origin)
+            if window_days and query_start > origin and lookback_rows(df, shard_start) < window_days - 1:
+                # Gaps in the data: fewer than window_days - 1 output days before the shard,
+                # so its first R7 values would be missing part of their window
+                retry[name] = (shard_start, shard_end, lookback * 2)
+                print(f"↩️  [{name}] lookback had {lookback_rows(df, shard_start)} day(s); "
+                      f"re-running with {lookback * 2} days")
+                continue
+            results[name] = trim(df, shard_start) if lookback else df
+
+        # Hand finished shards to the monitor once every earlier shard is done too
+        while monitor is not None and checked < len(shards) and shard_names[checked] in results:
+            monitor.update(results[shard_names[checked]])
+            checked += 1
+
+        if errors:
+            attempt += 1
+            # Bad SQL or data fails the same way on every shard and attempt
+            if attempt > retries or not all(is_transient_error(error) for error in errors.values()):
+                raise RuntimeError(f"{len(errors)} shard(s) failed after {attempt} attempt(s): "
+                                   + ', '.join(f"{name} ({error})" for name, error in errors.items()))
+            delay = backoff_seconds * 2 ** (attempt - 1)
+            print(f"⚠️ Retrying {len(errors)} failed shard(s) in {delay}s "
+                  f"(attempt {attempt}/{retries})")
+            time.sleep(delay)
+            retry.update({name: pending[name] for name in errors})
+        pending = retry
+
+    # Merge in window order; shards never overlap once the lookback rows are trimmed
+    merged = pd.concat([results[name] for name in shard_names], ignore_index=True)
+    print(f"✅ Merged {len(shards)} shard(s) into {len(merged)} rows in {time.perf_counter() - started:.1f}s")
+    return merged
+
+
+def run_sharded_preset(name, start_date=None, end_date=None, segments=None, **kwargs):
+    """
+    Run a named query from sql_templates.PRESETS with run_sharded
+
+    Args:
+        name: Key in PRESETS
+        start_date, end_date, segments: Overrides for the preset's window and segments
+        **kwargs: Passed to run_sharded (shard_months, max_workers, retries, ...)
+    """
+    if name not in PRESETS:
+        raise TemplateError(f"Unknown query '{name}'; known: {list(PRESETS)}")
+    preset = PRESETS[name]
+    start_date, end_date = preset_window(name, start_date, end_date)
+    # An overridden start keeps full R7 windows by reading back to the preset's own start
+    return run_sharded(preset['template'],
+                       start_date or preset['start_date'],
+                       end_date or preset['end_date'],
+                       segments=segments or preset['segments'],
+                       origin=preset['start_date'],
+                       **kwargs)
+
+
+def preset_window(name, start_date=None, end_date=None):
+    """
+    Window to run a named query over for an overridden start and end
+
+    Monthly templates store one row per calendar month, so a start or end in the middle
+    of a month would upsert a partial month over the stored full one. Their window is
+    widened to whole months, as refresh_scheduler.py does, but not past the preset's own
+    start or end when the override falls inside the preset's window.
+
+    Args:
+        name: Key in PRESETS
+        start_date: Overridden first day (inclusive), or None
+        end_date: Overridden last day (exclusive), or None
+
+    Returns:
+        (start_date, end_date) as dates, None where not given; unchanged for unknown
+        names and non-monthly templates
+    """
+    start_date = to_date(start_date) if start_date else None
+    end_date = to_date(end_date) if end_date else None
+    if name not in PRESETS or 'monthly' not in PRESETS[name]['template']:
+        return start_date, end_date
+    preset = PRESETS[name]
+    preset_start, preset_end = to_date(preset['start_date']), to_date(preset['end_date'])
+    if start_date:
+        month_start = _add_months(start_date, 0)
+        start_date = max(month_start, preset_start) if start_date >= preset_start else month_start
+    if end_date and end_date.day != 1:
+        month_end = _add_months(end_date, 1)
+        end_date = min(month_end, preset_end) if end_date <= preset_end else month_end
+    return start_date, end_date
+
+
+def lookback_start(name, start_date):
+    """
+    First day to query for a named query run from start_date
+
+    An R7 query rendered from a start_date after its preset's own start would have
+    short windows on its first days and overwrite the full-window values in the store.
+    It also reads the window - 1 days before start_date, but nothing before the preset's
+    start, where the stored series begins; the caller drops those rows with trim().
+    Monthly queries start on the first of start_date's month (preset_window).
+
+    Args:
+        name: Key in PRESETS
+        start_date: Overridden first day, or None for the preset's
+
+    Returns:
+        date (start_date itself for unknown names and None)
+    """
+    if start_date is None or name not in PRESETS:
+        return start_date
+    preset = PRESETS[name]
+    start_date, preset_start = preset_window(name, start_date)[0], to_date(preset['start_date'])
+    lookback_days = (ROLLING_WINDOW_DAYS.get(preset['template']) or 1) - 1
+    if not lookback_days or start_date <= preset_start:
+        return start_date
+    return max(start_date - timedelta(days=lookback_days), preset_start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a named query as parallel date shards')
+    parser.add_argument('name', help='Named query (see sql_templates.py list)')
+    parser.add_argument('--start-date', help='First day, YYYY-MM-DD (inclusive)')
+    parser.add_argument('--end-date', help='Last day, YYYY-MM-DD (exclusive)')
+    parser.add_argument('--shard-months', type=int, default=DEFAULT_SHARD_MONTHS, help='Months per shard')
+    parser.add_argument('--workers', type=int, default=DEFAULT_MAX_WORKERS, help='Shards running at once')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help='Retries per failed shard')
+    parser.add_argument('--no-cache', action='store_true', help='Do not cache shard results')
+    parser.add_argument('--output', help='Write the merged result to this CSV file')
+    args = parser.parse_args(argv)
+
+    import anomaly_checks
+    monitor = anomaly_checks.AnomalyMonitor(args.name)
+    try:
+        df = run_sharded_preset(args.name, start_date=args.start_date, end_date=args.end_date,
+                                shard_months=args.shard_months, max_workers=args.workers,
+                                retries=args.retries, use_cache=not args.no_cache, monitor=monitor)
+    except (TemplateError, RuntimeError) as e:
+        print(f"❌ {e}")
+        return 1
+    anomaly_checks.report(monitor)
+
+    df.columns = df.columns.str.lower()
+    if args.output:
+        df.to_csv(args.output, index=False)
+        print(f"💾 Results saved to: {args.output}")
+    print(df.tail(7).to_string(index=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
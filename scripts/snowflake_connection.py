@@ -3,9 +3,21 @@ Snowflake Connection Script
 Connects to Snowflake using browser-based authentication
 """
 
-import snowflake.connector
-import pandas as pd
-from typing import Optional
+import itertools
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import query_cache
+import query_metrics
+from connection_pool import (ConnectionPool, DEFAULT_POOL_SIZE, DEFAULT_IDLE_CHECK_SECONDS,
+                             DEFAULT_STATEMENT_TIMEOUT_SECONDS)
+from typing import Iterator, Optional
+
+# snowflake.connector (~1.5s) and pandas are imported on first use, so --help, local
+# runs and cached results don't wait for them
 
 # Connection parameters
 SNOWFLAKE_CONFIG = {
@@ -15,120 +27,639 @@ SNOWFLAKE_CONFIG = {
     'role': 'SNF-CP-DATASCIENCE',
     'warehouse': 'TEAM_CP_DATASCIENCE',
     'database': 'CP_BI_DERIVED',
-    'schema': 'DATAPIPELINE'
+    'schema': 'DATAPIPELINE',
+    # Cache the SSO token so extra connections (parallel runs) don't reopen the browser
+    'client_store_temporary_credential': True,
+    # Server-side binding with ? placeholders, as rendered by sql_templates.py
+    'paramstyle': 'qmark',
+    # Set at login, so new sessions need no ALTER SESSION round-trip
+    'session_parameters': {'STATEMENT_TIMEOUT_IN_SECONDS': DEFAULT_STATEMENT_TIMEOUT_SECONDS}
 }
 
-# Global connection cache to reuse connections
-_cached_connection = None
+# Pooled connections shared by execute_query, execute_query_batches and
+# execute_queries_parallel. SNOWFLAKE_POOL_SIZE overrides the size.
+POOL_SIZE = int(os.environ.get('SNOWFLAKE_POOL_SIZE', DEFAULT_POOL_SIZE))
 
+# Where queries run: the warehouse, or the local DuckDB extract (local_backend.py).
+# QUERY_BACKEND sets the default; use_backend() switches at runtime.
+BACKENDS = ('snowflake', 'local')
+_backend = os.environ.get('QUERY_BACKEND', 'snowflake')
 
-def get_connection(reuse=True):
+# Fetch modes for streamed results: Arrow tables, typed DataFrames built from Arrow,
+# or DataFrames built from fetchmany() row tuples (works with any DB-API cursor)
+FETCH_MODES = ('arrow', 'pandas', 'rows')
+DEFAULT_BATCH_SIZE = 100_000
+
+# DB-API (PEP 249) error classes that fail the same way on every attempt: bad SQL,
+# bad data, unsupported features
+PERMANENT_ERRORS = ('ProgrammingError', 'DataError', 'IntegrityError', 'NotSupportedError')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _open_connection():
     """
-    Create and return a Snowflake connection
-    
-    Args:
-        reuse: If True, reuses existing connection if available. If False, creates new connection.
+    Open a new authenticated Snowflake connection
+
+    The default statement timeout comes from SNOWFLAKE_CONFIG['session_parameters'].
     """
-    global _cached_connection
-    
-    # Check if we can reuse existing connection
-    if reuse and _cached_connection is not None:
-        try:
-            # Test if connection is still valid with timeout
-            cursor = _cached_connection.cursor()
-            cursor.execute("ALTER SESSION SET STATEMENT_TIMEOUT_IN_SECONDS = 10")
-            cursor.execute("SELECT 1").fetchone()
-            cursor.close()
-            return _cached_connection
-        except Exception as e:
-            # Connection is dead or stuck, close it and create new one
-            print(f"⚠️ Existing connection issue detected: {e}")
-            print("   Closing old connection and creating new one...")
-            try:
-                _cached_connection.close()
-            except:
-                pass
-            _cached_connection = None
-    
     print("Connecting to Snowflake...")
     print("A browser window will open for authentication.")
     
+    import snowflake.connector
     conn = snowflake.connector.connect(**SNOWFLAKE_CONFIG)
     print("✓ Successfully connected to Snowflake!")
+    return conn
+
+
+class _NotRaised(Exception):
+    """Stands in for a connector error class while the connector isn't loaded"""
+
+
+def _connector_error(name):
+    """Snowflake connector error class, without importing the connector for an isinstance check"""
+    errors = sys.modules.get('snowflake.connector.errors')
+    return getattr(errors, name) if errors is not None else _NotRaised
+
+
+def _backend_connect():
+    """Connection factory of the current backend"""
+    if _backend == 'local':
+        import local_backend
+        return local_backend.connect
+    return _open_connection
+
+
+def _cache_key(query, params):
+    """Result cache key; local results are keyed apart from warehouse results"""
+    return query_cache.cache_key(query, params, backend=None if _backend == 'snowflake' else _backend)
+
+
+def get_backend():
+    """Return the name of the backend queries currently run on"""
+    return _backend
+
+
+def use_backend(name: str):
+    """
+    Switch every query helper in this module to a backend
     
-    # Set default timeout to prevent hanging queries
-    try:
-        cursor = conn.cursor()
-        cursor.execute("ALTER SESSION SET STATEMENT_TIMEOUT_IN_SECONDS = 3600")  # 1 hour default
-        cursor.close()
-    except:
-        pass
+    Args:
+        name: 'snowflake' (the warehouse) or 'local' (the DuckDB extract, see local_backend.py)
+    
+    Returns:
+        The new shared ConnectionPool
+    """
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"backend must be one of {BACKENDS}, got {name!r}")
+    _backend = name
+    return configure_pool()
+
+
+def configure_pool(max_size: Optional[int] = None, idle_check_seconds: Optional[float] = None, connect=None):
+    """
+    Replace the shared connection pool
+
+    Idle connections of the current pool are closed.
+    
+    Args:
+        max_size: Maximum open connections (default: POOL_SIZE)
+        idle_check_seconds: Idle time after which a connection is pinged before reuse
+        connect: Connection factory (default: the current backend's, Snowflake SSO unless
+            use_backend('local')); pass FakeConnector().connect to run without a warehouse
     
-    if reuse:
-        _cached_connection = conn
+    Returns:
+        The new ConnectionPool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(connect or _backend_connect(), max_size=max_size or POOL_SIZE,
+                               idle_check_seconds=(DEFAULT_IDLE_CHECK_SECONDS if idle_check_seconds is None
+                                                   else idle_check_seconds))
+        return _pool
+
+
+def get_pool():
+    """Return the shared connection pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ConnectionPool(_backend_connect(), max_size=POOL_SIZE)
+        return _pool
+
+
+def get_connection(reuse=True):
+    """
+    Create and return a Snowflake connection
     
+    Args:
+        reuse: If True, returns a connection from the shared pool (it stays in the pool, so
+            don't close it; for concurrent use check connections out with
+            get_pool().connection()). If False, creates a new connection.
+    """
+    if not reuse:
+        return _backend_connect()()
+    pool = get_pool()
+    conn = pool.acquire()
+    pool.release(conn)
     return conn
 
 
-def execute_query(query: str, fetch_data: bool = True, reuse_connection: bool = True, timeout_seconds: int = 3600):
+def _set_statement_timeout(conn, cursor, timeout_seconds, pool=None):
+    """ALTER SESSION only when the session doesn't already have this timeout"""
+    if pool is not None:
+        pool.set_statement_timeout(conn, cursor, timeout_seconds)
+    elif timeout_seconds != DEFAULT_STATEMENT_TIMEOUT_SECONDS:
+        # Unpooled connections start with the default from session_parameters
+        cursor.execute(f"ALTER SESSION SET STATEMENT_TIMEOUT_IN_SECONDS = {timeout_seconds}")
+
+
+def _acquire(pool, record):
+    """Check out a pooled connection (or open one), recording wait / connect / liveness time"""
+    if pool is None:
+        with record.phase('connect'):
+            conn = _backend_connect()()
+        record.connection = 'opened'
+        return conn
+    conn = pool.acquire()
+    record.add_acquire(pool.last_acquire())
+    return conn
+
+
+def _run_query(conn, query: str, fetch_data: bool = True, timeout_seconds: int = 3600, params=None, pool=None,
+               record=None):
+    """
+    Run a single query on an already-open connection
+    
+    Args:
+        conn: Open DB-API connection
+        query: SQL query string
+        fetch_data: If True, returns results as a DataFrame
+        timeout_seconds: Query timeout in seconds
+        params: Optional bind parameters passed to cursor.execute
+        pool: ConnectionPool the connection came from, which knows its session timeout
+        record: query_metrics.QueryRecord collecting phase timings, query ID, rows and bytes
+    
+    Returns:
+        pandas DataFrame with query results (if fetch_data=True), otherwise None
+    """
+    cursor = conn.cursor()
+    try:
+        with query_metrics.phase(record, 'alter_session'):
+            _set_statement_timeout(conn, cursor, timeout_seconds, pool)
+        with query_metrics.phase(record, 'execute'):
+            if params is None:
+                cursor.execute(query)
+            else:
+                cursor.execute(query, params)
+        if record is not None:
+            record.set_cursor(cursor)
+        
+        if fetch_data:
+            import result_types
+            # Fetch results and build a DataFrame typed from cursor.description
+            with query_metrics.phase(record, 'fetch'):
+                columns = [col[0] for col in cursor.description]
+                data = cursor.fetchall()
+            with query_metrics.phase(record, 'dataframe'):
+                df = result_types.typed_frame(data, cursor.description)
+            if record is not None:
+                record.set_result(df, untyped_bytes=result_types.untyped_bytes(data, columns))
+            return df
+        return None
+    finally:
+        cursor.close()
+
+
+def _is_timeout_error(error):
+    """Return True if the exception looks like a statement timeout"""
+    message = str(error).lower()
+    return "timeout" in message or "timed out" in message
+
+
+def _should_discard(error):
+    """
+    Return True if a connection must not be reused after this error
+
+    SQL errors (ProgrammingError) leave the session healthy; timeouts and anything
+    else (network, driver) leave it in an unknown state.
+    """
+    return _is_timeout_error(error) or not isinstance(error, _connector_error('ProgrammingError'))
+
+
+def is_transient_error(error):
+    """
+    Return True if a failed query is worth retrying on a fresh connection
+
+    Network, HTTP, login and driver errors and dropped sessions are. SQL errors, bad data
+    and statement timeouts fail the same way again, as do errors raised by our own code
+    (ValueError, KeyError, ...). DB-API errors are matched on their class names
+    (PERMANENT_ERRORS), so Snowflake and DuckDB errors are classified alike without
+    importing either driver.
+    """
+    if {cls.__name__ for cls in type(error).__mro__} & set(PERMANENT_ERRORS):
+        return False
+    if _is_timeout_error(error) and 'statement' in str(error).lower():
+        return False
+    return not isinstance(error, (ValueError, KeyError, TypeError, AttributeError, NotImplementedError))
+
+
+def execute_query(query: str, fetch_data: bool = True, reuse_connection: bool = True, timeout_seconds: int = 3600,
+                  params=None, use_cache: bool = False, refresh_cache: bool = False,
+                  cache_ttl_seconds: Optional[int] = query_cache.DEFAULT_TTL_SECONDS):
     """
     Execute a SQL query and return results as a pandas DataFrame
     
     Args:
         query: SQL query string
         fetch_data: If True, returns results. If False, just executes (for INSERT/UPDATE/etc)
-        reuse_connection: If True, reuses existing connection to avoid repeated authentication
+        reuse_connection: If True, runs on a pooled connection to avoid repeated authentication
         timeout_seconds: Query timeout in seconds (default 3600 = 1 hour)
+        params: Optional bind parameters passed to cursor.execute
+        use_cache: If True, return a cached result for the same query text and params when
+            one exists, and cache fresh results (see query_cache.py)
+        refresh_cache: If True (with use_cache), ignore any cached result and overwrite it
+        cache_ttl_seconds: Maximum age of a cached result in seconds (None = never expires)
     
     Returns:
         pandas DataFrame with query results (if fetch_data=True)
     """
-    conn = get_connection(reuse=reuse_connection)
+    record = query_metrics.QueryRecord('query', query=query, params=params, backend=_backend)
+    use_cache = use_cache and fetch_data
+    if use_cache:
+        key = _cache_key(query, params)
+        if not refresh_cache:
+            with record.phase('cache_lookup'):
+                df = query_cache.get(key, ttl_seconds=cache_ttl_seconds)
+            if df is not None:
+                record.set_result(df)
+                record.finish('cached')
+                print(f"✓ Loaded {len(df)} rows from cache (no warehouse query).")
+                return df
     
-    cursor = conn.cursor()
+    pool = get_pool() if reuse_connection else None
     try:
-        # Set query-specific timeout
-        cursor.execute(f"ALTER SESSION SET STATEMENT_TIMEOUT_IN_SECONDS = {timeout_seconds}")
-        cursor.execute(query)
-        
+        conn = _acquire(pool, record)
+    except Exception as e:
+        record.finish('error', e)
+        raise
+    discard = False
+    
+    try:
+        df = _run_query(conn, query, fetch_data=fetch_data, timeout_seconds=timeout_seconds, params=params,
+                        pool=pool, record=record)
+        finished = record.finish()
+        query_id = f" (query ID {record.query_id})" if record.query_id else ""
         if fetch_data:
-            # Fetch results and convert to DataFrame
-            columns = [col[0] for col in cursor.description]
-            data = cursor.fetchall()
-            df = pd.DataFrame(data, columns=columns)
-            print(f"✓ Query executed successfully! Retrieved {len(df)} rows.")
-            return df
+            print(f"✓ Query executed successfully! Retrieved {len(df)} rows in "
+                  f"{finished['total_seconds']:.1f}s{query_id}.")
+            _print_saving(record)
+            if use_cache:
+                query_cache.put(key, df, query=query, params=params)
         else:
-            print("✓ Query executed successfully!")
-            return None
+            print(f"✓ Query executed successfully in {finished['total_seconds']:.1f}s{query_id}!")
+        return df
             
     except Exception as e:
-        # If query fails, close connection to prevent reuse of stuck connection
-        if "timeout" in str(e).lower() or "timed out" in str(e).lower():
+        # Don't hand a stuck or broken connection to the next query
+        discard = _should_discard(e)
+        record.finish('timeout' if _is_timeout_error(e) else 'error', e)
+        if _is_timeout_error(e):
+            print(f"⚠️ Query timed out after {timeout_seconds} seconds")
+        raise
+    finally:
+        if pool:
+            pool.release(conn, discard=discard)
+        else:
+            conn.close()
+
+
+def _print_saving(record):
+    """Print the memory typed columns saved, for results big enough to matter"""
+    import result_types
+    if record.untyped_bytes and record.untyped_bytes >= result_types.REPORT_MIN_BYTES:
+        print(f"  🗜️ Typed columns: {result_types.saving(record.untyped_bytes, record.bytes)}")
+
+
+def _iter_cursor_batches(cursor, fetch_mode: str = 'pandas', batch_size: int = DEFAULT_BATCH_SIZE,
+                         record=None):
+    """
+    Yield the result set of an executed cursor batch by batch
+    
+    Arrow and pandas batches follow the warehouse's result chunks and carry typed columns.
+    If the result set isn't available as Arrow (or the cursor doesn't support it), falls
+    back to fetchmany() with batch_size rows per batch. DataFrame batches get the compact
+    dtypes of result_types.py; record, if given, takes each batch's rows and typed and
+    untyped bytes.
+    """
+    if fetch_mode not in FETCH_MODES:
+        raise ValueError(f"fetch_mode must be one of {FETCH_MODES}, got {fetch_mode!r}")
+    
+    if fetch_mode != 'rows':
+        # Only fetching the first batch decides between Arrow and row fetches; an error
+        # while streaming the rest is a real failure and propagates
+        batches = first = None
+        try:
+            if fetch_mode == 'arrow':
+                batches = iter(cursor.fetch_arrow_batches())
+            else:
+                batches = iter(cursor.fetch_pandas_batches())
+            first = next(batches, None)
+        except (AttributeError, _connector_error('NotSupportedError')):
+            # Stand-in cursors and non-Arrow result formats only support row fetches
+            batches = None
+        if batches is not None:
+            if first is None:
+                return
+            import result_types
+            for batch in itertools.chain([first], batches):
+                untyped = None
+                if fetch_mode == 'pandas':
+                    untyped = result_types.memory_bytes(batch)
+                    batch = result_types.compact(batch, cursor.description)
+                if record is not None:
+                    record.set_result(batch, untyped_bytes=untyped)
+                yield batch
+            return
+    
+    import result_types
+    columns = [col[0] for col in cursor.description]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        if fetch_mode == 'arrow':
+            import pandas as pd
+            import pyarrow as pa
+            batch = pa.Table.from_pandas(pd.DataFrame(rows, columns=columns), preserve_index=False)
+            untyped = None
+        else:
+            batch = result_types.typed_frame(rows, cursor.description)
+            untyped = result_types.untyped_bytes(rows, columns)
+        if record is not None:
+            record.set_result(batch, untyped_bytes=untyped)
+        yield batch
+
+
+def execute_query_batches(query: str, fetch_mode: str = 'pandas', batch_size: int = DEFAULT_BATCH_SIZE,
+                          reuse_connection: bool = True, timeout_seconds: int = 3600,
+                          params=None) -> Iterator:
+    """
+    Execute a SQL query and stream the results in batches instead of one big DataFrame
+    
+    Peak memory scales with the batch size rather than the result size, and Arrow-backed
+    batches keep typed columns instead of converting every value to a Python object.
+    
+    Args:
+        query: SQL query string
+        fetch_mode: 'arrow' (pyarrow Tables), 'pandas' (DataFrames built from Arrow) or
+            'rows' (DataFrames built from fetchmany row tuples)
+        batch_size: Rows per batch for 'rows' mode and the fallback path
+        reuse_connection: If True, runs on a pooled connection to avoid repeated authentication
+        timeout_seconds: Query timeout in seconds (default 3600 = 1 hour)
+        params: Optional bind parameters passed to cursor.execute
+    
+    Yields:
+        pyarrow Tables (fetch_mode='arrow') or pandas DataFrames
+    """
+    record = query_metrics.QueryRecord('batches', query=query, params=params, backend=_backend)
+    pool = get_pool() if reuse_connection else None
+    try:
+        conn = _acquire(pool, record)
+    except Exception as e:
+        record.finish('error', e)
+        raise
+    discard = False
+    cursor = conn.cursor()
+    total_rows = 0
+    try:
+        with record.phase('alter_session'):
+            _set_statement_timeout(conn, cursor, timeout_seconds, pool)
+        with record.phase('execute'):
+            if params is None:
+                cursor.execute(query)
+            else:
+                cursor.execute(query, params)
+        record.set_cursor(cursor)
+        batches = _iter_cursor_batches(cursor, fetch_mode=fetch_mode, batch_size=batch_size, record=record)
+        while True:
+            # Only time spent pulling batches counts as fetch, not the caller's processing
+            with record.phase('fetch'):
+                batch = next(batches, None)
+            if batch is None:
+                break
+            total_rows += batch.num_rows if fetch_mode == 'arrow' else len(batch)
+            yield batch
+        finished = record.finish()
+        print(f"✓ Query executed successfully! Streamed {total_rows} rows in {finished['total_seconds']:.1f}s.")
+        _print_saving(record)
+    except GeneratorExit:
+        # The caller stopped early; the session is still usable
+        record.finish('abandoned')
+        raise
+    except Exception as e:
+        discard = _should_discard(e)
+        record.finish('timeout' if _is_timeout_error(e) else 'error', e)
+        if _is_timeout_error(e):
             print(f"⚠️ Query timed out after {timeout_seconds} seconds")
-            if reuse_connection and _cached_connection is not None:
-                try:
-                    _cached_connection.close()
-                except:
-                    pass
-                _cached_connection = None
         raise
     finally:
         cursor.close()
-        # Don't close connection if we're reusing it
-        if not reuse_connection:
+        if pool:
+            pool.release(conn, discard=discard)
+        else:
             conn.close()
 
 
+def execute_query_to_files(query: str, output_dir: str, file_format: str = 'parquet',
+                           fetch_mode: str = 'arrow', batch_size: int = DEFAULT_BATCH_SIZE,
+                           reuse_connection: bool = True, timeout_seconds: int = 3600, params=None):
+    """
+    Execute a SQL query and write each result batch straight to disk
+    
+    Only one batch is held in memory at a time. Files are named part-00000.<ext>,
+    part-00001.<ext>, ... in output_dir; part files left there by an earlier run are
+    removed first.
+    
+    Args:
+        query: SQL query string
+        output_dir: Directory for the part files (created if missing)
+        file_format: 'parquet' (requires pyarrow) or 'csv'
+        fetch_mode: See execute_query_batches
+        batch_size: Rows per batch for 'rows' mode and the fallback path
+        reuse_connection: If True, runs on a pooled connection to avoid repeated authentication
+        timeout_seconds: Query timeout in seconds (default 3600 = 1 hour)
+        params: Optional bind parameters passed to cursor.execute
+    
+    Returns:
+        Tuple (paths, total_rows)
+    """
+    if file_format not in ('parquet', 'csv'):
+        raise ValueError(f"file_format must be 'parquet' or 'csv', got {file_format!r}")
+    if file_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    
+    os.makedirs(output_dir, exist_ok=True)
+    # Part files of an earlier (larger) result would otherwise be read back with this one
+    for name in os.listdir(output_dir):
+        if name.startswith('part-') and name.endswith(f".{file_format}"):
+            os.remove(os.path.join(output_dir, name))
+    paths = []
+    total_rows = 0
+    batches = execute_query_batches(query, fetch_mode=fetch_mode, batch_size=batch_size,
+                                    reuse_connection=reuse_connection, timeout_seconds=timeout_seconds,
+                                    params=params)
+    for i, batch in enumerate(batches):
+        path = os.path.join(output_dir, f"part-{i:05d}.{file_format}")
+        if file_format == 'parquet':
+            table = batch if fetch_mode == 'arrow' else pa.Table.from_pandas(batch, preserve_index=False)
+            pq.write_table(table, path)
+            total_rows += table.num_rows
+        else:
+            df = batch.to_pandas() if fetch_mode == 'arrow' else batch
+            df.to_csv(path, index=False)
+            total_rows += len(df)
+        paths.append(path)
+    
+    print(f"💾 Wrote {total_rows} rows to {len(paths)} {file_format} file(s) in {output_dir}")
+    return paths, total_rows
+
+
+def execute_queries_parallel(queries: dict, max_workers: Optional[int] = None, timeout_seconds: int = 3600,
+                             connect=None, use_cache: bool = False, refresh_cache: bool = False,
+                             cache_ttl_seconds: Optional[int] = query_cache.DEFAULT_TTL_SECONDS,
+                             params: Optional[dict] = None):
+    """
+    Execute independent queries at the same time, each on its own connection
+    
+    Wall-clock time drops to roughly the slowest query instead of the sum of all of them.
+    A failing query is reported and isolated; it never cancels the others.
+    
+    Args:
+        queries: Dict of query name -> SQL string
+        max_workers: Number of queries in flight at once (default: one per query, up to
+            the shared pool's size)
+        timeout_seconds: Per-query timeout in seconds
+        connect: Callable returning a new DB-API connection. By default queries run on the
+            shared pool; with connect, on a private pool that is closed afterwards (pass a
+            stand-in such as FakeConnector().connect to run without a warehouse).
+        use_cache: If True, serve cached results and only execute the misses
+        refresh_cache: If True (with use_cache), re-execute everything and overwrite the cache
+        cache_ttl_seconds: Maximum age of a cached result in seconds (None = never expires)
+        params: Optional dict of query name -> bind values for that query's ? placeholders
+    
+    Returns:
+        Tuple (results, errors): dict of query name -> DataFrame for successful queries and
+        dict of query name -> exception for failed ones
+    """
+    params = params or {}
+    
+    results = {}
+    errors = {}
+    cache_keys = {}
+    # Worker threads don't see this thread's query_metrics.context(), so pass it on
+    metrics_context = query_metrics.current_context()
+    if use_cache:
+        pending = {}
+        for query_name, query in queries.items():
+            cache_keys[query_name] = _cache_key(query, params.get(query_name))
+            if refresh_cache:
+                df = None
+            else:
+                record = query_metrics.QueryRecord('query', name=query_name, query=query,
+                                                   params=params.get(query_name), backend=_backend,
+                                                   context=metrics_context)
+                with record.phase('cache_lookup'):
+                    df = query_cache.get(cache_keys[query_name], ttl_seconds=cache_ttl_seconds)
+                if df is not None:
+                    record.set_result(df)
+                    record.finish('cached')
+            if df is not None:
+                print(f"✓ [{query_name}] loaded {len(df)} rows from cache")
+                results[query_name] = df
+            else:
+                pending[query_name] = query
+        queries = pending
+    if not queries:
+        return results, errors
+    if connect is None:
+        pool = get_pool()
+        max_workers = max_workers or min(len(queries), pool.max_size)
+    else:
+        max_workers = max_workers or len(queries)
+        pool = ConnectionPool(connect, max_size=max_workers)
+    
+    def run(query_name, query):
+        record = query_metrics.QueryRecord('query', name=query_name, query=query, params=params.get(query_name),
+                                           backend=_backend, context=metrics_context)
+        try:
+            conn = _acquire(pool, record)
+        except Exception as e:
+            record.finish('error', e)
+            raise
+        discard = False
+        started = time.perf_counter()
+        print(f"⏳ [{query_name}] started")
+        try:
+            df = _run_query(conn, query, fetch_data=True, timeout_seconds=timeout_seconds,
+                            params=params.get(query_name), pool=pool, record=record)
+        except Exception as e:
+            # Don't hand a possibly stuck connection to the next query
+            discard = _should_discard(e)
+            record.finish('timeout' if _is_timeout_error(e) else 'error', e)
+            if _is_timeout_error(e):
+                print(f"⚠️ [{query_name}] timed out after {timeout_seconds} seconds")
+            raise
+        finally:
+            pool.release(conn, discard=discard)
+        record.finish()
+        print(f"✓ [{query_name}] retrieved {len(df)} rows in {time.perf_counter() - started:.1f}s")
+        if query_name in cache_keys:
+            query_cache.put(cache_keys[query_name], df, query=query, params=params.get(query_name))
+        return df
+    
+    started = time.perf_counter()
+    try:
+        # Open (or check) one connection up front so that SSO authentication happens once,
+        # before the workers start opening their own
+        warmup = query_metrics.QueryRecord('connect', name='pool warm-up', backend=_backend, context=metrics_context)
+        pool.release(_acquire(pool, warmup))
+        if warmup.connection == 'opened':
+            warmup.finish()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run, name, query): name for name, query in queries.items()}
+            for future in as_completed(futures):
+                query_name = futures[future]
+                try:
+                    results[query_name] = future.result()
+                except Exception as e:
+                    print(f"❌ [{query_name}] failed: {e}")
+                    errors[query_name] = e
+    finally:
+        if connect is not None:
+            pool.close()
+    
+    print(f"✓ {len(queries) - len(errors)}/{len(queries)} queries succeeded in {time.perf_counter() - started:.1f}s")
+    return results, errors
+
+
 def close_connection():
     """
-    Manually close the cached connection
+    Manually close the pooled connections
     """
-    global _cached_connection
-    if _cached_connection is not None:
-        _cached_connection.close()
-        _cached_connection = None
-        print("✓ Connection closed.")
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        had_connections = pool.size > 0
+        pool.close()
+        if had_connections:
+            print("✓ Connection closed.")
 
 
 def test_connection():
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Query templating over the sql/ directory
+
+The SQL files are templates: date windows and the tenure threshold are bind parameters
+($start_date, $end_date, $tenure_days) and the per-segment columns are written once and
+expanded for each requested segment. Callers ask for exactly the window and segments they
+need instead of keeping a copy of the SQL per date range.
+
+Template syntax (directives are SQL comments, so templates stay readable):
+    $name                        bind parameter, rendered as a ? placeholder
+    -- @each segment ... -- @end repeat the enclosed lines per segment, substituting
+                                 {segment}, {label} and {predicate}; the trailing comma
+                                 of the last repetition is dropped
+    -- @if tenure ... -- @endif  keep the enclosed lines only if a tenure segment is requested
+
+Usage:
+    python sql_templates.py list
+    python sql_templates.py render soft_churn_r7 --start-date 2025-10-01 --end-date 2025-12-01
+    python sql_templates.py render spot_allocation_monthly --segments all_fitness,sa_fitness
+"""
+import sys
+import os
+import re
+import argparse
+from datetime import date, datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+SQL_DIR = os.path.join(PROJECT_ROOT, 'sql')
+
+# Long vs short tenure threshold (>24 months)
+DEFAULT_TENURE_DAYS = 730
+
+# Segment name -> (label, predicate). Predicates use the unqualified account_classification
+# and days_tenure columns that every template exposes.
+SEGMENTS = {
+    'all_fitness': ('All Fitness', 'true'),
+    'sa_fitness': ('SA Fitness', "account_classification = 'SA'"),
+    'nonsa_fitness': ('Non-SA Fitness', "(account_classification != 'SA' OR account_classification IS NULL)"),
+    'long_tenure_gt24mo': ('Long Tenure (>24mo)', 'days_tenure > $tenure_days'),
+    'short_tenure_le24mo': ('Short Tenure (<=24mo)', 'days_tenure <= $tenure_days'),
+}
+
+CLASSIFICATION_SEGMENTS = ['all_fitness', 'sa_fitness', 'nonsa_fitness']
+TENURE_SEGMENTS = ['all_fitness', 'long_tenure_gt24mo', 'short_tenure_le24mo']
+
+# Named queries: template plus the segments and window each chart uses. The
+# *_original presets replace the 00_*_original.sql and *_oct_nov_original.sql copies.
+PRESETS = {
+    # Charts 1-3: monthly by tenure
+    'spot_allocation_monthly': {
+        'template': '01_spot_allocation_monthly.sql', 'segments': TENURE_SEGMENTS,
+        'start_date': '2024-12-01', 'end_date': '2025-12-01',
+    },
+    'disabled_schedules_monthly': {
+        'template': '02_disabled_schedules_monthly.sql', 'segments': TENURE_SEGMENTS,
+        'start_date': '2024-12-01', 'end_date': '2025-12-01',
+    },
+    'soft_churn_monthly': {
+        'template': '03_soft_churn_monthly.sql', 'segments': TENURE_SEGMENTS,
+        'start_date': '2024-11-01', 'end_date': '2025-12-01',
+    },
+    # Original validated monthly baselines (All Fitness, SA Fitness, Non-SA Fitness)
+    'spot_allocation_monthly_original': {
+        'template': '01_spot_allocation_monthly.sql', 'segments': CLASSIFICATION_SEGMENTS,
+        'start_date': '2024-12-01', 'end_date': '2025-12-01',
+    },
+    'disabled_schedules_monthly_original': {
+        'template': '02_disabled_schedules_monthly.sql', 'segments': CLASSIFICATION_SEGMENTS,
+        'start_date': '2024-12-01', 'end_date': '2025-12-01',
+    },
+    'soft_churn_monthly_original': {
+        'template': '03_soft_churn_monthly.sql', 'segments': CLASSIFICATION_SEGMENTS,
+        'start_date': '2024-11-01', 'end_date': '2025-12-01',
+    },
+    # Charts 4-6: rolling 7-day
+    'spot_allocation_r7': {
+        'template': '04_spot_allocation_r7_rolling_7day.sql', 'segments': CLASSIFICATION_SEGMENTS,
+        'start_date': '2024-10-01', 'end_date': '2025-12-01',
+    },
+    'disabled_schedules_r7': {
+        'template': '05_disabled_schedules_r7_rolling_7day.sql', 'segments': CLASSIFICATION_SEGMENTS,
+        'start_date': '2024-10-01', 'end_date': '2025-12-01',
+    },
+    'soft_churn_r7': {
+        'template': '06_soft_churn_r7_rolling_7day.sql', 'segments': CLASSIFICATION_SEGMENTS,
+        'start_date': '2023-01-01', 'end_date': '2025-12-01',
+    },
+    'soft_churn_r7_oct_nov_original': {
+        'template': '06_soft_churn_r7_rolling_7day.sql', 'segments': CLASSIFICATION_SEGMENTS,
+        'start_date': '2024-10-01', 'end_date': '2025-12-01',
+    },
+}
+
+_DIRECTIVE = re.compile(r'^\s*--\s*@(\w+)\s*(\w*)\s*$')
+_PARAM = re.compile(r'\$([A-Za-z_]\w*)')
+# Single-quoted string literals (with '' escapes) or -- line comments
+_LITERAL_OR_COMMENT = re.compile(r"('(?:[^']|'')*')|(--[^\n]*)")
+
+
+class TemplateError(ValueError):
+    """Raised for malformed templates, unknown segments or missing parameters"""
+
+
+def _find_block_end(lines, start, open_kind, close_kind):
+    """Return the index of the directive closing the block opened at lines[start]"""
+    depth = 0
+    for i in range(start, len(lines)):
+        match = _DIRECTIVE.match(lines[i])
+        if not match:
+            continue
+        if match.group(1) == open_kind:
+            depth += 1
+        elif match.group(1) == close_kind:
+            depth -= 1
+            if depth == 0:
+                return i
+    raise TemplateError(f"-- @{open_kind} on line {start + 1} has no matching -- @{close_kind}")
+
+
+def _drop_trailing_comma(lines):
+    """Remove the trailing comma from the last SQL (non-comment) line"""
+    for i in range(len(lines) - 1, -1, -1):
+        stripped = lines[i].rstrip()
+        if not stripped or stripped.lstrip().startswith('--'):
+            continue
+        if stripped.endswith(','):
+            lines[i] = stripped[:-1]
+        break
+    return lines
+
+
+def _expand(lines, segments, flags):
+    """Expand @each / @if directives"""
+    out = []
+    i = 0
+    while i < len(lines):
+        match = _DIRECTIVE.match(lines[i])
+        if not match:
+            out.append(lines[i])
+            i += 1
+            continue
+
+        kind, arg = match.groups()
+        if kind == 'if':
+            end = _find_block_end(lines, i, 'if', 'endif')
+            if flags.get(arg, False):
+                out.extend(_expand(lines[i + 1:end], segments, flags))
+        elif kind == 'each':
+            if arg != 'segment':
+                raise TemplateError(f"Unsupported loop '-- @each {arg}' on line {i + 1}")
+            end = _find_block_end(lines, i, 'each', 'end')
+            body = _expand(lines[i + 1:end], segments, flags)
+            repeated = []
+            for name, (label, predicate) in segments.items():
+                repeated.extend(line.replace('{segment}', name)
+                                    .replace('{label}', label)
+                                    .replace('{predicate}', predicate)
+                                for line in body)
+            out.extend(_drop_trailing_comma(repeated))
+        else:
+            raise TemplateError(f"Unknown directive '-- @{kind}' on line {i + 1}")
+        i = end + 1
+    return out
+
+
+def _quote(value):
+    """Render a parameter value as a SQL literal (for --inline output)"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _bind(sql, params, inline=False):
+    """
+    Replace $name parameters outside literals and comments
+
+    Returns (sql, values): ? placeholders plus the values in placeholder order, or the
+    SQL with literal values when inline=True.
+    """
+    values = []
+
+    def substitute(match):
+        name = match.group(1)
+        if name not in params:
+            raise TemplateError(f"Missing value for template parameter ${name}")
+        if inline:
+            return _quote(params[name])
+        values.append(params[name])
+        return '?'
+
+    parts = []
+    last = 0
+    for match in _LITERAL_OR_COMMENT.finditer(sql):
+        parts.append(_PARAM.sub(substitute, sql[last:match.start()]))
+        parts.append(match.group(0))
+        last = match.end()
+    parts.append(_PARAM.sub(substitute, sql[last:]))
+    return ''.join(parts), values
+
+
+def _resolve_segments(segments):
+    """Turn a list of segment names (or a name -> (label, predicate) dict) into a dict"""
+    if isinstance(segments, dict):
+        return dict(segments)
+    unknown = [name for name in segments if name not in SEGMENTS]
+    if unknown:
+        raise TemplateError(f"Unknown segment(s) {unknown}; known: {list(SEGMENTS)}")
+    return {name: SEGMENTS[name] for name in segments}
+
+
+def to_date(value):
+    """Accept a date, datetime or YYYY-MM-DD string (a time after the date is ignored); None stays None"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def uses_tenure(segments):
+    """True if any of the segments (names or a name -> (label, predicate) dict) is a tenure segment"""
+    return any('days_tenure' in predicate for _, predicate in _resolve_segments(segments or []).values())
+
+
+def render(template, segments=None, inline=False, **params):
+    """
+    Render a template from sql/ into executable SQL
+
+    Args:
+        template: File name in sql/ (e.g. '06_soft_churn_r7_rolling_7day.sql')
+        segments: Segment names from SEGMENTS, or a dict of name -> (label, predicate) for
+            ad-hoc segments. Required if the template has an @each block.
+        inline: If True, substitute parameter values as literals (for pasting into a
+            worksheet) instead of ? placeholders
+        **params: Template parameters, e.g. start_date='2024-10-01'. tenure_days defaults
+            to DEFAULT_TENURE_DAYS; date objects are converted to ISO strings.
+
+    Returns:
+        Tuple (sql, values): values is the list of bind values for the ? placeholders
+        (empty when inline=True), for execute_query(sql, params=values)
+    """
+    with open(os.path.join(SQL_DIR, template), 'r') as f:
+        lines = f.read().split('\n')
+
+    resolved = _resolve_segments(segments or [])
+    if not resolved and any((_DIRECTIVE.match(line) or [None, None])[1] == 'each' for line in lines):
+        raise TemplateError(f"{template} needs at least one segment")
+    flags = {'tenure': uses_tenure(resolved)}
+
+    params = {name: value.isoformat() if isinstance(value, date) else value
+              for name, value in params.items() if value is not None}
+    params.setdefault('tenure_days', DEFAULT_TENURE_DAYS)
+
+    sql = '\n'.join(_expand(lines, resolved, flags))
+    return _bind(sql, params, inline=inline)
+
+
+def render_preset(name, inline=False, **overrides):
+    """
+    Render a named query from PRESETS, optionally overriding its window or segments
+
+    Args:
+        name: Key in PRESETS
+        inline: See render()
+        **overrides: start_date, end_date, tenure_days or segments to use instead of the preset's
+
+    Returns:
+        Tuple (sql, values), as render()
+    """
+    if name not in PRESETS:
+        raise TemplateError(f"Unknown query '{name}'; known: {list(PRESETS)}")
+    preset = dict(PRESETS[name])
+    preset.update({key: value for key, value in overrides.items() if value is not None})
+    template = preset.pop('template')
+    return render(template, inline=inline, **preset)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='List or render the sql/ query templates')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='List named queries and segments')
+    render_parser = subparsers.add_parser('render', help='Print a named query as runnable SQL')
+    render_parser.add_argument('name', help='Named query (see list)')
+    render_parser.add_argument('--start-date', help='First day, YYYY-MM-DD (inclusive)')
+    render_parser.add_argument('--end-date', help='Last day, YYYY-MM-DD (exclusive)')
+    render_parser.add_argument('--tenure-days', type=int, help='Tenure threshold in days')
+    render_parser.add_argument('--segments', help='Comma-separated segment names')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        print("Named queries:")
+        for name, preset in PRESETS.items():
+            print(f"  {name:<38} {preset['template']:<42} {preset['start_date']} to {preset['end_date']}")
+        print("\nSegments:")
+        for name, (label, predicate) in SEGMENTS.items():
+            print(f"  {name:<22} {label:<24} {predicate}")
+        return 0
+
+    try:
+        sql, _ = render_preset(args.name, inline=True, start_date=args.start_date, end_date=args.end_date,
+                               tenure_days=args.tenure_days,
+                               segments=args.segments.split(',') if args.segments else None)
+    except TemplateError as e:
+        print(f"❌ {e}")
+        return 1
+    print(sql)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generators for validating and benchmarking the metric pipeline
+
+Generates deterministic (seeded) stand-ins for warehouse extracts, so engines and
+queries can be checked without a Snowflake session.
+"""
+from datetime import date
+import numpy as np
+import pandas as pd
+
+# account_classification values seen in salesforce_venues (None = no Salesforce match)
+ACCOUNT_CLASSIFICATIONS = ['SA', 'Non-SA', None]
+
+
+def venue_day_rows(n_venues=500, start_date=date(2024, 10, 1), n_days=60, sa_share=0.4,
+                   presence_rate=0.6, active_rate=0.8, churn_rate=0.01, null_churn_rate=0.0,
+                   seed=0):
+    """
+    Generate venue-day soft churn rows at the r7_window_calc grain
+
+    Args:
+        n_venues: Number of distinct venues
+        start_date: First calendar day
+        n_days: Number of calendar days
+        sa_share: Share of venues classified as SA (the rest split Non-SA / unmatched)
+        presence_rate: Probability a venue has a row on a given day (leaves gaps, like real data)
+        active_rate: Probability a row passes the active venue filter
+        churn_rate: Probability a row has soft_churn = 1
+        null_churn_rate: Probability soft_churn is NULL
+        seed: Random seed
+
+    Returns:
+        DataFrame with columns date, venue_id, account_classification, soft_churn, is_active
+    """
+    rng = np.random.default_rng(seed)
+
+    venue_ids = np.arange(1, n_venues + 1) * 7 + 100_000
+    other_share = (1 - sa_share) / 2
+    classification = rng.choice(len(ACCOUNT_CLASSIFICATIONS), size=n_venues,
+                                p=[sa_share, other_share, other_share])
+
+    present = rng.random((n_days, n_venues)) < presence_rate
+    day_idx, venue_idx = np.nonzero(present)
+    n_rows = len(day_idx)
+
+    soft_churn = (rng.random(n_rows) < churn_rate).astype(float)
+    soft_churn[rng.random(n_rows) < null_churn_rate] = np.nan
+
+    dates = pd.Timestamp(start_date) + pd.to_timedelta(day_idx, unit='D')
+    return pd.DataFrame({
+        'date': dates,
+        'venue_id': venue_ids[venue_idx],
+        'account_classification': np.array(ACCOUNT_CLASSIFICATIONS, dtype=object)[classification[venue_idx]],
+        'soft_churn': soft_churn,
+        'is_active': (rng.random(n_rows) < active_rate).astype(int),
+    })
+
+
+def dimension_tables(n_venues=300, start_date=date(2024, 10, 1), sa_share=0.4, fitness_share=0.9, seed=0):
+    """
+    Generate partner_details, salesforce_venues and ineligible_classes
+
+    Args:
+        n_venues: Number of venues in partner_details
+        start_date: First calendar day of the facts; launch dates fall up to 10 years before it
+        sa_share: Share of venues classified as SA in salesforce_venues
+        fitness_share: Share of venues with venue_type 'Fitness'
+        seed: Random seed
+
+    Returns:
+        Dict of table name -> DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start_date)
+
+    venue_ids = np.arange(1, n_venues + 1) * 7 + 100_000
+    launch_days_before = rng.integers(30, 3650, size=n_venues)
+    launch_dates = (start - pd.to_timedelta(launch_days_before, unit='D')).to_numpy().astype('datetime64[D]')
+    partner_details = pd.DataFrame({
+        'venue_id': venue_ids,
+        'venue_type': np.where(rng.random(n_venues) < fitness_share, 'Fitness', 'Wellness'),
+        'estimated_launch_date': pd.Series(launch_dates).where(rng.random(n_venues) > 0.02).dt.date,
+    })
+
+    other_share = (1 - sa_share) / 2
+    classification = rng.choice(len(ACCOUNT_CLASSIFICATIONS), size=n_venues,
+                                p=[sa_share, other_share, other_share])
+    matched = classification != ACCOUNT_CLASSIFICATIONS.index(None)
+    salesforce_venues = pd.DataFrame({
+        'venue_id': venue_ids[matched],
+        'account_classification': np.array(ACCOUNT_CLASSIFICATIONS, dtype=object)[classification[matched]],
+    })
+
+    return {
+        'partner_details': partner_details,
+        'salesforce_venues': salesforce_venues,
+        'ineligible_classes': pd.DataFrame({'class_id': np.arange(1, 5_000, 97)}),
+    }
+
+
+def fact_tables(venue_ids, start_date=date(2024, 10, 1), n_days=60, schedules_per_venue_day=3.0,
+                presence_rate=0.6, disabled_rate=0.1, churn_rate=0.001, first_schedule_id=1, seed=0):
+    """
+    Generate sched_schedules and venue_adds_and_churns for a block of days
+
+    Long histories can be generated block by block (with a different seed and
+    first_schedule_id per block) so memory stays bounded by the block size.
+
+    Args:
+        venue_ids: partner_details venue ids
+        start_date: First calendar day of the block
+        n_days: Number of calendar days
+        schedules_per_venue_day: Mean schedules per venue per day (Poisson)
+        presence_rate: Probability a venue has a venue_adds_and_churns row on a given day
+        disabled_rate: Share of schedules disabled by the partner
+        churn_rate: Probability a venue-day row has soft_churn = 1
+        first_schedule_id: schedule_id of the first generated schedule
+        seed: Random seed (an int or a sequence such as (seed, block))
+
+    Returns:
+        Dict of table name -> DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start_date)
+    venue_ids = np.asarray(venue_ids)
+    n_venues = len(venue_ids)
+
+    # Schedules: Poisson count per venue-day
+    counts = rng.poisson(schedules_per_venue_day, size=(n_days, n_venues))
+    day_idx, venue_idx = np.nonzero(counts)
+    repeats = counts[day_idx, venue_idx]
+    day_idx = np.repeat(day_idx, repeats)
+    venue_idx = np.repeat(venue_idx, repeats)
+    n_schedules = len(day_idx)
+
+    max_capacity = rng.integers(8, 40, size=n_schedules)
+    classpass_spots = rng.integers(1, 12, size=n_schedules)
+    reason_draw = rng.random(n_schedules)
+    unbookable_reason = np.select(
+        [reason_draw < disabled_rate, reason_draw < disabled_rate + 0.02, reason_draw < disabled_rate + 0.04],
+        ['schedule disabled', 'zero spots', 'class cancelled'], default='').astype(object)
+    unbookable_reason[reason_draw >= disabled_rate + 0.04] = None
+    sched_schedules = pd.DataFrame({
+        'venue_id': venue_ids[venue_idx],
+        'schedule_id': np.arange(first_schedule_id, first_schedule_id + n_schedules),
+        'class_id': rng.integers(1, 5_000, size=n_schedules),
+        'start_date': (start + pd.to_timedelta(day_idx, unit='D')).date,
+        'unbookable_reason': unbookable_reason,
+        'is_bookable': np.where(pd.isna(unbookable_reason), 'true', 'false'),
+        'classpass_spots': classpass_spots,
+        'max_capacity': max_capacity,
+        'total_booked': (max_capacity * rng.random(n_schedules)).astype(int),
+        'classpass_spots_taken': (classpass_spots * rng.random(n_schedules)).astype(int),
+    })
+
+    present = rng.random((n_days, n_venues)) < presence_rate
+    day_idx, venue_idx = np.nonzero(present)
+    n_rows = len(day_idx)
+
+    def flag(p_one, p_null):
+        values = (rng.random(n_rows) < p_one).astype(float)
+        values[rng.random(n_rows) < p_null] = np.nan
+        return pd.array(values, dtype='Int64')
+
+    venue_adds_and_churns = pd.DataFrame({
+        'date': (start + pd.to_timedelta(day_idx, unit='D')).date,
+        'venue_id': venue_ids[venue_idx],
+        'soft_churn': (rng.random(n_rows) < churn_rate).astype(int),
+        'acquisition_pin': flag(0.7, 0.2),
+        'venue_inactive': flag(0.1, 0.3),
+    })
+
+    return {'sched_schedules': sched_schedules, 'venue_adds_and_churns': venue_adds_and_churns}
+
+
+def source_tables(n_venues=300, start_date=date(2024, 10, 1), n_days=60, schedules_per_venue_day=3.0,
+                  sa_share=0.4, fitness_share=0.9, presence_rate=0.6, disabled_rate=0.1,
+                  churn_rate=0.001, seed=0):
+    """
+    Generate the five warehouse source tables the sql/ queries read
+
+    Column names and value conventions follow cp_bi_derived.datapipeline (is_bookable as
+    'true'/'false', unbookable_reason text, acquisition_pin / venue_inactive flags with NULLs),
+    so the templates run unchanged on them through the local backend.
+
+    Args:
+        n_venues: Number of venues in partner_details
+        start_date: First calendar day of schedules and venue_adds_and_churns
+        n_days: Number of calendar days
+        schedules_per_venue_day: Mean schedules per venue per day (Poisson)
+        sa_share: Share of venues classified as SA in salesforce_venues
+        fitness_share: Share of venues with venue_type 'Fitness'
+        presence_rate: Probability a venue has a venue_adds_and_churns row on a given day
+        disabled_rate: Share of schedules disabled by the partner
+        churn_rate: Probability a venue-day row has soft_churn = 1
+        seed: Random seed
+
+    Returns:
+        Dict of table name -> DataFrame: partner_details, salesforce_venues,
+        sched_schedules, venue_adds_and_churns, ineligible_classes
+    """
+    tables = dimension_tables(n_venues, start_date=start_date, sa_share=sa_share,
+                              fitness_share=fitness_share, seed=seed)
+    tables.update(fact_tables(tables['partner_details']['venue_id'].to_numpy(), start_date=start_date,
+                              n_days=n_days, schedules_per_venue_day=schedules_per_venue_day,
+                              presence_rate=presence_rate, disabled_rate=disabled_rate,
+                              churn_rate=churn_rate, seed=(seed, 1)))
+    return tables
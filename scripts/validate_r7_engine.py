@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Validate the rolling distinct-count engine against the R7 soft churn SQL
+
+Renders 06_soft_churn_r7_rolling_7day.sql for the All/SA/Non-SA segments, runs its
+daily_metrics -> r7_aggregated -> final select part on synthetic r7_window_calc rows in an in-memory
+SQLite database, runs rolling_distinct.py on the same rows, and checks that every
+R7 sum, distinct venue count and percentage matches exactly.
+
+Usage:
+    python validate_r7_engine.py
+    python validate_r7_engine.py --venues 2000 --days 120 --seeds 5
+"""
+import sys
+import re
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+
+from rolling_distinct import SEGMENT_NAMES, soft_churn_r7_partials, soft_churn_r7_rates
+from sql_templates import CLASSIFICATION_SEGMENTS, render
+from synthetic_data import venue_day_rows
+
+R7_TEMPLATE = '06_soft_churn_r7_rolling_7day.sql'
+
+# r7_aggregated column suffix in the template -> engine column suffix
+PARTIAL_SUFFIXES = {f'_{name}': suffix for suffix, name in SEGMENT_NAMES.items()}
+
+
+def reference_query():
+    """
+    Return the SQL from daily_metrics onwards, translated to SQLite
+
+    The vids and r7_window_calc CTEs are replaced by a synthetic r7_window_calc table.
+    """
+    query, _ = render(R7_TEMPLATE, segments=CLASSIFICATION_SEGMENTS, inline=True,
+                      start_date='2000-01-01', end_date='2100-01-01')
+    query = 'with ' + query[query.index('daily_metrics as'):]
+    return re.sub(r"dateadd\('day',\s*(-?\d+),\s*([\w.]+)\)", r"date(\2, '\1 days')", query)
+
+
+def run_reference(rows):
+    """Run the translated SQL over rows and return its output"""
+    conn = sqlite3.connect(':memory:')
+    try:
+        table = rows.assign(date=pd.to_datetime(rows['date']).dt.strftime('%Y-%m-%d'))
+        table.to_sql('r7_window_calc', conn, index=False)
+        df = pd.read_sql_query(reference_query(), conn)
+    finally:
+        conn.close()
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    return df
+
+
+def run_reference_partials(rows):
+    """Run the r7_aggregated CTE alone so the raw sums and distinct counts can be compared"""
+    query = reference_query()
+    query = query[:query.rindex('select')] + 'select * from r7_aggregated order by 1'
+    conn = sqlite3.connect(':memory:')
+    try:
+        table = rows.assign(date=pd.to_datetime(rows['date']).dt.strftime('%Y-%m-%d'))
+        table.to_sql('r7_window_calc', conn, index=False)
+        df = pd.read_sql_query(query, conn)
+    finally:
+        conn.close()
+    df['date'] = pd.to_datetime(df['date']).dt.date
+    for template_suffix, suffix in PARTIAL_SUFFIXES.items():
+        df.columns = [re.sub(f'{template_suffix}$', suffix, col) if col.startswith('r7_') else col
+                      for col in df.columns]
+    return df
+
+
+def compare(expected, actual):
+    """Return a list of column names whose values differ (NaN == NaN)"""
+    mismatched = []
+    if list(expected['date']) != list(actual['date']):
+        return ['date']
+    for col in expected.columns:
+        if col == 'date':
+            continue
+        a = pd.to_numeric(expected[col], errors='coerce').to_numpy(dtype=float)
+        b = pd.to_numeric(actual[col], errors='coerce').to_numpy(dtype=float)
+        if not np.array_equal(a, b, equal_nan=True):
+            mismatched.append(col)
+    return mismatched
+
+
+def validate(n_venues, n_days, seed):
+    """Validate one synthetic dataset and return the list of mismatched columns"""
+    rows = venue_day_rows(n_venues=n_venues, n_days=n_days, null_churn_rate=0.02, seed=seed)
+    partials = soft_churn_r7_partials(rows)
+
+    mismatched = compare(run_reference_partials(rows), partials)
+    mismatched += compare(run_reference(rows), soft_churn_r7_rates(partials))
+    return mismatched
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the R7 engine for exact parity with the SQL')
+    parser.add_argument('--venues', type=int, default=300, help='Synthetic venues per dataset')
+    parser.add_argument('--days', type=int, default=60, help='Synthetic calendar days per dataset')
+    parser.add_argument('--seeds', type=int, default=3, help='Number of random datasets to check')
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for seed in range(args.seeds):
+        mismatched = validate(args.venues, args.days, seed)
+        if mismatched:
+            failures += 1
+            print(f"❌ Seed {seed}: mismatched columns {mismatched}")
+        else:
+            print(f"✅ Seed {seed}: engine matches SQL exactly ({args.venues} venues, {args.days} days)")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,11 @@
--- Chart 1: Spot Allocation - Monthly by Tenure (All Fitness, >24mo, <=24mo)
+-- Chart 1: Spot Allocation - Monthly by Segment (default: All Fitness, >24mo, <=24mo)
 -- Outputs final chart-ready values directly from SQL
+-- Uses SIMPLE AVERAGE per venue (matches validated results: 5.7-6.9 range)
+-- Template rendered by scripts/sql_templates.py:
+--   $start_date / $end_date - schedule start_date window [start, end)
+--   $tenure_days            - tenure threshold used by the tenure segments
+--   @each segment           - one output column per requested segment
+--   @if tenure              - only when a tenure segment is requested (venue-day grain, as validated)
 
 with vids as 
 (
@@ -14,7 +20,9 @@ avg_spot_alloc_per_venue_per_month as
 (
     select s.venue_id, account_classification,
             date_trunc('month', s.start_date) as month_date,
-            (s.start_date - v.estimated_launch_date) as days_tenure,
+            -- @if tenure
+            (s.start_date::date - v.estimated_launch_date) as days_tenure,
+            -- @endif
             count(distinct s.schedule_id) as bookable_scheds_per_venue_per_month,
             sum(case when is_bookable = 'false' then 0
                    when is_bookable = 'true' and classpass_spots < 
@@ -23,19 +31,20 @@ avg_spot_alloc_per_venue_per_month as
                    end) as cp_alloc_adjusted
     from vids v
     join cp_bi_derived.datapipeline.sched_schedules s on s.venue_id = v.venue_id
-    and s.start_date >= '2024-12-01' and s.start_date < '2025-12-01'
+    and s.start_date >= $start_date and s.start_date < $end_date
     and unbookable_reason is null
     and s.class_id not in (select distinct class_id from cp_bi_derived.datapipeline.ineligible_classes)
-    group by 1, 2, 3, 4
+    group by 1, 2, 3
+    -- @if tenure
+    , 4
+    -- @endif
 )
 select 
     month_date,
-    -- All Fitness (simple average - matches validated query)
-    avg(cp_alloc_adjusted * 1.0 / bookable_scheds_per_venue_per_month) as all_fitness,
-    -- Long Tenure (>24mo = >730 days) - simple average
-    avg(case when days_tenure > 730 then cp_alloc_adjusted * 1.0 / bookable_scheds_per_venue_per_month end) as long_tenure_gt24mo,
-    -- Short Tenure (<=24mo = <=730 days) - simple average
-    avg(case when days_tenure <= 730 then cp_alloc_adjusted * 1.0 / bookable_scheds_per_venue_per_month end) as short_tenure_le24mo
+    -- @each segment
+    -- {label} (simple average - matches validated query)
+    avg(case when {predicate} then cp_alloc_adjusted * 1.0 / bookable_scheds_per_venue_per_month end) as {segment},
+    -- @end
 from avg_spot_alloc_per_venue_per_month
 group by 1
 order by 1
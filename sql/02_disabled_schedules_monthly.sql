@@ -0,0 +1,41 @@
+-- Chart 2: Disabled Schedules - Monthly by Segment (default: All Fitness, >24mo, <=24mo)
+-- Outputs final chart-ready percentage values directly from SQL
+-- Template rendered by scripts/sql_templates.py:
+--   $start_date / $end_date - schedule start_date window [start, end)
+--   $tenure_days            - tenure threshold used by the tenure segments
+--   @each segment           - one output column per requested segment
+
+with vids as 
+(
+    select sv.account_classification, pd.*
+    from cp_bi_derived.datapipeline.partner_details pd
+    left join cp_bi_derived.datapipeline.salesforce_venues sv on pd.venue_id = sv.venue_id
+    where pd.venue_type = 'Fitness'
+    and estimated_launch_date is not null
+    -- NO VVM filter - this is for "All Fitness"
+),
+schedules as
+(
+    select
+        s.start_date,
+        s.schedule_id,
+        s.unbookable_reason,
+        v.account_classification,
+        (s.start_date::date - v.estimated_launch_date) as days_tenure
+    from vids v
+    join cp_bi_derived.datapipeline.sched_schedules s on s.venue_id = v.venue_id
+    and s.start_date >= $start_date and s.start_date < $end_date
+    and (unbookable_reason is null or (unbookable_reason ilike '%schedule%' or unbookable_reason ilike '%zero spots%'))
+    and s.class_id not in (select distinct class_id from cp_bi_derived.datapipeline.ineligible_classes)
+)
+select 
+    date_trunc('month', start_date) as month_date,
+    -- @each segment
+    -- {label}
+    count(distinct case when {predicate}
+            and unbookable_reason ilike '%schedule disable%' then schedule_id end) * 1.0 /
+        nullif(count(distinct case when {predicate} then schedule_id end), 0) * 100 as {segment}_pct,
+    -- @end
+from schedules
+group by 1
+order by 1
@@ -0,0 +1,43 @@
+-- Chart 3: Soft Churn Rate - Monthly by Segment (default: All Fitness, >24mo, <=24mo)
+-- Outputs final chart-ready percentage values directly from SQL
+-- Includes active venue filter: (GREATEST_IGNORE_NULLS(acquisition_pin, venue_inactive)) = 1
+-- Template rendered by scripts/sql_templates.py:
+--   $start_date / $end_date - venue_adds_and_churns date window [start, end)
+--   $tenure_days            - tenure threshold used by the tenure segments
+--   @each segment           - one output column per requested segment
+
+with vids as 
+(
+    select sv.account_classification, pd.*
+    from cp_bi_derived.datapipeline.partner_details pd
+    left join cp_bi_derived.datapipeline.salesforce_venues sv on pd.venue_id = sv.venue_id
+    where pd.venue_type = 'Fitness'
+    and estimated_launch_date is not null
+    -- NO VVM filter - this is for "All Fitness"
+),
+churn_rows as
+(
+    select
+        vac.date,
+        vac.venue_id,
+        vac.soft_churn,
+        sv.account_classification,
+        (vac.date - pd.estimated_launch_date) as days_tenure,
+        case when (GREATEST_IGNORE_NULLS(vac.acquisition_pin, vac.venue_inactive)) = 1 then 1 else 0 end as is_active
+    from cp_bi_derived.datapipeline.venue_adds_and_churns vac 
+    left join cp_bi_derived.datapipeline.partner_details pd on vac.venue_id = pd.venue_id
+    left join cp_bi_derived.datapipeline.salesforce_venues sv on vac.venue_id = sv.venue_id
+    INNER JOIN vids vvm on vac.venue_id = vvm.venue_id
+    where vac.date >= $start_date and vac.date < $end_date
+)
+select 
+    date_trunc('month', date) as month,
+    -- @each segment
+    -- {label} (with active venue filter)
+    sum(case when {predicate} then soft_churn else 0 end) * 1.0 /
+        nullif(count(distinct case when {predicate}
+                and is_active = 1 then venue_id else null end), 0) * 100 as {segment}_pct,
+    -- @end
+from churn_rows
+group by 1
+order by 1
@@ -1,7 +1,11 @@
 -- Chart 5: Disabled Schedules - R7 Rolling 7-Day (Oct-Nov 2024 & 2025)
--- Segments: All Fitness, SA Fitness, Non-SA Fitness
+-- Segments: All Fitness, SA Fitness, Non-SA Fitness (default)
 -- Outputs final chart-ready R7 percentage values directly from SQL
 -- Includes both 2024 and 2025 for year-over-year comparison
+-- Template rendered by scripts/sql_templates.py:
+--   $start_date / $end_date - schedule start_date window [start, end)
+--   $tenure_days            - tenure threshold used by the tenure segments
+--   @each segment           - one R7 column per requested segment
 
 with vids as 
 (
@@ -12,35 +16,38 @@ with vids as
     and estimated_launch_date is not null
     -- NO VVM filter - this is for "All Fitness"
 ),
-daily_metrics as 
+schedules as
 (
-    select 
+    select
         s.start_date::date as date,
-        -- All Fitness - Daily (matches original query structure)
-        count(distinct schedule_id) as total_scheds,
-        count(distinct case when unbookable_reason ilike '%schedule disable%' then schedule_id end) as disabled_scheds,
-        -- SA Fitness - Daily
-        count(distinct case when account_classification = 'SA' then schedule_id end) as SA_total_scheds,
-        count(distinct case when account_classification = 'SA' 
-                and unbookable_reason ilike '%schedule disable%' then schedule_id end) as SA_disabled_scheds,
-        -- Non-SA Fitness - Daily
-        count(distinct case when account_classification != 'SA' OR account_classification IS NULL then schedule_id end) as nonSA_total_scheds,
-        count(distinct case when (account_classification != 'SA' OR account_classification IS NULL)
-                and unbookable_reason ilike '%schedule disable%' then schedule_id end) as nonSA_disabled_scheds
+        s.schedule_id,
+        s.unbookable_reason,
+        v.account_classification,
+        (s.start_date::date - v.estimated_launch_date) as days_tenure
     from vids v
     join cp_bi_derived.datapipeline.sched_schedules s on s.venue_id = v.venue_id
-    and s.start_date >= '2024-10-01' and s.start_date < '2025-12-01'
+    and s.start_date >= $start_date and s.start_date < $end_date
     and (unbookable_reason is null or (unbookable_reason ilike '%schedule%' or unbookable_reason ilike '%zero spots%'))
     and s.class_id not in (select distinct class_id from cp_bi_derived.datapipeline.ineligible_classes)
+),
+daily_metrics as 
+(
+    select 
+        date,
+        -- @each segment
+        -- {label} - Daily (matches original query structure)
+        count(distinct case when {predicate} then schedule_id end) as total_scheds_{segment},
+        count(distinct case when {predicate}
+                and unbookable_reason ilike '%schedule disable%' then schedule_id end) as disabled_scheds_{segment},
+        -- @end
+    from schedules
     group by 1
 )
 select 
     date,
-    -- All Fitness - Rolling 7-day (R7) - matches team's pattern
-    avg(disabled_scheds * 1.0 / nullif(total_scheds, 0) * 100) OVER (ORDER BY date ROWS BETWEEN 6 PRECEDING AND CURRENT ROW) as all_fitness_r7_pct,
-    -- SA Fitness - Rolling 7-day (R7)
-    avg(SA_disabled_scheds * 1.0 / nullif(SA_total_scheds, 0) * 100) OVER (ORDER BY date ROWS BETWEEN 6 PRECEDING AND CURRENT ROW) as sa_fitness_r7_pct,
-    -- Non-SA Fitness - Rolling 7-day (R7)
-    avg(nonSA_disabled_scheds * 1.0 / nullif(nonSA_total_scheds, 0) * 100) OVER (ORDER BY date ROWS BETWEEN 6 PRECEDING AND CURRENT ROW) as nonsa_fitness_r7_pct
+    -- @each segment
+    -- {label} - Rolling 7-day (R7) - matches team's pattern
+    avg(disabled_scheds_{segment} * 1.0 / nullif(total_scheds_{segment}, 0) * 100) OVER (ORDER BY date ROWS BETWEEN 6 PRECEDING AND CURRENT ROW) as {segment}_r7_pct,
+    -- @end
 from daily_metrics
 order by 1
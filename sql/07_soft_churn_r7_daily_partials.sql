@@ -0,0 +1,67 @@
+-- Soft Churn Rate - R7 daily partial aggregates for incremental refresh
+-- Segments: All Fitness, SA Fitness, Non-SA Fitness
+-- Same R7 logic as 06_soft_churn_r7_rolling_7day.sql, but outputs the R7 numerators and
+-- denominators (not the final percentage) for a bounded window of days so they can be
+-- appended to the local store by scripts/incremental_r7_refresh.py
+-- Template rendered by scripts/sql_templates.py:
+--   $start_date - first day to output (inclusive); rows from 6 days earlier are read for the R7 lookback
+--   $end_date   - last day to output (exclusive)
+
+with vids as
+(
+    select sv.account_classification, pd.*
+    from cp_bi_derived.datapipeline.partner_details pd
+    left join cp_bi_derived.datapipeline.salesforce_venues sv on pd.venue_id = sv.venue_id
+    where pd.venue_type = 'Fitness'
+    and estimated_launch_date is not null
+    -- NO VVM filter - this is for "All Fitness"
+),
+r7_window_calc as
+(
+    select
+        vac.date,
+        vac.venue_id,
+        sv.account_classification,
+        vac.soft_churn,
+        case when (GREATEST_IGNORE_NULLS(vac.acquisition_pin, vac.venue_inactive)) = 1 then 1 else 0 end as is_active
+    from cp_bi_derived.datapipeline.venue_adds_and_churns vac
+    left join cp_bi_derived.datapipeline.partner_details pd on vac.venue_id = pd.venue_id
+    left join cp_bi_derived.datapipeline.salesforce_venues sv on vac.venue_id = sv.venue_id
+    INNER JOIN vids vvm on vac.venue_id = vvm.venue_id
+    -- 6-day lookback so the first output day has a full R7 window
+    where vac.date >= dateadd('day', -6, $start_date::date) and vac.date < $end_date::date
+),
+output_days as
+(
+    select distinct date
+    from r7_window_calc
+    where date >= $start_date::date
+)
+select
+    od.date,
+    -- R7: Sum soft_churn over 7-day window (matches monthly: sum over month)
+    (select sum(rwc2.soft_churn)
+     from r7_window_calc rwc2
+     where rwc2.date <= od.date and rwc2.date >= dateadd('day', -6, od.date)) as r7_soft_churns,
+    -- R7: Count distinct venues over 7-day window (matches monthly: count distinct over month)
+    (select count(distinct case when rwc2.is_active = 1 then rwc2.venue_id end)
+     from r7_window_calc rwc2
+     where rwc2.date <= od.date and rwc2.date >= dateadd('day', -6, od.date)) as r7_venue_count,
+    -- SA Fitness R7
+    (select sum(case when rwc2.account_classification = 'SA' then rwc2.soft_churn else 0 end)
+     from r7_window_calc rwc2
+     where rwc2.date <= od.date and rwc2.date >= dateadd('day', -6, od.date)) as r7_soft_churns_sa,
+    (select count(distinct case when rwc2.account_classification = 'SA'
+            and rwc2.is_active = 1 then rwc2.venue_id else null end)
+     from r7_window_calc rwc2
+     where rwc2.date <= od.date and rwc2.date >= dateadd('day', -6, od.date)) as r7_venue_count_sa,
+    -- Non-SA Fitness R7
+    (select sum(case when rwc2.account_classification != 'SA' OR rwc2.account_classification IS NULL then rwc2.soft_churn else 0 end)
+     from r7_window_calc rwc2
+     where rwc2.date <= od.date and rwc2.date >= dateadd('day', -6, od.date)) as r7_soft_churns_nonsa,
+    (select count(distinct case when (rwc2.account_classification != 'SA' OR rwc2.account_classification IS NULL)
+            and rwc2.is_active = 1 then rwc2.venue_id else null end)
+     from r7_window_calc rwc2
+     where rwc2.date <= od.date and rwc2.date >= dateadd('day', -6, od.date)) as r7_venue_count_nonsa
+from output_days od
+order by 1
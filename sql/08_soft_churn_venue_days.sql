@@ -0,0 +1,29 @@
+-- Soft Churn - venue-day rows (the r7_window_calc grain of 06_soft_churn_r7_rolling_7day.sql)
+-- Input for the local rolling distinct-count engine (scripts/rolling_distinct.py), which
+-- computes R7 sums and distinct venue counts without the correlated subqueries, and for
+-- the daily partials of the rollup engine (scripts/rollup.py)
+-- Template rendered by scripts/sql_templates.py:
+--   $start_date - first day of rows to return (inclusive)
+--   $end_date   - last day of rows to return (exclusive)
+
+with vids as
+(
+    select sv.account_classification, pd.*
+    from cp_bi_derived.datapipeline.partner_details pd
+    left join cp_bi_derived.datapipeline.salesforce_venues sv on pd.venue_id = sv.venue_id
+    where pd.venue_type = 'Fitness'
+    and estimated_launch_date is not null
+    -- NO VVM filter - this is for "All Fitness"
+)
+select
+    vac.date,
+    vac.venue_id,
+    sv.account_classification,
+    (vac.date - pd.estimated_launch_date) as days_tenure,
+    vac.soft_churn,
+    case when (GREATEST_IGNORE_NULLS(vac.acquisition_pin, vac.venue_inactive)) = 1 then 1 else 0 end as is_active
+from cp_bi_derived.datapipeline.venue_adds_and_churns vac
+left join cp_bi_derived.datapipeline.partner_details pd on vac.venue_id = pd.venue_id
+left join cp_bi_derived.datapipeline.salesforce_venues sv on vac.venue_id = sv.venue_id
+INNER JOIN vids vvm on vac.venue_id = vvm.venue_id
+where vac.date >= $start_date::date and vac.date < $end_date::date
@@ -0,0 +1,183 @@
+-- Charts 1, 2, 4 and 5 in one pass: Spot Allocation and Disabled Schedules, daily and monthly
+-- One scan of sched_schedules feeds every grain and segment; the result has one row per
+-- (grain, period) and scripts/schedule_metrics.py splits it into the per-chart outputs
+-- (R7 is computed there from the daily rows, as the 04/05 ROWS BETWEEN 6 PRECEDING window)
+--   grain 'day'   - date: spot allocation (venue-day grain), total and disabled schedule counts
+--   grain 'month' - month_date: spot allocation at venue-month grain (01 without tenure) and at
+--                   venue-day grain (01 with tenure), total and disabled schedule counts
+-- Template rendered by scripts/sql_templates.py:
+--   $start_date / $end_date - schedule start_date window [start, end)
+--   $tenure_days            - tenure threshold used by the tenure segments
+--   @each segment           - one set of columns per requested segment
+
+with vids as
+(
+    select sv.account_classification, pd.*
+    from cp_bi_derived.datapipeline.partner_details pd
+    left join cp_bi_derived.datapipeline.salesforce_venues sv on pd.venue_id = sv.venue_id
+    where pd.venue_type = 'Fitness'
+    and estimated_launch_date is not null
+    -- NO VVM filter - this is for "All Fitness"
+),
+schedules as
+(
+    -- The single scan: bookable schedules (spot allocation) plus the schedule-disabled and
+    -- zero-spot ones (disabled %), with the ineligible class filter applied once
+    select
+        s.venue_id,
+        v.account_classification,
+        s.start_date::date as date,
+        date_trunc('month', s.start_date) as month_date,
+        (s.start_date::date - v.estimated_launch_date) as days_tenure,
+        s.schedule_id,
+        s.unbookable_reason,
+        case when is_bookable = 'false' then 0
+             when is_bookable = 'true' and classpass_spots <
+              (max_capacity - total_booked + classpass_spots_taken) THEN classpass_spots
+             else (max_capacity - total_booked + classpass_spots_taken)
+             end as cp_alloc_adjusted
+    from vids v
+    join cp_bi_derived.datapipeline.sched_schedules s on s.venue_id = v.venue_id
+    and s.start_date >= $start_date and s.start_date < $end_date
+    and (unbookable_reason is null or (unbookable_reason ilike '%schedule%' or unbookable_reason ilike '%zero spots%'))
+    and s.class_id not in (select distinct class_id from cp_bi_derived.datapipeline.ineligible_classes)
+),
+avg_spot_alloc_per_venue_per_day as
+(
+    select
+        venue_id,
+        account_classification,
+        date,
+        month_date,
+        days_tenure,
+        count(distinct schedule_id) as bookable_scheds,
+        sum(cp_alloc_adjusted) as cp_alloc_adjusted
+    from schedules
+    where unbookable_reason is null
+    group by 1, 2, 3, 4, 5
+),
+avg_spot_alloc_per_venue_per_month as
+(
+    select
+        venue_id,
+        account_classification,
+        month_date,
+        cast(null as integer) as days_tenure,  -- tenure changes within a month: no tenure segments at this grain
+        count(distinct schedule_id) as bookable_scheds,
+        sum(cp_alloc_adjusted) as cp_alloc_adjusted
+    from schedules
+    where unbookable_reason is null
+    group by 1, 2, 3
+),
+daily_spots as
+(
+    select
+        date,
+        count(*) as bookable_venue_days,
+        -- @each segment
+        -- {label} - Daily (SIMPLE AVERAGE: avg of venue-level ratios)
+        avg(case when {predicate} then cp_alloc_adjusted * 1.0 / nullif(bookable_scheds, 0) end) as spots_{segment},
+        -- @end
+    from avg_spot_alloc_per_venue_per_day
+    group by 1
+),
+schedule_days as
+(
+    -- One row per schedule and day with 0/1 segment flags, so the daily and monthly
+    -- count(distinct schedule_id) become sums (a schedule counts if any of its rows matches)
+    select
+        date,
+        month_date,
+        schedule_id,
+        -- @each segment
+        max(case when {predicate} then 1 else 0 end) as in_{segment},
+        max(case when {predicate}
+                and unbookable_reason ilike '%schedule disable%' then 1 else 0 end) as disabled_{segment},
+        -- @end
+    from schedules
+    group by 1, 2, 3
+),
+daily_scheds as
+(
+    select
+        date,
+        -- @each segment
+        -- {label}
+        sum(in_{segment}) as total_scheds_{segment},
+        sum(disabled_{segment}) as disabled_scheds_{segment},
+        -- @end
+    from schedule_days
+    group by 1
+),
+monthly_spots as
+(
+    select
+        month_date,
+        -- @each segment
+        -- {label} - venue-month grain
+        avg(case when {predicate} then cp_alloc_adjusted * 1.0 / bookable_scheds end) as spots_{segment},
+        -- @end
+    from avg_spot_alloc_per_venue_per_month
+    group by 1
+),
+monthly_spots_venue_day as
+(
+    select
+        month_date,
+        -- @each segment
+        -- {label} - venue-day grain
+        avg(case when {predicate} then cp_alloc_adjusted * 1.0 / bookable_scheds end) as spots_venue_day_{segment},
+        -- @end
+    from avg_spot_alloc_per_venue_per_day
+    group by 1
+),
+monthly_scheds as
+(
+    select
+        month_date,
+        -- @each segment
+        -- {label}
+        sum(in_{segment}) as total_scheds_{segment},
+        sum(disabled_{segment}) as disabled_scheds_{segment},
+        -- @end
+    from
+    (
+        select
+            month_date,
+            schedule_id,
+            -- @each segment
+            max(in_{segment}) as in_{segment},
+            max(disabled_{segment}) as disabled_{segment},
+            -- @end
+        from schedule_days
+        group by 1, 2
+    ) schedule_months
+    group by 1
+)
+select
+    'day' as grain,
+    ds.date as period,
+    sp.bookable_venue_days,
+    -- @each segment
+    sp.spots_{segment},
+    cast(null as double) as spots_venue_day_{segment},
+    ds.total_scheds_{segment},
+    ds.disabled_scheds_{segment},
+    -- @end
+from daily_scheds ds
+left join daily_spots sp on sp.date = ds.date
+union all
+select
+    'month' as grain,
+    ms.month_date::date as period,
+    null as bookable_venue_days,
+    -- @each segment
+    sp.spots_{segment},
+    vd.spots_venue_day_{segment},
+    ms.total_scheds_{segment},
+    ms.disabled_scheds_{segment},
+    -- @end
+from monthly_scheds ms
+left join monthly_spots sp on sp.month_date = ms.month_date
+left join monthly_spots_venue_day vd on vd.month_date = ms.month_date
+order by 1, 2
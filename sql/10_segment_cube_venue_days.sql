@@ -0,0 +1,68 @@
+-- Segment cube - venue-day rows with every measure the charts use, for all venue types
+-- Input for scripts/segment_cube.py, which buckets tenure and aggregates these rows into
+-- daily cells keyed by (venue_type, account_classification, tenure_bucket)
+--   bookable_scheds / cp_alloc_adjusted - spot allocation (04/01: unbookable_reason is null)
+--   total_scheds / disabled_scheds      - disabled schedules (05/02 filter)
+--   soft_churn / is_active              - soft churn (06/03), duplicate venue-days summed / OR-ed
+-- Template rendered by scripts/sql_templates.py:
+--   $start_date - first day of rows to return (inclusive)
+--   $end_date   - last day of rows to return (exclusive)
+
+with vids as
+(
+    select sv.account_classification, pd.*
+    from cp_bi_derived.datapipeline.partner_details pd
+    left join cp_bi_derived.datapipeline.salesforce_venues sv on pd.venue_id = sv.venue_id
+    where estimated_launch_date is not null
+    -- Every venue type: venue_type is a cube dimension
+),
+schedule_days as
+(
+    select
+        s.venue_id,
+        s.start_date::date as date,
+        count(distinct case when unbookable_reason is null then s.schedule_id end) as bookable_scheds,
+        sum(case when unbookable_reason is not null then null
+                 when is_bookable = 'false' then 0
+                 when is_bookable = 'true' and classpass_spots <
+                  (max_capacity - total_booked + classpass_spots_taken) THEN classpass_spots
+                 else (max_capacity - total_booked + classpass_spots_taken)
+                 end) as cp_alloc_adjusted,
+        count(distinct s.schedule_id) as total_scheds,
+        count(distinct case when unbookable_reason ilike '%schedule disable%' then s.schedule_id end) as disabled_scheds
+    from vids v
+    join cp_bi_derived.datapipeline.sched_schedules s on s.venue_id = v.venue_id
+    and s.start_date >= $start_date and s.start_date < $end_date
+    and (unbookable_reason is null or (unbookable_reason ilike '%schedule%' or unbookable_reason ilike '%zero spots%'))
+    and s.class_id not in (select distinct class_id from cp_bi_derived.datapipeline.ineligible_classes)
+    group by 1, 2
+),
+churn_days as
+(
+    select
+        vac.venue_id,
+        vac.date,
+        sum(vac.soft_churn) as soft_churn,
+        max(case when (GREATEST_IGNORE_NULLS(vac.acquisition_pin, vac.venue_inactive)) = 1 then 1 else 0 end) as is_active,
+        count(*) as churn_rows
+    from cp_bi_derived.datapipeline.venue_adds_and_churns vac
+    INNER JOIN vids vvm on vac.venue_id = vvm.venue_id
+    where vac.date >= $start_date::date and vac.date < $end_date::date
+    group by 1, 2
+)
+select
+    coalesce(sd.date, cd.date) as date,
+    v.venue_id,
+    v.venue_type,
+    v.account_classification,
+    (coalesce(sd.date, cd.date) - v.estimated_launch_date) as days_tenure,
+    sd.bookable_scheds,
+    sd.cp_alloc_adjusted,
+    sd.total_scheds,
+    sd.disabled_scheds,
+    cd.soft_churn,
+    cd.is_active,
+    cd.churn_rows
+from schedule_days sd
+full outer join churn_days cd on cd.venue_id = sd.venue_id and cd.date = sd.date
+join vids v on v.venue_id = coalesce(sd.venue_id, cd.venue_id)
@@ -0,0 +1,8 @@
+"""The scripts import each other by bare module name, as when run from scripts/"""
+import os
+import sys
+
+# query_metrics reads the log path at import; keep test runs out of data/query_log
+os.environ.setdefault('QUERY_LOG_PATH', 'off')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
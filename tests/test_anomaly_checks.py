@@ -0,0 +1,30 @@
+"""The period helpers anomaly_checks.py shares with period_compare.py"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomaly_checks import date_column_of, lookup_rows, period_dates, period_numbers
+
+
+@pytest.mark.parametrize('period, dates', [
+    ('day', pd.DatetimeIndex(['2024-02-28', '2024-02-29', '2024-03-01'])),
+    ('month', pd.DatetimeIndex(['2024-11-01', '2024-12-01', '2025-01-01'])),
+])
+def test_consecutive_periods_differ_by_one_and_map_back(period, dates):
+    numbers = period_numbers(dates, period)
+    assert list(np.diff(numbers)) == [1, 1]
+    assert period_dates(numbers, period).equals(dates)
+
+
+def test_lookup_rows_fills_missing_periods_with_nan():
+    values = np.array([[1.0, 10.0], [3.0, 30.0]])
+    found = lookup_rows(np.array([100, 102]), values, np.array([102, 101, 100, 200]))
+    np.testing.assert_array_equal(found, [[3.0, 30.0], [np.nan, np.nan], [1.0, 10.0], [np.nan, np.nan]])
+    assert np.isnan(lookup_rows(np.array([], dtype=np.int64), values[:0], np.array([5]))).all()
+
+
+def test_date_column_of_finds_daily_and_monthly_columns():
+    assert date_column_of(pd.DataFrame(columns=['date', 'all_fitness_r7'])) == 'date'
+    assert date_column_of(pd.DataFrame(columns=['month_date', 'all_fitness'])) == 'month_date'
+    with pytest.raises(KeyError):
+        date_column_of(pd.DataFrame(columns=['all_fitness']))
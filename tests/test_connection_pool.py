@@ -0,0 +1,196 @@
+"""ConnectionPool and the pooled query path, exercised against fake_connector.py"""
+import threading
+import time
+
+import pytest
+
+import snowflake_connection
+from connection_pool import ConnectionPool, PoolClosedError
+from fake_connector import FakeConnector
+
+
+class FakeClock:
+    """Monotonic clock the tests move by hand"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_pool(monkeypatch, tmp_path):
+    """The shared pool of snowflake_connection on a fake connector; no query log, no cache"""
+    monkeypatch.setenv('QUERY_LOG_PATH', 'off')
+    fake = FakeConnector(results={'from spots': (['DATE', 'VALUE'], [('2025-11-01', 1.5)])})
+    pool = snowflake_connection.configure_pool(connect=fake.connect, max_size=2)
+    yield fake, pool
+    snowflake_connection.close_connection()
+
+
+def test_size_is_bounded_under_concurrency():
+    fake = FakeConnector(connect_seconds=0.01)
+    pool = ConnectionPool(fake.connect, max_size=3)
+    lock = threading.Lock()
+    checked_out = []
+    peak = [0]
+
+    def work():
+        for _ in range(5):
+            with pool.connection() as conn:
+                with lock:
+                    checked_out.append(conn)
+                    peak[0] = max(peak[0], len(checked_out))
+                time.sleep(0.002)
+                with lock:
+                    checked_out.remove(conn)
+
+    threads = [threading.Thread(target=work) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak[0] <= 3
+    assert len(fake.connections) <= 3
+    assert pool.size == pool.idle_count == len(fake.connections)
+    assert pool.stats['opened'] + pool.stats['reused'] == 50
+    pool.close()
+    assert all(conn.closed for conn in fake.connections)
+
+
+def test_acquire_times_out_when_the_pool_is_full():
+    pool = ConnectionPool(FakeConnector().connect, max_size=1)
+    conn = pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    assert time.monotonic() - started >= 0.05
+
+    pool.release(conn)
+    assert pool.acquire(timeout=0.05) is conn
+
+
+def test_waiting_acquire_gets_a_released_connection():
+    pool = ConnectionPool(FakeConnector().connect, max_size=1)
+    conn = pool.acquire()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=5)))
+    waiter.start()
+    time.sleep(0.02)
+    assert not got
+    pool.release(conn)
+    waiter.join()
+    assert got == [conn]
+
+
+def test_connection_is_discarded_after_an_error():
+    fake = FakeConnector()
+    pool = ConnectionPool(fake.connect, max_size=1)
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError("query failed")
+
+    assert conn.closed
+    assert pool.size == 0
+    assert pool.stats['discarded'] == 1
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    assert len(fake.connections) == 2
+
+
+def test_closed_pool_refuses_connections():
+    pool = ConnectionPool(FakeConnector().connect, max_size=1)
+    conn = pool.acquire()
+    pool.close()
+    with pytest.raises(PoolClosedError):
+        pool.acquire()
+    pool.release(conn)
+    assert conn.closed
+    assert pool.size == 0
+
+
+def test_liveness_is_only_checked_after_a_long_idle():
+    fake = FakeConnector()
+    clock = FakeClock()
+    pool = ConnectionPool(fake.connect, max_size=1, idle_check_seconds=300, clock=clock)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    clock.now += 299
+    assert pool.acquire() is conn
+    assert fake.round_trips('ping') == 0
+    pool.release(conn)
+
+    clock.now += 301
+    assert pool.acquire() is conn
+    assert fake.round_trips('ping') == 1
+    assert pool.stats['liveness_checks'] == 1
+    pool.release(conn)
+
+
+def test_dead_idle_connection_is_replaced():
+    fake = FakeConnector()
+    clock = FakeClock()
+    pool = ConnectionPool(fake.connect, max_size=1, idle_check_seconds=300, clock=clock)
+    conn = pool.acquire()
+    pool.release(conn)
+
+    conn.alive = False
+    clock.now += 301
+    fresh = pool.acquire()
+    assert fresh is not conn
+    assert conn.closed
+    assert pool.stats['discarded'] == 1
+    assert pool.size == 1
+
+
+def test_failed_connect_frees_its_slot():
+    fake = FakeConnector()
+    calls = []
+
+    def connect():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("login failed")
+        return fake.connect()
+
+    pool = ConnectionPool(connect, max_size=1)
+    with pytest.raises(OSError):
+        pool.acquire()
+    assert pool.size == 0
+    assert pool.acquire(timeout=0.05) is fake.connections[0]
+
+
+def test_a_query_is_one_statement(fake_pool):
+    fake, pool = fake_pool
+    for _ in range(3):
+        df = snowflake_connection.execute_query("select date, value from spots")
+    assert df['VALUE'].tolist() == [1.5]
+    assert fake.round_trips() == fake.round_trips('query') == 3
+    assert len(fake.connections) == 1
+
+
+def test_statement_timeout_is_only_set_when_it_changes(fake_pool):
+    fake, pool = fake_pool
+    snowflake_connection.execute_query("select date, value from spots", timeout_seconds=60)
+    snowflake_connection.execute_query("select date, value from spots", timeout_seconds=60)
+    assert fake.round_trips('alter') == 1
+    snowflake_connection.execute_query("select date, value from spots")
+    assert fake.round_trips('alter') == 2
+    assert fake.round_trips('query') == 3
+
+
+def test_failed_query_discards_its_connection(fake_pool):
+    fake, pool = fake_pool
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.alive = False
+    with pytest.raises(Exception):
+        snowflake_connection.execute_query("select date, value from spots")
+    assert conn.closed
+    assert pool.stats['discarded'] == 1
+
+    snowflake_connection.execute_query("select date, value from spots")
+    assert len(fake.connections) == 2
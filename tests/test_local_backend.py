@@ -0,0 +1,92 @@
+"""Tests for the DuckDB backend: Snowflake -> DuckDB translation and presets on a synthetic extract"""
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+import local_backend
+from sql_templates import render_preset
+from synthetic_data import source_tables
+
+# Synthetic days start with the R7 lookback, so the extract covers October and November
+START = date(2024, 9, 25)
+DAYS = 67
+
+
+@pytest.fixture(scope='module')
+def extract_dir(tmp_path_factory):
+    """A small seeded synthetic extract"""
+    local_dir = str(tmp_path_factory.mktemp('local'))
+    tables = source_tables(n_venues=40, start_date=START, n_days=DAYS, seed=3)
+    local_backend.write_tables(tables, START + timedelta(days=local_backend.LOOKBACK_DAYS),
+                               START + timedelta(days=DAYS), source='test', local_dir=local_dir)
+    return local_dir
+
+
+def _run(extract_dir, preset, **overrides):
+    sql, params = render_preset(preset, **overrides)
+    conn = local_backend.connect(extract_dir)
+    try:
+        cursor = conn.cursor().execute(sql, params)
+        return pd.DataFrame(cursor.fetchall(), columns=[col[0] for col in cursor.description])
+    finally:
+        conn.close()
+
+
+def test_translate_drops_the_schema_prefix_in_any_case():
+    sql = "select * from cp_bi_derived.datapipeline.sched_schedules s join CP_BI_DERIVED.DATAPIPELINE.partner_details p"
+    assert local_backend.translate(sql) == "select * from sched_schedules s join partner_details p"
+
+
+def test_translate_rewrites_greatest_ignore_nulls():
+    assert local_backend.translate("select GREATEST_IGNORE_NULLS(a, b)") == "select greatest(a, b)"
+    assert local_backend.translate("select greatest_ignore_nulls (a, b)") == "select greatest(a, b)"
+
+
+def test_translate_rewrites_dateadd_including_nested_calls():
+    assert local_backend.translate("where d >= dateadd('day', -6, ?)") == "where d >= (CAST(? AS DATE) + (-6))"
+    assert local_backend.translate("dateadd(day, 1, dateadd('day', -6, coalesce(a, b)))") == \
+        "(CAST((CAST(coalesce(a, b) AS DATE) + (-6)) AS DATE) + (1))"
+
+
+def test_translate_keeps_commas_in_literals_and_rejects_malformed_dateadd():
+    assert local_backend.translate("dateadd('day', -1, concat(a, ','))") == "(CAST(concat(a, ',') AS DATE) + (-1))"
+    with pytest.raises(ValueError):
+        local_backend.translate("dateadd('day', 1)")
+
+
+def test_r7_preset_runs_on_the_extract(extract_dir):
+    df = _run(extract_dir, 'soft_churn_r7', start_date='2024-10-01', end_date='2024-12-01')
+
+    assert 'DATE' in df.columns and 'ALL_FITNESS_R7_PCT' in df.columns
+    dates = pd.to_datetime(df['DATE']).dt.date
+    assert list(dates) == [date(2024, 10, 1) + timedelta(days=day) for day in range(61)]
+    rates = pd.to_numeric(df['ALL_FITNESS_R7_PCT'])
+    assert rates.notna().all() and rates.between(0, 100).all()
+
+
+def test_monthly_preset_runs_on_the_extract(extract_dir):
+    df = _run(extract_dir, 'spot_allocation_monthly', start_date='2024-10-01', end_date='2024-12-01')
+
+    assert list(pd.to_datetime(df['MONTH_DATE']).dt.date) == [date(2024, 10, 1), date(2024, 11, 1)]
+    assert (pd.to_numeric(df['ALL_FITNESS']) > 0).all()
+
+
+def test_session_statements_are_accepted(extract_dir):
+    conn = local_backend.connect(extract_dir)
+    try:
+        cursor = conn.cursor().execute("ALTER SESSION SET STATEMENT_TIMEOUT_IN_SECONDS = 60")
+        assert cursor.fetchone() == ('Statement executed successfully.',)
+    finally:
+        conn.close()
+    assert conn.is_closed()
+
+
+def test_dates_outside_the_extract_warn(extract_dir):
+    with pytest.warns(UserWarning, match='outside the local extract'):
+        _run(extract_dir, 'soft_churn_r7', start_date='2024-09-01', end_date='2024-10-15')
+
+
+def test_missing_extract_is_reported(tmp_path):
+    with pytest.raises(FileNotFoundError, match='No local extract'):
+        local_backend.connect(str(tmp_path))
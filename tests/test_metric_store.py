@@ -0,0 +1,72 @@
+"""Tests for the Parquet metric store: upserts and concurrent writers"""
+import multiprocessing
+import os
+import threading
+
+import pandas as pd
+
+import metric_store
+
+
+def _month(month, value=1.0, days=3):
+    return pd.DataFrame({'DATE': pd.date_range(f'2025-{month:02d}-01', periods=days),
+                         'ALL_FITNESS_PCT': value})
+
+
+def test_write_upserts_dates_and_keeps_other_rows(tmp_path):
+    metric_store.write('soft_churn_r7', _month(1, days=5), store_dir=str(tmp_path))
+    metric_store.write('soft_churn_r7', _month(1, value=2.0, days=2), store_dir=str(tmp_path))
+
+    df = metric_store.read('soft_churn_r7', store_dir=str(tmp_path))
+    assert list(df['all_fitness_pct']) == [2.0, 2.0, 1.0, 1.0, 1.0]
+    assert metric_store.load_manifest(str(tmp_path))['metrics']['soft_churn_r7']['partitions']['2025-01']['rows'] == 5
+
+
+def test_concurrent_writers_keep_every_partition(tmp_path):
+    errors = []
+    start = threading.Barrier(6)
+
+    def write(month):
+        try:
+            start.wait()
+            metric_store.write('soft_churn_r7', _month(month), store_dir=str(tmp_path))
+            metric_store.write(f'metric_{month}', _month(month), store_dir=str(tmp_path))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(month,)) for month in range(1, 7)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    manifest = metric_store.load_manifest(str(tmp_path))
+    assert sorted(manifest['metrics']['soft_churn_r7']['partitions']) == [f'2025-{m:02d}' for m in range(1, 7)]
+    assert sorted(manifest['metrics']) == sorted(['soft_churn_r7'] + [f'metric_{m}' for m in range(1, 7)])
+    assert len(metric_store.read('soft_churn_r7', store_dir=str(tmp_path))) == 18
+
+
+def _write_in_process(store_dir, month):
+    metric_store.write('soft_churn_r7', _month(month), store_dir=store_dir)
+
+
+def test_writers_in_separate_processes_keep_every_partition(tmp_path):
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_write_in_process, args=(str(tmp_path), month)) for month in range(1, 5)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [process.exitcode for process in processes] == [0] * 4
+    partitions = metric_store.load_manifest(str(tmp_path))['metrics']['soft_churn_r7']['partitions']
+    assert sorted(partitions) == [f'2025-{m:02d}' for m in range(1, 5)]
+
+
+def test_writes_leave_no_temp_files(tmp_path):
+    metric_store.write('soft_churn_r7', _month(1), store_dir=str(tmp_path))
+    metric_store.write('soft_churn_r7', _month(1, value=2.0), store_dir=str(tmp_path))
+
+    leftovers = [name for _, _, names in os.walk(tmp_path) for name in names if name.endswith('.tmp')]
+    assert leftovers == []
@@ -0,0 +1,74 @@
+"""execute_queries_parallel against fake_connector.py's simulated latency and failures"""
+import time
+
+import pytest
+
+import snowflake_connection
+from fake_connector import FakeConnector
+
+LATENCY_SECONDS = 0.3
+
+QUERIES = {
+    'spot_allocation': "select date, value from spots",
+    'disabled_schedules': "select date, value from disabled",
+    'soft_churn': "select date, value from churn",
+}
+
+
+@pytest.fixture(autouse=True)
+def no_query_log(monkeypatch):
+    monkeypatch.setenv('QUERY_LOG_PATH', 'off')
+
+
+@pytest.fixture(scope='module', autouse=True)
+def warm_imports():
+    """pandas is imported on first use; keep its import out of the timings"""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('QUERY_LOG_PATH', 'off')
+        snowflake_connection.execute_queries_parallel({'warm-up': "select 1"}, connect=FakeConnector().connect)
+
+
+def test_wall_clock_is_about_the_slowest_query():
+    fake = FakeConnector(latency_seconds=LATENCY_SECONDS)
+    started = time.perf_counter()
+    results, errors = snowflake_connection.execute_queries_parallel(QUERIES, connect=fake.connect)
+    elapsed = time.perf_counter() - started
+
+    assert errors == {}
+    assert set(results) == set(QUERIES)
+    assert fake.round_trips('query') == len(QUERIES)
+    # Run one after another they would take 0.9s
+    assert LATENCY_SECONDS <= elapsed < 2 * LATENCY_SECONDS
+
+
+def test_max_workers_bounds_the_queries_in_flight():
+    fake = FakeConnector(latency_seconds=LATENCY_SECONDS)
+    started = time.perf_counter()
+    results, errors = snowflake_connection.execute_queries_parallel(QUERIES, connect=fake.connect, max_workers=1)
+    elapsed = time.perf_counter() - started
+
+    assert len(results) == len(QUERIES)
+    assert len(fake.connections) == 1
+    assert elapsed >= len(QUERIES) * LATENCY_SECONDS
+
+
+def test_a_failing_query_is_isolated():
+    error = RuntimeError("SQL compilation error: invalid identifier 'VALUE'")
+    fake = FakeConnector(latency_seconds=0.05, failures={'from churn': error},
+                         results={'from spots': (['DATE', 'VALUE'], [('2025-11-01', 2.1), ('2025-11-02', 2.2)])})
+    results, errors = snowflake_connection.execute_queries_parallel(QUERIES, connect=fake.connect)
+
+    assert errors == {'soft_churn': error}
+    assert set(results) == {'spot_allocation', 'disabled_schedules'}
+    assert results['spot_allocation']['VALUE'].tolist() == pytest.approx([2.1, 2.2])
+    # The private pool is closed afterwards
+    assert all(conn.closed for conn in fake.connections)
+
+
+def test_bind_values_go_to_their_own_query():
+    fake = FakeConnector()
+    params = {name: [f"{name}-start"] for name in QUERIES}
+    snowflake_connection.execute_queries_parallel(QUERIES, connect=fake.connect, params=params)
+
+    sent = {query: values for _, query, values in fake.statements if query in QUERIES.values()}
+    assert sent == {QUERIES[name]: params[name] for name in QUERIES}
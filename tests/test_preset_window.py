@@ -0,0 +1,55 @@
+"""Overridden windows never store a partial month or a short R7 window"""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import runner
+from sharded_query import lookback_start, preset_window
+from sql_templates import to_date
+
+
+@pytest.mark.parametrize('start, end, expected', [
+    ('2025-03-05', '2025-05-20', (date(2025, 3, 1), date(2025, 6, 1))),
+    ('2025-03-01', '2025-05-01', (date(2025, 3, 1), date(2025, 5, 1))),
+    # Not past the preset's own window (2024-12-01 to 2025-12-01)...
+    ('2024-12-05', '2025-11-20', (date(2024, 12, 1), date(2025, 12, 1))),
+    # ...unless the override itself is outside it
+    ('2024-11-10', '2026-01-10', (date(2024, 11, 1), date(2026, 2, 1))),
+    (None, '2025-05-20', (None, date(2025, 6, 1))),
+    ('2025-03-05', None, (date(2025, 3, 1), None)),
+])
+def test_monthly_window_covers_whole_months(start, end, expected):
+    assert preset_window('spot_allocation_monthly', start, end) == expected
+
+
+def test_other_windows_are_unchanged():
+    assert preset_window('soft_churn_r7', '2025-03-05', '2025-05-20') == (date(2025, 3, 5), date(2025, 5, 20))
+    assert preset_window('not_a_preset', '2025-03-05', None) == (date(2025, 3, 5), None)
+
+
+def test_lookback_start_is_the_month_start_for_monthly_and_window_days_for_r7():
+    assert lookback_start('soft_churn_monthly', '2025-03-05') == date(2025, 3, 1)
+    assert lookback_start('soft_churn_r7', '2025-03-05') == date(2025, 2, 27)
+    assert lookback_start('spot_allocation_r7', '2024-10-03') == date(2024, 10, 1)
+
+
+def test_load_query_renders_whole_months():
+    _, params = runner.load_query('disabled_schedules_monthly', '2025-03-05', '2025-05-20')
+    assert params[:2] == ['2025-03-01', '2025-06-01']
+
+
+def test_keep_window_keeps_the_first_whole_month_and_drops_r7_lookback_days():
+    months = pd.DataFrame({'MONTH_DATE': pd.to_datetime(['2025-03-01', '2025-04-01']), 'ALL_FITNESS': [1.0, 2.0]})
+    assert len(runner.keep_window(months, 'spot_allocation_monthly', '2025-03-05')) == 2
+
+    days = pd.DataFrame({'DATE': pd.date_range('2025-02-27', '2025-03-10'), 'ALL_FITNESS_PCT': 1.0})
+    kept = runner.keep_window(days, 'soft_churn_r7', '2025-03-05')
+    assert kept['DATE'].min() == pd.Timestamp('2025-03-05')
+
+
+@pytest.mark.parametrize('value', ['2025-03-05', '2025-03-05 00:00:00', date(2025, 3, 5),
+                                   pd.Timestamp('2025-03-05 13:30')])
+def test_to_date_accepts_strings_dates_and_timestamps(value):
+    assert to_date(value) == date(2025, 3, 5)
+    assert to_date(None) is None
@@ -0,0 +1,140 @@
+"""Tests for the on-disk query result cache: expiry, LRU eviction and concurrent writers"""
+import os
+import threading
+import time
+
+import pandas as pd
+
+import query_cache
+
+
+def _frame(rows=10):
+    return pd.DataFrame({'TENANT_ID': range(rows), 'SPOT_COUNT': [1.5] * rows})
+
+
+def _age(path, seconds):
+    """Move a file's mtime seconds into the past"""
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_put_then_get_round_trips(tmp_path):
+    key = query_cache.cache_key("select 1", params={'start_date': '2024-01-01'})
+    query_cache.put(key, _frame(), query="select 1", cache_dir=str(tmp_path))
+
+    pd.testing.assert_frame_equal(query_cache.get(key, cache_dir=str(tmp_path)), _frame())
+    assert query_cache.stats(cache_dir=str(tmp_path))[0] == 1
+
+
+def test_key_ignores_comments_and_whitespace_but_not_literals_or_params():
+    key = query_cache.cache_key("select *\n  from t -- all rows\nwhere x = 'a  b'")
+    assert key == query_cache.cache_key("select * from t where x = 'a  b';")
+    assert key != query_cache.cache_key("select * from t where x = 'a b'")
+    assert key != query_cache.cache_key("select * from t where x = 'a  b'", params={'x': 1})
+    assert key != query_cache.cache_key("select * from t where x = 'a  b'", backend='local')
+
+
+def test_missing_entry_is_a_miss(tmp_path):
+    assert query_cache.get('0' * 64, cache_dir=str(tmp_path)) is None
+
+
+def test_expired_entry_is_a_miss_and_removed(tmp_path, monkeypatch):
+    key = query_cache.cache_key("select 1")
+    query_cache.put(key, _frame(), cache_dir=str(tmp_path))
+
+    later = time.time() + 61
+    monkeypatch.setattr(query_cache.time, 'time', lambda: later)
+
+    assert query_cache.get(key, ttl_seconds=60, cache_dir=str(tmp_path)) is None
+    assert query_cache.stats(cache_dir=str(tmp_path)) == (0, 0)
+
+
+def test_no_ttl_never_expires(tmp_path, monkeypatch):
+    key = query_cache.cache_key("select 1")
+    query_cache.put(key, _frame(), cache_dir=str(tmp_path))
+
+    later = time.time() + 365 * 24 * 3600
+    monkeypatch.setattr(query_cache.time, 'time', lambda: later)
+
+    assert query_cache.get(key, ttl_seconds=None, cache_dir=str(tmp_path)) is not None
+
+
+def test_corrupt_entry_is_invalidated(tmp_path):
+    key = query_cache.cache_key("select 1")
+    query_cache.put(key, _frame(), cache_dir=str(tmp_path))
+    data_path, meta_path = query_cache._paths(key, str(tmp_path))
+    with open(data_path, 'wb') as f:
+        f.write(b'not a pickle')
+
+    assert query_cache.get(key, cache_dir=str(tmp_path)) is None
+    assert not os.path.exists(data_path)
+    assert not os.path.exists(meta_path)
+
+
+def test_unreadable_metadata_is_a_miss(tmp_path):
+    key = query_cache.cache_key("select 1")
+    query_cache.put(key, _frame(), cache_dir=str(tmp_path))
+    with open(query_cache._paths(key, str(tmp_path))[1], 'w') as f:
+        f.write('{truncated')
+
+    assert query_cache.get(key, cache_dir=str(tmp_path)) is None
+
+
+def test_eviction_removes_least_recently_used_first(tmp_path):
+    keys = [query_cache.cache_key(f"select {i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        query_cache.put(key, _frame(), cache_dir=str(tmp_path))
+        _age(query_cache._paths(key, str(tmp_path))[0], 300 - i * 100)
+
+    # Reading the oldest entry touches it, so the middle one becomes the LRU entry
+    assert query_cache.get(keys[0], cache_dir=str(tmp_path)) is not None
+    entry_bytes = max(size for _, size, _ in query_cache._entries(str(tmp_path)))
+    query_cache.evict(max_bytes=2 * entry_bytes, cache_dir=str(tmp_path))
+
+    remaining = {key for key, _, _ in query_cache._entries(str(tmp_path))}
+    assert remaining == {keys[0], keys[2]}
+
+
+def test_put_evicts_down_to_max_bytes(tmp_path):
+    keys = [query_cache.cache_key(f"select {i}") for i in range(3)]
+    for i, key in enumerate(keys):
+        query_cache.put(key, _frame(), cache_dir=str(tmp_path))
+        _age(query_cache._paths(key, str(tmp_path))[0], 300 - i * 100)
+
+    entry_bytes = max(size for _, size, _ in query_cache._entries(str(tmp_path)))
+    newest = query_cache.cache_key("select 3")
+    query_cache.put(newest, _frame(), max_bytes=entry_bytes, cache_dir=str(tmp_path))
+
+    assert [key for key, _, _ in query_cache._entries(str(tmp_path))] == [newest]
+
+
+def test_concurrent_writers_of_one_key_use_their_own_temp_files(tmp_path):
+    key = query_cache.cache_key("select 1")
+    errors = []
+    start = threading.Barrier(8)
+
+    def write(rows):
+        try:
+            start.wait()
+            for _ in range(5):
+                query_cache.put(key, _frame(rows), cache_dir=str(tmp_path))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(rows,)) for rows in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(query_cache.get(key, cache_dir=str(tmp_path))) in range(1, 9)
+    assert [name for name in os.listdir(tmp_path) if '.tmp' in name] == []
+
+
+def test_clear_removes_every_entry(tmp_path):
+    for i in range(3):
+        query_cache.put(query_cache.cache_key(f"select {i}"), _frame(), cache_dir=str(tmp_path))
+
+    assert query_cache.clear(cache_dir=str(tmp_path)) == 3
+    assert query_cache.stats(cache_dir=str(tmp_path)) == (0, 0)
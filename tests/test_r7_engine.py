@@ -0,0 +1,19 @@
+"""Parity of the rolling distinct-count engine with the R7 soft churn SQL"""
+import pytest
+
+import validate_r7_engine
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_engine_matches_sql_exactly(seed):
+    assert validate_r7_engine.validate(200, 40, seed) == []
+
+
+def test_compare_reports_a_changed_column():
+    rows = validate_r7_engine.venue_day_rows(n_venues=50, n_days=20, null_churn_rate=0.02, seed=0)
+    expected = validate_r7_engine.run_reference(rows)
+    actual = expected.copy()
+    column = [col for col in actual.columns if col != 'date'][0]
+    actual[column] = actual[column] + 1
+
+    assert validate_r7_engine.compare(expected, actual) == [column]
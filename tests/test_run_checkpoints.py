@@ -0,0 +1,122 @@
+"""Retries and resume of checkpointed runner runs, against fake_connector.py"""
+import pytest
+
+import metric_store
+import run_checkpoints
+import run_rolling_7day_queries
+import runner
+import snowflake_connection
+from fake_connector import FakeConnector
+
+DATES = ['2024-10-01', '2024-10-02', '2024-10-03']
+
+# SQL substring that only the query's template contains -> its canned result
+RESULTS = {
+    'classpass_spots': (['DATE', 'ALL_FITNESS_R7', 'SA_FITNESS_R7', 'NONSA_FITNESS_R7'],
+                        [(day, 2.3, 2.7, 1.9) for day in DATES]),
+    '%schedule disable%': (['DATE', 'ALL_FITNESS_R7_PCT', 'SA_FITNESS_R7_PCT', 'NONSA_FITNESS_R7_PCT'],
+                           [(day, 10.0, 9.0, 11.0) for day in DATES]),
+    'venue_adds_and_churns': (['DATE', 'ALL_FITNESS_R7_PCT', 'SA_FITNESS_R7_PCT', 'NONSA_FITNESS_R7_PCT'],
+                              [(day, 0.03, 0.02, 0.04) for day in DATES]),
+}
+
+
+class ProgrammingError(Exception):
+    """Stands in for snowflake.connector.errors.ProgrammingError (matched by class name)"""
+
+
+@pytest.fixture
+def sleeps(tmp_path, monkeypatch):
+    """Checkpoints and the metric store under tmp_path; backoff sleeps recorded, not slept"""
+    monkeypatch.setattr(run_checkpoints, 'CHECKPOINT_DIR', str(tmp_path / 'checkpoints'))
+    monkeypatch.setattr(metric_store, 'STORE_DIR', str(tmp_path / 'metrics'))
+    sleeps = []
+    monkeypatch.setattr(run_checkpoints.time, 'sleep', sleeps.append)
+    yield sleeps
+    snowflake_connection.close_connection()
+
+
+def _use(fake):
+    snowflake_connection.configure_pool(connect=fake.connect, max_size=2)
+    return fake
+
+
+def _run_rolling(*argv):
+    return runner.main(run_rolling_7day_queries.RUNNER, ['--no-cache', *argv])
+
+
+def test_transient_failure_is_retried_then_succeeds(sleeps):
+    fake = _use(FakeConnector(results=RESULTS, failures={'classpass_spots': RuntimeError('Connection reset by peer')}))
+
+    def run_once():
+        return snowflake_connection.execute_query("select * from classpass_spots", use_cache=False)
+
+    def attempt(number):
+        if number == 2:
+            # The network is back for the retry
+            fake.failures.clear()
+
+    df = run_checkpoints.with_retries(run_once, 'spot_allocation', retries=2, backoff_seconds=5, on_attempt=attempt)
+
+    assert len(df) == len(DATES)
+    assert fake.round_trips('query') == 2
+    assert sleeps == [5]
+
+
+def test_backoff_doubles_until_the_retries_are_used_up(sleeps):
+    fake = _use(FakeConnector(failures={'select': RuntimeError('Connection reset by peer')}))
+
+    with pytest.raises(RuntimeError, match='Connection reset'):
+        run_checkpoints.with_retries(lambda: snowflake_connection.execute_query("select 2", use_cache=False),
+                                     'spot_allocation', retries=2, backoff_seconds=5)
+
+    assert fake.round_trips('query') == 3
+    assert sleeps == [5, 10]
+
+
+def test_programming_error_is_not_retried(sleeps):
+    fake = _use(FakeConnector(failures={'select': ProgrammingError("SQL compilation error: invalid identifier")}))
+    attempts = []
+
+    with pytest.raises(ProgrammingError):
+        run_checkpoints.with_retries(lambda: snowflake_connection.execute_query("select 2", use_cache=False),
+                                     'spot_allocation', retries=2, on_attempt=attempts.append)
+
+    assert attempts == [1]
+    assert fake.round_trips('query') == 1
+    assert sleeps == []
+
+
+def test_rerun_resumes_without_re_executing_stored_queries(sleeps):
+    # First run: soft churn fails with a SQL error, the other two are stored
+    first = _use(FakeConnector(results=RESULTS,
+                               failures={'venue_adds_and_churns': ProgrammingError('Object does not exist')}))
+    assert _run_rolling() == 1
+    assert first.round_trips('query') == 3
+
+    run, = run_checkpoints.list_runs()
+    statuses = {name: entry['status'] for name, entry in run['queries'].items()}
+    assert statuses == {'spot_allocation': 'stored', 'disabled_schedules': 'stored', 'soft_churn': 'failed'}
+
+    # Rerun with the same window: only soft churn is executed
+    second = _use(FakeConnector(results=RESULTS))
+    assert _run_rolling() == 0
+    executed = [query for _, query, _ in second.statements if 'ALTER SESSION' not in query.upper()]
+    assert len(executed) == 1 and 'venue_adds_and_churns' in executed[0]
+
+    run = run_checkpoints.load_run(run['run_id'])
+    assert run_checkpoints.is_complete(run)
+    assert run['queries']['spot_allocation']['attempts'] == 1
+    assert run['queries']['soft_churn']['attempts'] == 2
+    assert len(run_checkpoints.list_runs()) == 1
+
+
+def test_fresh_starts_a_new_run(sleeps):
+    _use(FakeConnector(results=RESULTS, failures={'venue_adds_and_churns': ProgrammingError('Object does not exist')}))
+    assert _run_rolling() == 1
+
+    fake = _use(FakeConnector(results=RESULTS))
+    assert _run_rolling('--fresh') == 0
+
+    assert fake.round_trips('query') == 3
+    assert sorted(run_checkpoints.is_complete(run) for run in run_checkpoints.list_runs()) == [False, True]